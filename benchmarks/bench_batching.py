@@ -0,0 +1,111 @@
+"""Throughput of batched vs. per-event Arkitekt map assignments
+
+Maps small integer payloads through an ArkitektMapAtom (one assignment per
+event) and an ArkitektBatchMapAtom (one assignment per batch). The mock
+contract charges a fixed overhead per assignment (like a round trip to
+a provider) and a tiny cost per item.
+
+Run with `python -m benchmarks.bench_batching`
+"""
+import asyncio
+import time
+
+from fluss.api.schema import FlowNodeFragmentBaseArkitektNode
+from rekuest.actors.types import Assignment
+from rekuest.postmans.utils import mockuse
+
+from reaktion.atoms.arkitekt import ArkitektBatchMapAtom, ArkitektMapAtom
+from reaktion.atoms.transport import AtomTransport
+from reaktion.events import EventType, RawInEvent
+from tests.utils import build_port
+
+EVENTS = 2000
+OVERHEAD = 0.002
+""" The overhead of one assignment (in seconds)"""
+PER_ITEM = 0.00001
+
+
+class OverheadContract(mockuse):
+    def __init__(self):
+        self.active = True
+
+    async def aassign_retry(self, kwargs, parent=None, reference=None, **_):
+        value = kwargs["a"]
+        if isinstance(value, list):
+            await asyncio.sleep(OVERHEAD + PER_ITEM * len(value))
+            return {"a": [item + 1 for item in value]}
+
+        await asyncio.sleep(OVERHEAD + PER_ITEM)
+        return {"a": value + 1}
+
+
+def build_node(**defaults) -> FlowNodeFragmentBaseArkitektNode:
+    return FlowNodeFragmentBaseArkitektNode(
+        **{
+            "__typename": "ArkitektNode",
+            "id": "map",
+            "position": {"x": 0, "y": 0},
+            "name": "add_one",
+            "hash": "add_one",
+            "kind": "FUNCTION",
+            "mapStrategy": "MAP",
+            "allowLocal": False,
+            "reserveParams": {},
+            "assignTimeout": 1000,
+            "yieldTimeout": 1000,
+            "reserveTimeout": 1000,
+            "maxRetries": 1,
+            "retryDelay": 1000,
+            "defaults": defaults,
+            "constream": [],
+            "instream": [[build_port("a")]],
+            "outstream": [[build_port("a")]],
+        }
+    )
+
+
+async def run(atom_class, **defaults) -> float:
+    queue = asyncio.Queue()
+    atom = atom_class(
+        node=build_node(**defaults),
+        contract=OverheadContract(),
+        transport=AtomTransport(queue=queue),
+        assignment=Assignment(assignation="1"),
+    )
+    await atom.aenter()
+
+    start = time.perf_counter()
+    task = asyncio.create_task(atom.start())
+    for t in range(EVENTS):
+        await atom.put(
+            RawInEvent(
+                target="map",
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    await atom.put(
+        RawInEvent(target="map", handle="arg_0", type=EventType.COMPLETE, current_t=t)
+    )
+    await task
+
+    elapsed = time.perf_counter() - start
+    assert queue.qsize() == EVENTS + 1, "Not every event was mapped"
+    return elapsed
+
+
+def bench():
+    single = asyncio.run(run(ArkitektMapAtom))
+    print(f"per-event      | {EVENTS / single:9.0f} events/s")
+    for batch_size in (10, 50, 200):
+        batched = asyncio.run(run(ArkitektBatchMapAtom, batch_size=batch_size))
+        print(
+            f"batch_size {batch_size:3d} | {EVENTS / batched:9.0f} events/s"
+            f" | speedup {single / batched:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,100 @@
+"""Accumulation cost of the BufferCompleteAtom
+
+Buffers n single-item events and measures the time until the buffered list
+is emitted. The incremental buffer is compared to the previous
+implementation (keeping every event and concatenating their values with
+`reduce` on COMPLETE), which is quadratic in the number of items.
+
+Run with `python -m benchmarks.bench_buffer`
+"""
+import asyncio
+import time
+from functools import reduce
+from typing import List
+
+from pydantic import Field
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.transformation.buffer_complete import BufferCompleteAtom
+from reaktion.atoms.transport import AtomTransport
+from reaktion.events import EventType, InEvent, RawInEvent, RawOutEvent
+from tests.utils import build_linear_flow
+
+
+class ReduceBufferCompleteAtom(BufferCompleteAtom):
+    events: List[InEvent] = Field(default_factory=list)
+
+    async def run(self):
+        while True:
+            event = await self.get()
+            if event.type == EventType.NEXT:
+                self.events.append(event)
+            if event.type == EventType.COMPLETE:
+                await self.transport.put(
+                    RawOutEvent(
+                        handle="return_0",
+                        type=EventType.NEXT,
+                        value=[reduce(lambda a, b: a + list(b.value), self.events, [])],
+                        source=self.node.id,
+                        caused_by=[ev.current_t for ev in self.events],
+                    )
+                )
+                break
+
+
+async def run(atom_class, items: int, **defaults) -> float:
+    node = build_linear_flow(1).graph.nodes[1]
+    node = node.copy(update={"defaults": defaults})
+    queue = asyncio.Queue()
+    atom = atom_class(
+        node=node,
+        transport=AtomTransport(queue=queue),
+        assignment=Assignment(assignation="1"),
+    )
+    await atom.aenter()
+
+    start = time.perf_counter()
+    task = asyncio.create_task(atom.start())
+    for t in range(items):
+        atom.put_nowait(
+            RawInEvent(
+                target=node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    atom.put_nowait(
+        RawInEvent(
+            target=node.id, handle="arg_0", type=EventType.COMPLETE, current_t=items
+        )
+    )
+    event = await queue.get()
+    elapsed = time.perf_counter() - start
+
+    assert len(event.value[0]) == items
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await atom.aexit()
+    return elapsed
+
+
+def bench():
+    for items in (10000, 30000, 100000):
+        new = asyncio.run(run(BufferCompleteAtom, items))
+        spilled = asyncio.run(run(BufferCompleteAtom, items, spill_after=10000))
+        old = asyncio.run(run(ReduceBufferCompleteAtom, items))
+        print(
+            f"{items:6d} items | extend {new:6.3f} s | spilled {spilled:6.3f} s"
+            f" | reduce {old:7.3f} s | speedup {old / new:7.1f}x"
+        )
+
+    items = 1000000
+    new = asyncio.run(run(BufferCompleteAtom, items))
+    spilled = asyncio.run(run(BufferCompleteAtom, items, spill_after=100000))
+    print(f"{items:6d} items | extend {new:6.3f} s | spilled {spilled:6.3f} s")
+
+
+if __name__ == "__main__":
+    bench()
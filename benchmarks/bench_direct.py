@@ -0,0 +1,62 @@
+"""Throughput of central vs. direct event routing on wide fan-out flows
+
+Runs a flow that chunks a list into `width` parallel branches of ADD
+nodes, that are zipped back together (tracking off), once with every event
+passing through the dispatch loop of the actor (CENTRAL) and once with
+atoms sending events straight to each other (DIRECT).
+
+Run with `python -m benchmarks.bench_direct`
+"""
+import asyncio
+import logging
+import time
+
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.transport import ExecutionMode
+from reaktion.tracking import TrackingMode
+from tests.utils import MockAssignTransport, build_fanout_flow, build_flow_actor
+
+ITEMS = 1000
+DEPTH = 2
+
+
+async def run(width: int, mode: ExecutionMode) -> float:
+    actor = build_flow_actor(
+        build_fanout_flow(width, DEPTH),
+        execution_mode=mode,
+        tracking_mode=TrackingMode.OFF,
+    )
+    await actor.on_provide(actor.passport)
+
+    # Warm up (and fill the atom pool)
+    await actor.on_assign(
+        Assignment(assignation="warmup", args=[[0]]),
+        actor.collector,
+        MockAssignTransport(),
+    )
+
+    start = time.perf_counter()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[list(range(ITEMS))]),
+        actor.collector,
+        MockAssignTransport(),
+    )
+    return time.perf_counter() - start
+
+
+def bench():
+    logging.disable(logging.WARNING)
+    for width in (4, 16, 64):
+        events = ITEMS * (1 + width * DEPTH + 1)
+        central = asyncio.run(run(width, ExecutionMode.CENTRAL))
+        direct = asyncio.run(run(width, ExecutionMode.DIRECT))
+        print(
+            f"width {width:2d} | central {events / central:9.0f} events/s"
+            f" | direct {events / direct:9.0f} events/s"
+            f" | speedup {central / direct:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench()
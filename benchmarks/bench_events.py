@@ -0,0 +1,116 @@
+"""Per-event overhead of pydantic vs. raw (validation-free) events
+
+Pushes events through a chain of 10 MapAtoms, that are connected through
+the same routing the FlowActor uses. In the "pydantic" mode every hop
+validates the emitted OutEvent and the routed InEvent (like before the
+introduction of the raw events), in the "raw" mode no validation happens.
+
+Run with `python -m benchmarks.bench_events`
+"""
+import asyncio
+import time
+import timeit
+
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.generic import MapAtom
+from reaktion.atoms.transport import AtomTransport
+from reaktion.events import EventType, InEvent, OutEvent, RawInEvent, RawOutEvent
+from reaktion.utils import build_routing_table, routed_events
+from tests.utils import build_linear_flow
+
+STAGES = 10
+EVENTS = 2000
+
+
+class IdentityMapAtom(MapAtom):
+    async def map(self, event):
+        return event.value
+
+
+async def run_chain(validate: bool) -> float:
+    flow = build_linear_flow(STAGES)
+    table = build_routing_table(flow.graph)
+    queue = asyncio.Queue()
+    transport = AtomTransport(queue=queue)
+    assignment = Assignment(assignation="1")
+
+    atoms = {
+        node.id: IdentityMapAtom(node=node, transport=transport, assignment=assignment)
+        for node in flow.graph.nodes
+        if node.id not in ("arg", "return")
+    }
+    await asyncio.gather(*[atom.aenter() for atom in atoms.values()])
+    tasks = [asyncio.create_task(atom.start()) for atom in atoms.values()]
+
+    start = time.perf_counter()
+    for t in range(EVENTS):
+        await queue.put(
+            RawOutEvent(
+                handle="return_0",
+                type=EventType.NEXT,
+                source="arg",
+                value=(t,),
+                caused_by=(t,),
+            )
+        )
+
+    received = 0
+    t = 0
+    while received < EVENTS:
+        event = await queue.get()
+        if validate:
+            event = event.validate()
+        for in_event in routed_events(table, event, t):
+            if validate:
+                in_event = in_event.validate()
+            if in_event.target == "return":
+                received += 1
+            else:
+                await atoms[in_event.target].put(in_event)
+        t += 1
+
+    elapsed = time.perf_counter() - start
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return elapsed
+
+
+def bench_construction():
+    number = 10000
+    kwargs = dict(
+        handle="return_0", type=EventType.NEXT, source="1", value=(1,), caused_by=(0,)
+    )
+    in_kwargs = dict(
+        target="1", handle="arg_0", type=EventType.NEXT, value=(1,), current_t=0
+    )
+
+    pydantic_hop = timeit.timeit(
+        lambda: (OutEvent(**kwargs), InEvent(**in_kwargs)), number=number
+    )
+    raw_hop = timeit.timeit(
+        lambda: (RawOutEvent(**kwargs), RawInEvent(**in_kwargs)), number=number
+    )
+    print(
+        f"construction per hop | pydantic {pydantic_hop / number * 1e6:7.2f} us"
+        f" | raw {raw_hop / number * 1e6:7.2f} us"
+    )
+
+
+def bench_chain():
+    pydantic_chain = asyncio.run(run_chain(validate=True))
+    raw_chain = asyncio.run(run_chain(validate=False))
+
+    hops = EVENTS * STAGES
+    print(
+        f"{STAGES}-stage MapAtom chain | pydantic {pydantic_chain / hops * 1e6:7.2f} us/hop"
+        f" | raw {raw_chain / hops * 1e6:7.2f} us/hop"
+        f" | speedup {pydantic_chain / raw_chain:5.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    bench_construction()
+    bench_chain()
@@ -0,0 +1,82 @@
+"""Vectorized MathAtom on 1M element payloads
+
+Runs a MULTIPLY MathAtom on one event carrying 1M floats, as a python list
+and as a numpy array (with and without `in_place`). The vectorized arrays
+are compared to computing the list item by item (what MathAtom does for
+lists).
+
+Run with `python -m benchmarks.bench_math`
+"""
+import asyncio
+import logging
+import time
+
+import numpy as np
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.operations.math import MathAtom
+from reaktion.atoms.transport import AtomTransport
+from reaktion.events import EventType, RawInEvent
+from tests.utils import build_linear_flow
+
+ELEMENTS = 1000000
+REPEATS = 5
+
+
+async def run(value_factory, **defaults) -> float:
+    node = build_linear_flow(1, implementation="MULTIPLY").graph.nodes[1]
+    node = node.copy(update={"defaults": {"number": 3, **defaults}})
+    queue = asyncio.Queue()
+
+    elapsed = 0.0
+    for _ in range(REPEATS):
+        value = value_factory()
+        atom = MathAtom(
+            node=node,
+            transport=AtomTransport(queue=queue),
+            assignment=Assignment(assignation="1"),
+        )
+        await atom.aenter()
+        task = asyncio.create_task(atom.start())
+
+        start = time.perf_counter()
+        atom.put_nowait(
+            RawInEvent(
+                target=node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(value,),
+                current_t=0,
+            )
+        )
+        event = await queue.get()
+        elapsed += time.perf_counter() - start
+
+        assert len(event.value[0]) == ELEMENTS
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    return elapsed / REPEATS
+
+
+def bench():
+    logging.disable(logging.WARNING)
+    numbers = [float(i) for i in range(ELEMENTS)]
+    array = np.arange(ELEMENTS, dtype=np.float64)
+
+    itemwise = asyncio.run(run(lambda: numbers))
+
+    results = {
+        "list, item by item": itemwise,
+        "array": asyncio.run(run(lambda: array)),
+        "array, in place": asyncio.run(run(lambda: array.copy(), in_place=True)),
+    }
+    for name, elapsed in results.items():
+        print(
+            f"{name:20s} | {elapsed * 1000:8.2f} ms"
+            f" | speedup {itemwise / elapsed:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,115 @@
+"""Release cost of the OrderedAtom reorder buffer
+
+Maps 50k events whose map tasks complete out of order (shuffled and
+reversed). The completion order is forced by resolving a future per event.
+The deque based reorder buffer is compared to a list based one (with
+`key in list` and `pop(0)`), as OrderedAtom used before.
+
+Run with `python -m benchmarks.bench_ordered`
+"""
+import asyncio
+import random
+import time
+from typing import List
+
+from pydantic import Field
+
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.generic import OrderedAtom
+from reaktion.atoms.transport import AtomTransport
+from reaktion.events import EventType, RawInEvent, RawOutEvent
+from tests.utils import build_linear_flow
+
+EVENTS = 50000
+
+
+class FutureOrderedAtom(OrderedAtom):
+    futures: dict
+
+    async def map(self, event):
+        return await self.futures[event.current_t]
+
+
+class ListOrderedAtom(FutureOrderedAtom):
+    publish_queue: List[int] = Field(default_factory=list)
+
+    async def publish(self, key: int):
+        if key not in self.publish_queue:
+            return
+
+        while self.publish_queue and self.runningEvents[self.publish_queue[0]].done():
+            head = self.publish_queue.pop(0)
+            task = self.runningEvents.pop(head)
+            await self.transport.put(
+                RawOutEvent(
+                    handle="return_0",
+                    type=EventType.NEXT,
+                    value=task.result(),
+                    source=self.node.id,
+                    caused_by=[head],
+                )
+            )
+
+
+async def run(atom_class, order) -> float:
+    node = build_linear_flow(1).graph.nodes[1]
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    futures = {t: loop.create_future() for t in range(EVENTS)}
+
+    atom = atom_class(
+        node=node,
+        transport=AtomTransport(queue=queue),
+        assignment=Assignment(assignation="1"),
+        futures=futures,
+    )
+    await atom.aenter()
+    task = asyncio.create_task(atom.start())
+
+    for t in range(EVENTS):
+        await atom.put(
+            RawInEvent(
+                target=node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    for t in order:
+        futures[t].set_result((t,))
+        if t % 100 == 0:
+            await asyncio.sleep(0)
+
+    previous = -1
+    for _ in range(EVENTS):
+        event = await queue.get()
+        assert event.caused_by[0] == previous + 1, "Results out of order"
+        previous = event.caused_by[0]
+
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return elapsed
+
+
+def bench():
+    shuffled = list(range(EVENTS))
+    random.Random(42).shuffle(shuffled)
+    orders = {"shuffled": shuffled, "reversed": list(reversed(range(EVENTS)))}
+
+    for name, order in orders.items():
+        deque_time = asyncio.run(run(FutureOrderedAtom, order))
+        list_time = asyncio.run(run(ListOrderedAtom, order))
+        print(
+            f"{EVENTS} {name} completions | deque {deque_time:6.2f} s"
+            f" | list {list_time:6.2f} s | speedup {list_time / deque_time:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,80 @@
+"""CPU-bound fan-out flows in the actor vs. across worker processes
+
+Runs a flow that chunks a list into `width` parallel branches of POWER
+nodes (every item is raised to a large power and reduced to 1 again), that are
+zipped back together (tracking off). The flow is run in the event loop of
+the actor and with every reactive node placed in a process, partitioned
+across 2 and 4 workers. The speedup is bounded by the number of cores.
+
+Run with `python -m benchmarks.bench_partition`
+"""
+import asyncio
+import logging
+import os
+import time
+
+from rekuest.actors.types import Assignment
+
+from reaktion.partition import Placement
+from reaktion.tracking import TrackingMode
+from tests.utils import MockAssignTransport, build_fanout_flow, build_flow_actor
+
+ITEMS = 400
+WIDTH = 4
+EXPONENT = 2000
+
+
+def build_power_flow():
+    flow = build_fanout_flow(WIDTH, 2, implementation="POWER")
+    for node in flow.graph.nodes:
+        if node.id.startswith("power_"):
+            # x ** EXPONENT, then back to a small number with ** 0
+            node.defaults["number"] = EXPONENT if node.id.endswith("_0") else 0
+    return flow
+
+
+async def run(partitions: int) -> float:
+    actor = build_flow_actor(
+        build_power_flow(),
+        tracking_mode=TrackingMode.OFF,
+        process_partitions=partitions,
+        placement=Placement.PROCESS,
+    )
+    await actor.on_provide(actor.passport)
+
+    try:
+        await actor.on_assign(
+            Assignment(assignation="warmup", args=[[3]]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+
+        start = time.perf_counter()
+        transport = MockAssignTransport()
+        await actor.on_assign(
+            Assignment(assignation="1", args=[[7] * ITEMS]),
+            actor.collector,
+            transport,
+        )
+        elapsed = time.perf_counter() - start
+        assert transport.changes[-1]["returns"] == (1,) * WIDTH
+        return elapsed
+    finally:
+        await actor.on_unprovide()
+
+
+def bench():
+    logging.disable(logging.WARNING)
+    print(f"{os.cpu_count()} cpus, {ITEMS} items, {WIDTH} branches")
+    local = asyncio.run(run(0))
+    print(f"in the actor      | {local:6.2f} s")
+    for partitions in (2, 4):
+        elapsed = asyncio.run(run(partitions))
+        print(
+            f"{partitions} partitions      | {elapsed:6.2f} s"
+            f" | speedup {local / elapsed:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench()
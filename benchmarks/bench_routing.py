@@ -0,0 +1,39 @@
+"""Compares the edge scan of connected_events with the prebuilt routing table
+
+Run with `python -m benchmarks.bench_routing`
+"""
+import timeit
+
+from reaktion.events import EventType, OutEvent
+from reaktion.utils import build_routing_table, connected_events, routed_events
+from tests.utils import build_linear_flow
+
+NUMBER = 2000
+
+
+def bench(length: int):
+    flow = build_linear_flow(length)
+    table = build_routing_table(flow.graph)
+
+    # The last node in the chain is the worst case for the scan
+    event = OutEvent(
+        handle="return_0",
+        type=EventType.NEXT,
+        source=flow.graph.edges[-1].source,
+        value=(1,),
+        caused_by=[0],
+    )
+
+    scan = timeit.timeit(lambda: connected_events(flow.graph, event, 0), number=NUMBER)
+    routed = timeit.timeit(lambda: routed_events(table, event, 0), number=NUMBER)
+
+    print(
+        f"{length:>5} nodes | scan {scan / NUMBER * 1e6:8.2f} us/event"
+        f" | table {routed / NUMBER * 1e6:8.2f} us/event"
+        f" | speedup {scan / routed:6.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    for length in (10, 60, 250, 1000):
+        bench(length)
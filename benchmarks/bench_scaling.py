@@ -0,0 +1,71 @@
+"""How the engine scales with the size of a flow
+
+Builds synthetic flows of growing size (chains of arkitekt MapAtoms, split
+fan-outs and zip trees), provisions a FlowActor for each (with synthetic
+contracts without latency, tracking off) and reports the time to provision
+it and the mean time of an assignation.
+
+Run with `python -m benchmarks.bench_scaling`
+"""
+import asyncio
+import logging
+import time
+
+from rekuest.actors.types import Assignment
+
+from reaktion.synthetic import (
+    SyntheticContractor,
+    build_fanin_flow,
+    build_map_chain_flow,
+    build_split_flow,
+)
+from reaktion.tracking import TrackingMode
+from tests.utils import MockAssignTransport, build_flow_actor
+
+ASSIGNATIONS = 5
+
+SHAPES = {
+    "map chain": (build_map_chain_flow, lambda size: [1]),
+    "split fan-out": (build_split_flow, lambda size: list(range(size))),
+    "zip tree": (build_fanin_flow, lambda size: [[1, 2, 3]]),
+}
+
+
+async def scale(build, args, size: int):
+    flow = build(size)
+    actor = build_flow_actor(
+        flow,
+        arkitekt_contractor=SyntheticContractor(),
+        tracking_mode=TrackingMode.OFF,
+    )
+
+    start = time.perf_counter()
+    await actor.on_provide(actor.passport)
+    provide = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(ASSIGNATIONS):
+        await actor.on_assign(
+            Assignment(assignation=str(i), args=args(size)),
+            actor.collector,
+            MockAssignTransport(),
+        )
+    assign = (time.perf_counter() - start) / ASSIGNATIONS
+
+    await actor.on_unprovide()
+    return len(flow.graph.nodes), provide, assign
+
+
+def bench():
+    logging.disable(logging.INFO)
+    for shape, (build, args) in SHAPES.items():
+        for size in (10, 100, 1000):
+            nodes, provide, assign = asyncio.run(scale(build, args, size))
+            print(
+                f"{shape:13} | {nodes:5} nodes | provide {provide * 1e3:8.2f} ms"
+                f" | assign {assign * 1e3:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    bench()
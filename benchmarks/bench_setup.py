@@ -0,0 +1,87 @@
+"""Assignation setup latency with and without atom pooling
+
+Runs many short assignations of a linear flow on one provisioned FlowActor
+(tracking off), once atomifying every node per assignation and once
+reusing pooled atoms. Reports the mean latency of the atom setup alone
+(acquiring and entering the atoms) and of a whole `on_assign`.
+
+Run with `python -m benchmarks.bench_setup`
+"""
+import asyncio
+import logging
+import time
+
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.transport import AtomTransport
+from reaktion.tracking import TrackingMode
+from tests.utils import MockAssignTransport, build_flow_actor, build_linear_flow
+
+ASSIGNATIONS = 300
+STAGES = 20
+
+
+async def setup(pool_atoms: bool) -> float:
+    actor = build_flow_actor(build_linear_flow(STAGES), pool_atoms=pool_atoms)
+    await actor.on_provide(actor.passport)
+    transport = AtomTransport(queue=asyncio.Queue())
+
+    elapsed = 0
+    for i in range(ASSIGNATIONS):
+        assignment = Assignment(assignation=str(i), args=[i])
+        start = time.perf_counter()
+        atoms = actor.acquire_atoms(transport, assignment, {}, None)
+        for atom in atoms.values():
+            await atom.aenter()
+        elapsed += time.perf_counter() - start
+
+        tasks = [asyncio.create_task(asyncio.sleep(0)) for _ in atoms]
+        await actor.release_atoms(atoms, tasks)
+
+    return elapsed / ASSIGNATIONS
+
+
+async def run(pool_atoms: bool) -> float:
+    actor = build_flow_actor(
+        build_linear_flow(STAGES),
+        pool_atoms=pool_atoms,
+        tracking_mode=TrackingMode.OFF,
+    )
+    await actor.on_provide(actor.passport)
+
+    # Warm up (and fill the pool)
+    await actor.on_assign(
+        Assignment(assignation="warmup", args=[0]),
+        actor.collector,
+        MockAssignTransport(),
+    )
+
+    start = time.perf_counter()
+    for i in range(ASSIGNATIONS):
+        await actor.on_assign(
+            Assignment(assignation=str(i), args=[i]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+    return (time.perf_counter() - start) / ASSIGNATIONS
+
+
+def bench():
+    logging.disable(logging.INFO)
+    fresh = asyncio.run(setup(pool_atoms=False))
+    pooled = asyncio.run(setup(pool_atoms=True))
+    print(
+        f"{STAGES}-node flow setup     | atomify {fresh * 1e3:6.2f} ms"
+        f" | pooled {pooled * 1e3:6.2f} ms | speedup {fresh / pooled:5.2f}x"
+    )
+
+    fresh = asyncio.run(run(pool_atoms=False))
+    pooled = asyncio.run(run(pool_atoms=True))
+    print(
+        f"{STAGES}-node flow on_assign | atomify {fresh * 1e3:6.2f} ms"
+        f" | pooled {pooled * 1e3:6.2f} ms | speedup {fresh / pooled:5.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    bench()
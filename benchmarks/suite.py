@@ -0,0 +1,433 @@
+"""Benchmark suite with machine-readable results
+
+Runs offline (mockuse contracts, MockTransport and the offline FlowActor of
+the tests) and measures:
+
+- atom.<kind>: events/s through every atom that `atomify` builds, fed
+  directly with events
+- flow.<shape>: the latency of one assignation (one item) and the
+  throughput (events/s) of FlowActor.on_assign for linear, fan-out, fan-in
+  and diamond flows, in both execution modes
+- memory.<what>: the memory (bytes) per queued event and per in-flight map
+
+Results are written as JSON (see `--output`), together with the python
+version, platform and git revision, so that runs can be compared across
+releases (see `--compare`, which prints the ratio to a previous result).
+
+Run with `python -m benchmarks.suite [--quick] [--output FILE] [--compare FILE]`
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fluss.api.schema import (
+    FlowNodeFragmentBaseArkitektFilterNode,
+    FlowNodeFragmentBaseArkitektNode,
+    FlowNodeFragmentBaseLocalNode,
+    FlowNodeFragmentBaseReactiveNode,
+)
+from rekuest.actors.types import Assignment
+from rekuest.postmans.utils import mockuse
+
+from reaktion.atoms.transport import ExecutionMode, MockTransport
+from reaktion.atoms.utils import atomify
+from reaktion.events import EventType, RawInEvent
+from reaktion.metrics import MemoryMetrics, Metric
+from reaktion.tracking import TrackingMode
+from tests.utils import (
+    MockAssignTransport,
+    build_diamond_flow,
+    build_fanin_flow,
+    build_fanout_flow,
+    build_flow_actor,
+    build_node,
+    build_port,
+)
+
+Feed = Callable[[int], List[Tuple[str, tuple]]]
+""" Returns the (handle, value) of the events that are fed to an atom"""
+
+
+class EchoContract(mockuse):
+    """Returns (and streams) its kwargs right away"""
+
+    def __init__(self, block: Optional[asyncio.Event] = None):
+        self.active = True
+        self.block = block
+
+    async def aassign_retry(self, kwargs, parent=None, reference=None, **_):
+        if self.block:
+            await self.block.wait()
+        return kwargs
+
+    async def astream_retry(self, kwargs, parent=None, reference=None, **_):
+        yield kwargs
+
+
+def ports(count: int = 1) -> List[List[Dict]]:
+    return [[build_port("a") for _ in range(count)]]
+
+
+def reactive(implementation: str, instreams: int = 1, outs: int = 1, **defaults):
+    return FlowNodeFragmentBaseReactiveNode(
+        **build_node(
+            "node",
+            "ReactiveNode",
+            instream=[[build_port("a")] for _ in range(instreams)],
+            outstream=ports(outs),
+            implementation=implementation,
+            defaults=defaults,
+        )
+    )
+
+
+def arkitekt(kind="FUNCTION", strategy="MAP", filter=False, **defaults):
+    node_class = (
+        FlowNodeFragmentBaseArkitektFilterNode
+        if filter
+        else FlowNodeFragmentBaseArkitektNode
+    )
+    return node_class(
+        **build_node(
+            "node",
+            "ArkitektFilterNode" if filter else "ArkitektNode",
+            name="echo",
+            hash="echo",
+            kind=kind,
+            mapStrategy=strategy,
+            allowLocal=False,
+            reserveParams={},
+            assignTimeout=1000,
+            yieldTimeout=1000,
+            reserveTimeout=1000,
+            maxRetries=1,
+            retryDelay=1000,
+            defaults=defaults,
+        )
+    )
+
+
+def local(kind="FUNCTION", **defaults):
+    return FlowNodeFragmentBaseLocalNode(
+        **build_node(
+            "node",
+            "LocalNode",
+            hash="echo",
+            kind=kind,
+            mapStrategy="MAP",
+            allowLocal=True,
+            interface="echo",
+            assignTimeout=1000,
+            yieldTimeout=1000,
+            maxRetries=1,
+            retryDelay=0,
+            defaults=defaults,
+        )
+    )
+
+
+def single(value: Any) -> Feed:
+    return lambda n: [("arg_0", (value,))] * n
+
+
+def alternating(n: int) -> List[Tuple[str, tuple]]:
+    return [(f"arg_{i % 2}", (i,)) for i in range(n)]
+
+
+ATOMS: Dict[str, Tuple[Callable[[], Any], Feed]] = {
+    "ADD": (lambda: reactive("ADD", number=1), single(1)),
+    "CHUNK": (lambda: reactive("CHUNK"), single([1])),
+    "FILTER": (lambda: reactive("FILTER"), single({"value": 1, "use": 0})),
+    "SPLIT": (lambda: reactive("SPLIT", outs=2), lambda n: [("arg_0", (1, 2))] * n),
+    "ALL": (lambda: reactive("ALL"), single(1)),
+    "GATE": (lambda: reactive("GATE", instreams=2), alternating),
+    "ZIP": (lambda: reactive("ZIP", instreams=2), alternating),
+    "WITHLATEST": (lambda: reactive("WITHLATEST", instreams=2), alternating),
+    "COMBINELATEST": (lambda: reactive("COMBINELATEST", instreams=2), alternating),
+    "BUFFER_COMPLETE": (lambda: reactive("BUFFER_COMPLETE"), single(1)),
+    "BUFFER_COUNT": (
+        lambda: reactive("BUFFER_COMPLETE", buffer_count=10),
+        single(1),
+    ),
+    "BUFFER_TIME": (
+        lambda: reactive("BUFFER_COMPLETE", buffer_time=10),
+        single(1),
+    ),
+    "BUFFER_COUNT_OR_TIME": (
+        lambda: reactive("BUFFER_COMPLETE", buffer_count=10, buffer_time=10),
+        single(1),
+    ),
+    "ARKITEKT_MAP": (lambda: arkitekt(), single(1)),
+    "ARKITEKT_BATCH_MAP": (lambda: arkitekt(batchable=True, batch_size=16), single(1)),
+    "ARKITEKT_ORDERED": (lambda: arkitekt(strategy="ORDERED"), single(1)),
+    "ARKITEKT_AS_COMPLETED": (lambda: arkitekt(strategy="AS_COMPLETED"), single(1)),
+    "ARKITEKT_GENERATOR": (lambda: arkitekt(kind="GENERATOR"), single(1)),
+    "ARKITEKT_FILTER": (lambda: arkitekt(filter=True), single(1)),
+    "LOCAL_MAP": (lambda: local(), single(1)),
+    "LOCAL_GENERATOR": (lambda: local(kind="GENERATOR"), single(1)),
+}
+""" The nodes of every atom that atomify builds, and how they are fed"""
+
+
+async def atom_throughput(kind: str, events: int) -> float:
+    build, feed = ATOMS[kind]
+    node = build()
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(node, transport, EchoContract(), {}, Assignment(assignation="1"))
+
+    await atom.aenter()
+    start = time.perf_counter()
+    task = asyncio.create_task(atom.start())
+    for t, (handle, value) in enumerate(feed(events)):
+        await atom.put(
+            RawInEvent(
+                target=node.id,
+                handle=handle,
+                type=EventType.NEXT,
+                value=value,
+                current_t=t,
+            )
+        )
+    for index in range(len(node.instream)):
+        await atom.put(
+            RawInEvent(
+                target=node.id,
+                handle=f"arg_{index}",
+                type=EventType.COMPLETE,
+                current_t=events + index,
+            )
+        )
+
+    # Most atoms stop once their streams completed, others (e.g. gates)
+    # are done once they took every event
+    while not task.done() and atom.queue_stats().depth:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await atom.aexit()
+    return events / elapsed
+
+
+FLOWS = {
+    "linear_10": lambda: build_fanout_flow(1, 10),
+    "fanout_8x2": lambda: build_fanout_flow(8, 2),
+    "fanin_8": lambda: build_fanin_flow(8),
+    "diamond_4": lambda: build_diamond_flow(4),
+}
+
+
+async def flow_latency(
+    shape: str, mode: ExecutionMode, runs: int, items: int
+) -> Tuple[float, float, float]:
+    """Returns the median and p95 latency (in seconds) of assignations with
+    one item, and the events/s of an assignation with `items` items"""
+    flow = FLOWS[shape]()
+    metrics = MemoryMetrics()
+    actor = build_flow_actor(
+        flow, execution_mode=mode, tracking_mode=TrackingMode.OFF, metrics=metrics
+    )
+    await actor.on_provide(actor.passport)
+
+    async def assign(value) -> float:
+        start = time.perf_counter()
+        await actor.on_assign(
+            Assignment(assignation="1", args=[value]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+        return time.perf_counter() - start
+
+    await assign([1])  # Warm up (and fill the atom pool)
+    latencies = sorted([await assign([1]) for _ in range(runs)])
+    metrics.clear()
+    elapsed = await assign(list(range(items)))
+    events = sum(metrics.counters(Metric.EVENTS_OUT).values())
+    await actor.on_unprovide()
+
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return statistics.median(latencies), p95, events / elapsed
+
+
+async def memory_per_queued_event(events: int) -> float:
+    node = reactive("ADD", number=1)
+    atom = atomify(
+        node,
+        MockTransport(queue=asyncio.Queue()),
+        None,
+        {},
+        Assignment(assignation="1"),
+    )
+    await atom.aenter()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for t in range(events):
+        await atom.put(
+            RawInEvent(
+                target=node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    await atom.aexit()
+    return (after - before) / events
+
+
+async def memory_per_in_flight_map(events: int) -> float:
+    node = arkitekt(strategy="ORDERED", max_in_flight=events)
+    block = asyncio.Event()
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(
+        node, transport, EchoContract(block), {}, Assignment(assignation="1")
+    )
+    await atom.aenter()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    task = asyncio.create_task(atom.start())
+    for t in range(events):
+        await atom.put(
+            RawInEvent(
+                target=node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    while len(atom.runningEvents) < events:
+        await asyncio.sleep(0.01)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await atom.aexit()
+    return (after - before) / events
+
+
+def result(name: str, metric: str, value: float, unit: str, **params) -> Dict:
+    return {"name": name, "metric": metric, "value": value, "unit": unit, **params}
+
+
+def run_suite(quick: bool = False) -> List[Dict]:
+    events = 2000 if quick else 20000
+    runs, items = (20, 200) if quick else (100, 2000)
+    results = []
+
+    for kind in ATOMS:
+        value = asyncio.run(atom_throughput(kind, events))
+        results.append(result(f"atom.{kind}", "throughput", value, "events/s"))
+        print(f"atom.{kind:<22} {value:12.0f} events/s")
+
+    for shape in FLOWS:
+        for mode in ExecutionMode:
+            median, p95, throughput = asyncio.run(
+                flow_latency(shape, mode, runs, items)
+            )
+            name = f"flow.{shape}.{mode.value.lower()}"
+            results += [
+                result(name, "latency_p50", median * 1000, "ms"),
+                result(name, "latency_p95", p95 * 1000, "ms"),
+                result(name, "throughput", throughput, "events/s"),
+            ]
+            print(
+                f"{name:<28} p50 {median * 1000:7.2f} ms | p95 {p95 * 1000:7.2f} ms"
+                f" | {throughput:9.0f} events/s"
+            )
+
+    for name, measure in (
+        ("memory.queued_event", memory_per_queued_event),
+        ("memory.in_flight_map", memory_per_in_flight_map),
+    ):
+        value = asyncio.run(measure(events // 4))
+        results.append(result(name, "memory", value, "bytes/event"))
+        print(f"{name:<28} {value:9.0f} bytes/event")
+
+    return results
+
+
+def metadata(quick: bool) -> Dict:
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    try:
+        from importlib.metadata import version
+
+        reaktion_version = version("reaktion")
+    except Exception:
+        reaktion_version = None
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "reaktion": reaktion_version,
+        "revision": revision,
+        "quick": quick,
+    }
+
+
+def compare(results: List[Dict], baseline: Dict):
+    """Prints the ratio of every result to the same result of a baseline
+    (> 1 is better, i.e. more events/s or less latency and memory)"""
+    previous = {(r["name"], r["metric"]): r["value"] for r in baseline["results"]}
+    print(f"\nCompared to {baseline['meta'].get('revision')}:")
+    for r in results:
+        old = previous.get((r["name"], r["metric"]))
+        if not old or not r["value"]:
+            continue
+        ratio = r["value"] / old if r["unit"] == "events/s" else old / r["value"]
+        print(f"{r['name']:<28} {r['metric']:<12} {ratio:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer events and runs")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare to the results in this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    logging.disable(logging.WARNING)
+    report = {"meta": metadata(args.quick), "results": run_suite(args.quick)}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        compare(report["results"], baseline)
+
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,11 @@
 import logging
-from typing import Callable, Dict
+import time
+from typing import Callable, Dict, List, Optional
 import asyncio
 from pydantic import BaseModel, Field
 
 from fluss.api.schema import (
-    ArgNodeFragment,
-    ArkitektNodeFragment,
     FlowFragment,
-    LocalNodeFragment,
-    ReactiveNodeFragment,
-    ArkitektFilterNodeFragment,
-    ReturnNodeFragment,
     arun,
     asnapshot,
     atrack,
@@ -18,13 +13,27 @@ from fluss.api.schema import (
     astart_trace,
     atrace,
 )
-from reaktion.atoms.transport import AtomTransport
+from reaktion.atoms.transport import AtomTransport, DirectTransport, ExecutionMode
 
+from reaktion.atoms.base import Atom, atom_options
 from reaktion.atoms.utils import atomify
 from reaktion.contractors import NodeContractor, arkicontractor
 from reaktion.events import EventType, InEvent, OutEvent
 
-from reaktion.utils import connected_events
+from reaktion.trace import tracer
+from reaktion.tracking import DropPolicy, RunTracker, TrackingMode
+from reaktion.compiled import CompiledFlow, compile_flow
+from reaktion.metrics import (
+    MemoryMetrics,
+    Metric,
+    MetricsSink,
+    PrometheusExporter,
+    current_metrics,
+)
+from reaktion.partition import Placement, ProcessEngine
+from reaktion.atoms.executors import Executors, current_executors
+from reaktion.payloads import PayloadStore, current_payloads
+from reaktion.utils import routed_events
 from rekuest.actors.base import Actor
 from rekuest.api.schema import (
     AssignationStatus,
@@ -49,6 +58,20 @@ class NodeState(BaseModel):
     latestevent: OutEvent
 
 
+class RunState(BaseModel):
+    """The state of one running assignation (isolated from other runs)"""
+
+    assignment: Assignment
+    run: Any
+    tracker: RunTracker
+    payloads: PayloadStore = Field(default_factory=PayloadStore)
+    atoms: Dict[str, Atom] = Field(default_factory=dict)
+    started: float = Field(default_factory=time.monotonic)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
 class FlowActor(Actor):
     definition: NodeFragment
     is_generator: bool = False
@@ -65,6 +88,51 @@ class FlowActor(Actor):
     contract_states: Dict[str, ContractStatus] = Field(default_factory=dict)
     contract_t: int = 0
 
+    track_flush_size: int = 50
+    """ The maximum number of events that are tracked in one batch"""
+    track_flush_interval: float = 0.5
+    """ The maximum time (in seconds) an event waits before it is tracked"""
+    track_max_pending: int = 1000
+    """ The maximum number of events that are waiting to be tracked"""
+    track_drop_policy: DropPolicy = DropPolicy.DROP_OLDEST
+    """ What to do if more than track_max_pending events are waiting"""
+    tracking_mode: TrackingMode = TrackingMode.ALL
+    """ Which events are tracked (all, none, errors, sampled or rate limited)"""
+    tracking_sample_every: int = 10
+    """ Track every nth NEXT event per node (TrackingMode.SAMPLE)"""
+    tracking_rate_limit: int = 1
+    """ Maximum NEXT events tracked per node and window (TrackingMode.RATE)"""
+    tracking_rate_window: float = 1.0
+    """ The window (in seconds) of the rate limit (TrackingMode.RATE)"""
+
+    atom_queue_size: int = 0
+    """ The default capacity of the queue of every atom (0 is unbounded).
+    Producers wait for free capacity in the atoms they send events to."""
+    execution_mode: ExecutionMode = ExecutionMode.CENTRAL
+    """ Whether events pass through the dispatch loop of the actor (CENTRAL),
+    or atoms send them straight to each other (DIRECT)"""
+    pool_atoms: bool = True
+    """ Reuse the atoms of finished assignations (after resetting them),
+    instead of atomifying every node again"""
+    process_partitions: int = 0
+    """ The number of worker processes that the nodes placed in a process
+    are partitioned across (0 runs every node in the actor)"""
+    placement: Placement = Placement.LOCAL
+    """ The placement of the nodes without a placement default. Only
+    reactive nodes can be placed in a process"""
+    payload_threshold: int = 0
+    """ Buffer-like values (bytes, numpy arrays) of at least this many bytes
+    are passed through the graph by reference, and only materialized for
+    Arkitekt nodes and the returns (0 passes every value as it is)"""
+    metrics: Optional[MetricsSink] = None
+    """ Receives the queue wait, processing and dispatch times and the event
+    and error counts of every node (None, the default, disables them, as
+    recording them costs throughput)"""
+    metrics_port: Optional[int] = None
+    """ Serve the metrics (of a MemoryMetrics sink) in the Prometheus text
+    format on this local port. Records them in a MemoryMetrics, if the actor
+    has no sink"""
+
     # Functionality for running the flow
 
     # Assign Related Functionality
@@ -79,17 +147,44 @@ class FlowActor(Actor):
     atomifier: Callable = atomify
     """ Atomifier is a function that takes a node and returns an atom """
 
-    run_states: Dict[
-        str,
-        Dict[str, NodeState],
-    ] = Field(default_factory=dict)
+    max_parallel_runs: int = 0
+    """ The maximum number of assignations that run at the same time on this
+    provision (0 is unlimited). Further assignations wait for a free slot."""
+
+    run_states: Dict[str, RunState] = Field(default_factory=dict)
+    """ The state of every running assignation (by assignation id)"""
 
     reservation_state: Dict[str, ReservationFragment] = Field(default_factory=dict)
     _lock = None
     _condition = None
+    _compiled: CompiledFlow = None
+    _atom_pool: Dict[str, List[Atom]] = None
+    _run_slots: Optional[asyncio.Semaphore] = None
+    _engine: Optional[ProcessEngine] = None
+    _exporter: Optional[PrometheusExporter] = None
+    _executors: Optional[Executors] = None
 
     async def on_provide(self, passport: Passport):
         self._lock = asyncio.Lock()
+        self._compiled = compile_flow(self.flow)
+        self._executors = Executors()
+        self._atom_pool = {}
+        self._run_slots = (
+            asyncio.Semaphore(self.max_parallel_runs)
+            if self.max_parallel_runs
+            else None
+        )
+
+        if self.process_partitions:
+            engine = ProcessEngine.from_flow(
+                self._compiled,
+                self.process_partitions,
+                default=self.placement,
+                queue_size=self.atom_queue_size,
+            )
+            if engine.partitions:
+                await engine.aenter()
+                self._engine = engine
 
         self._condition = await self.start_trace_mutation(
             provision=passport.provision,
@@ -97,25 +192,100 @@ class FlowActor(Actor):
             snapshot_interval=self.condition_snapshot_interval,
         )
 
-        [x for x in self.flow.graph.nodes if isinstance(x, ArgNodeFragment)][0]
-        [x for x in self.flow.graph.nodes if isinstance(x, ReturnNodeFragment)][0]
-
-        arkitektNodes = [
-            x
-            for x in self.flow.graph.nodes
-            if isinstance(x, ArkitektNodeFragment)
-            or isinstance(x, ArkitektFilterNodeFragment)
-        ]
-
         arkitekt_contracts = {
             node.id: await self.arkitekt_contractor(node, self)
-            for node in arkitektNodes
+            for node in self._compiled.contract_nodes
         }
 
         self.contracts = {**arkitekt_contracts}
         futures = [contract.aenter() for contract in self.contracts.values()]
         await asyncio.gather(*futures)
 
+        if self.metrics_port is not None and self.metrics is None:
+            self.metrics = MemoryMetrics()
+        if self.metrics_port is not None and isinstance(self.metrics, MemoryMetrics):
+            self._exporter = PrometheusExporter(self.metrics, port=self.metrics_port)
+            await self._exporter.aenter()
+
+    def acquire_atoms(
+        self,
+        transport: AtomTransport,
+        assignment: Assignment,
+        globalMap: Dict[str, Dict[str, Any]],
+        alog: Callable,
+    ) -> Dict[str, Atom]:
+        """Gets an atom for every atom node, reusing pooled atoms if possible
+
+        Nodes that are placed in a process get a RemoteAtom, and start the
+        run on their workers.
+        """
+        remote = (
+            self._engine.remote_atoms(assignment.id, transport, assignment, globalMap)
+            if self._engine
+            else {}
+        )
+
+        atoms = {}
+        for x in self._compiled.atom_nodes:
+            if x.id in remote:
+                atoms[x.id] = remote[x.id]
+                continue
+
+            globals = globalMap.get(x.id, {})
+            atom = self._pooled_atom(x.id, globals) if self.pool_atoms else None
+            if atom is not None:
+                atom.reset(transport, assignment, globals, alog)
+            else:
+                atom = self.atomifier(
+                    x,
+                    transport,
+                    self.contracts.get(x.id, None),
+                    globals,
+                    assignment,
+                    alog=alog,
+                    queue_size=self.atom_queue_size,
+                )
+            atoms[x.id] = atom
+
+        return atoms
+
+    def _pooled_atom(self, node_id: str, globals: Dict[str, Any]) -> Optional[Atom]:
+        """Takes a pooled atom of the node from the pool
+
+        Globals can set atom options (and so select another atom, e.g. a
+        buffer window), so only atoms that were set up with the same atom
+        options are reused.
+        """
+        pooled = self._atom_pool.get(node_id, [])
+        options = atom_options(globals)
+        for index in reversed(range(len(pooled))):
+            if atom_options(pooled[index].globals) == options:
+                return pooled.pop(index)
+        return None
+
+    async def release_atoms(self, atoms: Dict[str, Atom], tasks: List[asyncio.Task]):
+        """Cancels the atoms that are still running, exits every atom (also
+        those that were never started, e.g. because the run failed while
+        setting up) and returns the stopped ones to the pool"""
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        # The tasks are started in the order of the atoms (and can be
+        # followed by the pump of the engine)
+        started = dict(zip(atoms, tasks))
+        for node_id, atom in atoms.items():
+            try:
+                await atom.aexit()
+            except Exception:
+                logger.exception("Atom %s failed to exit", node_id)
+                continue
+
+            task = started.get(node_id)
+            if self.pool_atoms and atom.poolable and task is not None and task.done():
+                self._atom_pool.setdefault(node_id, []).append(atom)
+
     async def on_local_log(self, reference, *args, **kwargs):
         logger.log(f"Contract log for {reference} {args} {kwargs}")
 
@@ -133,7 +303,7 @@ class FlowActor(Actor):
     async def on_contract_change(
         self, state: ContractStatus = None, reference: str = None
     ):
-        logger.debug(f"Contract change {reference}: {state} ")
+        logger.debug("Contract change %s: %s", reference, state)
 
         async with self._lock:
             if reference:
@@ -170,97 +340,148 @@ class FlowActor(Actor):
 
             self.contract_t += 1
 
+    @property
+    def active_runs(self) -> int:
+        return len(self.run_states)
+
     async def on_assign(
         self,
         assignment: Assignment,
         collector: AssignationCollector,
         transport: AssignTransport,
     ):
+        if not self._run_slots:
+            return await self.run_assignment(assignment, collector, transport)
+
+        try:
+            if self._run_slots.locked():
+                await transport.log(level="INFO", message="Waiting for a free run slot")
+            await self._run_slots.acquire()
+        except asyncio.CancelledError:
+            await transport.change(status=AssignationStatus.CANCELLED)
+            return
+
+        try:
+            await self.run_assignment(assignment, collector, transport)
+        finally:
+            self._run_slots.release()
+
+    async def run_assignment(
+        self,
+        assignment: Assignment,
+        collector: AssignationCollector,
+        transport: AssignTransport,
+    ):
+        """Runs the flow for an assignation
+
+        Everything an assignation changes lives in its RunState, so that
+        many assignations can run concurrently on one provision, sharing
+        the contracts (and pooled atoms) of the actor.
+        """
         run = await self.run_mutation(
             assignation=assignment.assignation,
             flow=self.flow,
             snapshot_interval=self.snapshot_interval,
         )
-        print(self.is_generator)
+
+        tracker = RunTracker(
+            run=run,
+            track_mutation=self.track_mutation,
+            snapshot_mutation=self.snapshot_mutation,
+            snapshot_interval=self.snapshot_interval,
+            flush_size=self.track_flush_size,
+            flush_interval=self.track_flush_interval,
+            max_pending=self.track_max_pending,
+            drop_policy=self.track_drop_policy,
+            mode=self.tracking_mode,
+            sample_every=self.tracking_sample_every,
+            rate_limit=self.tracking_rate_limit,
+            rate_window=self.tracking_rate_window,
+        )
+        await tracker.aenter()
+
+        payloads = PayloadStore(threshold=self.payload_threshold)
+        state = RunState(
+            assignment=assignment, run=run, tracker=tracker, payloads=payloads
+        )
+        self.run_states[assignment.id] = state
 
         await transport.log(level="INFO", message="Starting")
 
         t = 0
-        state = {}
-        await self.snapshot_mutation(run=run, events=list(state.values()), t=t)
-
+        atoms = {}
+        tasks = []
+        await tracker.asnapshot(t)
+
+        # The atoms of the run (and their tasks) resolve refs in its store
+        # and record their metrics in the sink of the actor
+        payloads_token = current_payloads.set(payloads)
+        metrics_token = current_metrics.set(self.metrics)
+        executors_token = current_executors.set(self._executors)
         try:
             event_queue = asyncio.Queue()
 
-            atomtransport = AtomTransport(queue=event_queue)
-
-            argNode = [
-                x for x in self.flow.graph.nodes if isinstance(x, ArgNodeFragment)
-            ][0]
-            returnNode = [
-                x for x in self.flow.graph.nodes if isinstance(x, ReturnNodeFragment)
-            ][0]
-
-            participatingNodes = [
-                x
-                for x in self.flow.graph.nodes
-                if isinstance(x, ArkitektNodeFragment)
-                or isinstance(x, ArkitektFilterNodeFragment)
-                or isinstance(x, ReactiveNodeFragment)
-                or isinstance(x, LocalNodeFragment)
-            ]
-
-            await transport.log(level="INFO", message="Set up the graph")
-
-            stream = self.flow.graph.args
-            stream_keys = []
-            for i in stream:
-                stream_keys.append(i.key)
+            compiled = self._compiled
+            routing_table = (
+                self._engine.routing_table if self._engine else compiled.routing_table
+            )
+            argNode = compiled.arg_node
+            returnNode = compiled.return_node
 
-            global_keys = []
-            for i in self.flow.graph.globals:
-                global_keys.append(i.port.key)
+            metrics = self.metrics
 
-            globalMap: Dict[str, Dict[str, Any]] = {}
-            streamMap: Dict[str, Any] = {}
+            async def observe(event: OutEvent, t: int):
+                if metrics is not None:
+                    metrics.observe(event.source, Metric.EVENTS_OUT)
+                    if event.type == EventType.ERROR:
+                        metrics.observe(event.source, Metric.ERRORS)
+                await tracker.track(event, t)
+
+            direct = self.execution_mode == ExecutionMode.DIRECT
+            if direct:
+                atomtransport = DirectTransport(
+                    queue=event_queue,
+                    routing_table=routing_table,
+                    observe=observe,
+                    brittle=self.flow.brittle,
+                    sink=returnNode.id,
+                )
+            else:
+                atomtransport = AtomTransport(queue=event_queue)
 
-            assert len(self.definition.args) == len(
-                assignment.args
-            ), "Wrong number of args"
+            await transport.log(level="INFO", message="Set up the graph")
 
-            for port, arg in zip(self.definition.args, assignment.args):
-                if port.key in stream_keys:
-                    streamMap[port.key] = arg
-                if port.key in global_keys:
-                    for i in self.flow.graph.globals:
-                        if i.port.key == port.key:
-                            for map in i.to_keys:
-                                nodeid, key = map.split(".")
-                                globalMap.setdefault(nodeid, {})[key] = arg
+            value, globalMap = compiled.bind(self.definition.args, assignment.args)
+            value = [payloads.ref(item) for item in value]
 
             async def ass_log(assignation: Assignation, level, message):
                 await transport.log(level, message)
-                logging.info(f"{assignation}, {message}")
+                logger.debug("%s, %s", assignation, message)
 
-            atoms = {
-                x.id: self.atomifier(
-                    x,
-                    atomtransport,
-                    self.contracts.get(x.id, None),
-                    globalMap.get(x.id, {}),
-                    assignment,
-                    alog=ass_log,
-                )
-                for x in participatingNodes
-            }
+            atoms = self.acquire_atoms(atomtransport, assignment, globalMap, ass_log)
+            state.atoms = atoms
+
+            async def reserve(event: OutEvent):
+                for edge_target in routing_table.get((event.source, event.handle), ()):
+                    if edge_target.target in atoms:
+                        await atoms[edge_target.target].reserve()
+
+            if direct:
+                # Producers wait on the bounded atoms themselves
+                atomtransport.atoms = atoms
+            else:
+                atomtransport.gate = reserve
 
             await transport.log(level="INFO", message="Atomification complete")
 
-            await asyncio.gather(*[atom.aenter() for atom in atoms.values()])
+            for atom in atoms.values():
+                await atom.aenter()
             tasks = [asyncio.create_task(atom.start()) for atom in atoms.values()]
-            logger.info("Starting all Atoms")
-            value = [streamMap[key] for key in stream_keys]
-
+            if self._engine:
+                tasks.append(
+                    asyncio.create_task(self._engine.pump(assignment.id, atomtransport))
+                )
+            tracer.run("started", assignment.id, atoms=len(atoms))
             initial_event = OutEvent(
                 handle="return_0",
                 type=EventType.NEXT,
@@ -275,20 +496,17 @@ class FlowActor(Actor):
                 caused_by=[t],
             )
 
-            logger.info(f"Putting initial event {initial_event}")
+            if tracer.events:
+                tracer.event("initial", initial_event)
 
-            await event_queue.put(initial_event)
-            await event_queue.put(initial_done_event)
-
-            edge_targets = [e.target for e in self.flow.graph.edges]
-            nodes_without_instream = [
-                x
-                for x in participatingNodes
-                if len(x.instream[0]) == 0 and x.id not in edge_targets
-            ]
+            if direct:
+                await atomtransport.put(initial_event)
+                await atomtransport.put(initial_done_event)
+            else:
+                await event_queue.put(initial_event)
+                await event_queue.put(initial_done_event)
 
-            for node in nodes_without_instream:
-                assert node.id in atoms, "Atom not found. Should not happen."
+            for node in compiled.source_nodes:
                 atom = atoms[node.id]
 
                 initial_event = InEvent(
@@ -315,64 +533,57 @@ class FlowActor(Actor):
             while not complete:
                 event: OutEvent = await event_queue.get()
                 event_queue.task_done()
-
-                if self.flow.brittle:
-                    if event.type == EventType.ERROR:
-                        raise event.value
-
-                track = await self.track_mutation(
-                    run=run,
-                    source=event.source,
-                    handle=event.handle,
-                    caused_by=event.caused_by,
-                    value=(
-                        event.value
-                        if event.value and not isinstance(event.value, Exception)
-                        else str(event.value)
-                    ),
-                    type=event.type,
-                    t=t,
-                )
-                state[event.source] = track.id
-
-                # We tracked the events and proceed
-
-                if t % self.snapshot_interval == 0:
-                    await self.snapshot_mutation(
-                        run=run, events=list(state.values()), t=t
-                    )
-
-                # Creat new events with the new timepoint
-                spawned_events = connected_events(self.flow.graph, event, t)
-                # Increment timepoint
-                t += 1
-                # needs to be the old one for now
-                if not spawned_events:
-                    logger.warning(f"No events spawned from {event}")
+                dispatch_start = time.monotonic()
+
+                if direct:
+                    # Already tracked and routed by the transport
+                    spawned_events = [event]
+                    t = atomtransport.t
+                else:
+                    if self.flow.brittle:
+                        if event.type == EventType.ERROR:
+                            raise event.value
+
+                    # Events of a partition keep the timepoint of their worker
+                    event_t = event.t
+                    if event_t is None:
+                        event_t = t
+                        # Increment timepoint
+                        t += 1
+
+                    # Tracking (and snapshotting) happens in the background
+                    await observe(event, event_t)
+
+                    # Creat new events with the new timepoint
+                    spawned_events = routed_events(routing_table, event, event_t)
+                    # needs to be the old one for now
+                    if not spawned_events and tracer.events:
+                        # e.g. events within a partition, or unconnected outputs
+                        tracer.event("unrouted", event)
 
                 for spawned_event in spawned_events:
-                    logger.info(f"-> {spawned_event}")
+                    if tracer.events:
+                        tracer.event("->", spawned_event)
 
                     if spawned_event.target == returnNode.id:
                         if spawned_event.type == EventType.NEXT:
-                            returns = spawned_event.value
+                            returns = tuple(
+                                payloads.materialize(item)
+                                for item in spawned_event.value
+                            )
                             if self.is_generator:
-                                print("Yielded")
+                                tracer.run("yielded", assignment.id)
                                 await transport.change(
                                     status=AssignationStatus.YIELD,
                                     returns=returns,
                                 )
 
                         if spawned_event.type == EventType.ERROR:
-                            await self.snapshot_mutation(
-                                run=run, events=list(state.values()), t=t
-                            )
+                            await tracker.asnapshot(t)
                             raise spawned_event.value
 
                         if spawned_event.type == EventType.COMPLETE:
-                            await self.snapshot_mutation(
-                                run=run, events=list(state.values()), t=t
-                            )
+                            await tracker.asnapshot(t)
                             complete = True
                             if not self.is_generator:
                                 await transport.change(
@@ -380,32 +591,35 @@ class FlowActor(Actor):
                                     returns=returns,
                                 )
                             else:
-                                print("Done")
                                 await transport.change(
                                     status=AssignationStatus.DONE,
                                 )
 
-                            logger.info("Done ! :)")
+                            tracer.run("done", assignment.id, t=t)
 
                     else:
-                        assert (
-                            spawned_event.target in atoms
-                        ), "Unknown target. Your flow is connected wrong"
-                        if spawned_event.target in atoms:
-                            await atoms[spawned_event.target].put(spawned_event)
+                        # Every other target is an atom (see validate_graph)
+                        await atoms[spawned_event.target].put(spawned_event)
+
+                if metrics is not None and not direct:
+                    metrics.observe(
+                        event.source, Metric.DISPATCH, time.monotonic() - dispatch_start
+                    )
 
             for task in tasks:
                 task.cancel()
 
             await asyncio.gather(*tasks, return_exceptions=True)
-            logging.info("Collecting...")
+            if logger.isEnabledFor(logging.DEBUG):
+                for atom in atoms.values():
+                    logger.debug("Queue stats %s", atom.queue_stats())
             await self.collector.collect(assignment.id)
-            logging.info("Done ! :)")
+            tracer.run("collected", assignment.id)
 
         except asyncio.CancelledError:
             for task in tasks:
                 task.cancel()
-            await self.snapshot_mutation(run=run, events=list(state.values()), t=t)
+            await tracker.asnapshot(t)
 
             try:
                 await asyncio.wait_for(
@@ -419,7 +633,7 @@ class FlowActor(Actor):
 
         except Exception as e:
             logging.critical(f"Assignation {assignment} failed", exc_info=True)
-            await self.snapshot_mutation(run=run, events=list(state.values()), t=t)
+            await tracker.asnapshot(t)
             await transport.log(message="Starting", level=AssignationStatus.ERROR)
 
             await self.collector.collect(assignment.id)
@@ -428,6 +642,34 @@ class FlowActor(Actor):
                 message=repr(e),
             )
 
+        finally:
+            await tracker.aexit()
+            if self._engine:
+                self._engine.stop_run(assignment.id)
+            await self.release_atoms(atoms, tasks)
+            logger.debug(
+                "Run %s copied %s bytes of payloads (%s bytes by reference)",
+                assignment.id,
+                payloads.bytes_copied,
+                payloads.bytes_referenced,
+            )
+            payloads.release()
+            current_payloads.reset(payloads_token)
+            current_metrics.reset(metrics_token)
+            current_executors.reset(executors_token)
+            self.run_states.pop(assignment.id, None)
+
     async def on_unprovide(self):
+        self._atom_pool = {}
+        if self._exporter:
+            await self._exporter.aexit()
+            self._exporter = None
+        if self._engine:
+            await self._engine.aexit()
+            self._engine = None
         for contract in self.contracts.values():
             await contract.aexit()
+        if self._executors is not None:
+            # Joins the threads and worker processes of the local nodes
+            executors, self._executors = self._executors, None
+            await asyncio.get_running_loop().run_in_executor(None, executors.shutdown)
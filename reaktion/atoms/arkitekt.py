@@ -6,8 +6,15 @@ from reaktion.atoms.helpers import node_to_reference
 
 from fluss.api.schema import ArkitektNodeFragment
 
-from reaktion.atoms.generic import MapAtom, MergeMapAtom, AsCompletedAtom, OrderedAtom
+from reaktion.atoms.generic import (
+    MapAtom,
+    MergeMapAtom,
+    AsCompletedAtom,
+    OrderedAtom,
+    BatchMapAtom,
+)
 from reaktion.events import InEvent
+from reaktion.payloads import materialize, reference
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,47 +25,88 @@ class ArkitektMapAtom(MapAtom):
     contract: RPCContract
 
     async def map(self, event: InEvent) -> Optional[List[Any]]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = materialize(arg)
 
         returns = await self.contract.aassign_retry(
             kwargs=kwargs,
             parent=self.assignment,
-            reference=node_to_reference(self.node, event),
+            reference=node_to_reference(self.node, event, self.assignment),
         )
 
         out = []
         stream_one = self.node.outstream[0]
         for arg in stream_one:
-            out.append(returns[arg.key])
+            out.append(reference(returns[arg.key]))
 
         return out
         # return await self.contract.aassign(*args)
 
 
+class ArkitektBatchMapAtom(BatchMapAtom):
+    """Maps batches of events with one assignment
+
+    Used for nodes that opt in with the `batchable` default, i.e. that accept
+    a batch of their args: every arg is assigned as the list of the values
+    of the batch and every return is expected to be a list of the same
+    length (that is fanned back out, one value per event).
+    """
+
+    node: ArkitektNodeFragment
+    contract: RPCContract
+
+    async def map_batch(self, events: List[InEvent]) -> List[List[Any]]:
+        kwargs = self.assign_values
+
+        stream_one = self.node.instream[0]
+        for index, item in enumerate(stream_one):
+            kwargs[item.key] = [materialize(event.value[index]) for event in events]
+
+        returns = await self.contract.aassign_retry(
+            kwargs=kwargs,
+            parent=self.assignment,
+            reference=node_to_reference(self.node, events[0], self.assignment),
+        )
+
+        stream_one = self.node.outstream[0]
+        columns = [returns[arg.key] for arg in stream_one]
+        for column in columns:
+            if len(column) != len(events):
+                raise ValueError(
+                    f"{self.node.id} returned {len(column)} results for a batch of"
+                    f" {len(events)}"
+                )
+
+        return (
+            [[reference(value) for value in row] for row in zip(*columns)]
+            if columns
+            else [[]] * len(events)
+        )
+
+
 class ArkitektMergeMapAtom(MergeMapAtom):
     node: ArkitektNodeFragment
     contract: RPCContract
 
     async def merge_map(self, event: InEvent) -> Optional[List[Any]]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = materialize(arg)
 
         async for r in self.contract.astream_retry(
             kwargs=kwargs,
             parent=self.assignment,
-            reference=node_to_reference(self.node, event),
+            reference=node_to_reference(self.node, event, self.assignment),
         ):
             out = []
             stream_one = self.node.outstream[0]
             for arg in stream_one:
-                out.append(r[arg.key])
+                out.append(reference(r[arg.key]))
 
             yield out
 
@@ -68,22 +116,22 @@ class ArkitektAsCompletedAtom(AsCompletedAtom):
     contract: RPCContract
 
     async def map(self, event: InEvent) -> Optional[List[Any]]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = materialize(arg)
 
         returns = await self.contract.aassign_retry(
             kwargs=kwargs,
             parent=self.assignment,
-            reference=node_to_reference(self.node, event),
+            reference=node_to_reference(self.node, event, self.assignment),
         )
 
         out = []
         stream_one = self.node.outstream[0]
         for arg in stream_one:
-            out.append(returns[arg.key])
+            out.append(reference(returns[arg.key]))
 
         return out
 
@@ -93,21 +141,21 @@ class ArkitektOrderedAtom(OrderedAtom):
     contract: RPCContract
 
     async def map(self, event: InEvent) -> Optional[List[Any]]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = materialize(arg)
 
         returns = await self.contract.aassign_retry(
             kwargs=kwargs,
             parent=self.assignment,
-            reference=node_to_reference(self.node, event),
+            reference=node_to_reference(self.node, event, self.assignment),
         )
 
         out = []
         stream_one = self.node.outstream[0]
         for arg in stream_one:
-            out.append(returns[arg.key])
+            out.append(reference(returns[arg.key]))
 
         return out
@@ -14,6 +14,7 @@ from reaktion.atoms.generic import (
     FilterAtom,
 )
 from reaktion.events import InEvent
+from reaktion.payloads import materialize
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,15 +25,15 @@ class ArkitektFilterAtom(FilterAtom):
     contract: RPCContract
 
     async def filter(self, event: InEvent) -> Optional[bool]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = materialize(arg)
 
         returns = await self.contract.aassign_retry(
             kwargs=kwargs,
             parent=self.assignment,
-            reference=node_to_reference(self.node, event),
+            reference=node_to_reference(self.node, event, self.assignment),
         )
         return all([r for r in returns.values()])
@@ -1,11 +1,15 @@
 import asyncio
-from typing import Awaitable, Callable, Optional
+import time
+from collections import deque
+from typing import Awaitable, Callable, ClassVar, Deque, NamedTuple, Optional
 from pydantic import BaseModel, Field
 from rekuest.api.schema import AssignationLogLevel
 from rekuest.messages import Assignation
 from fluss.api.schema import FlowNodeCommonsFragmentBase
 from reaktion.atoms.errors import AtomQueueFull
-from reaktion.events import EventType, InEvent, OutEvent
+from reaktion.events import EventType, InEvent, RawOutEvent
+from reaktion.metrics import Metric, MetricsSink, current_metrics
+from reaktion.trace import tracer
 import logging
 from rekuest.actors.types import Assignment
 from reaktion.atoms.transport import AtomTransport
@@ -14,6 +18,66 @@ from typing import Dict, Any
 logger = logging.getLogger(__name__)
 
 
+ATOM_OPTIONS = (
+    "queue_size",
+    "max_in_flight",
+    "in_flight_mode",
+    "batchable",
+    "batch_size",
+    "batch_timeout",
+    "placement",
+    "partition",
+    "executor",
+    "executor_workers",
+    "spill_after",
+    "spill_dir",
+    "buffer_count",
+    "buffer_time",
+    "in_place",
+)
+""" Node defaults that configure the atom itself (and are not passed on as kwargs)"""
+
+
+BOUND_FIELDS = (
+    "node",
+    "contract",
+    "transport",
+    "alog",
+    "globals",
+    "assignment",
+    "queue_size",
+)
+""" Fields that are set when an atom is bound to an assignment (and kept
+when the atom is reset)"""
+
+
+def merge_values(
+    node: FlowNodeCommonsFragmentBase, globals: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """The values that are set on a node: its defaults, overwritten
+    by the globals that are routed to it"""
+    defaults = getattr(node, "defaults", {}) or {}
+    return {**defaults, **(globals or {})}
+
+
+def atom_options(values: Dict[str, Any]) -> Dict[str, Any]:
+    """The atom options among the set values (see ATOM_OPTIONS)"""
+    return {key: value for key, value in values.items() if key in ATOM_OPTIONS}
+
+
+class AtomQueueStats(NamedTuple):
+    node: str
+    """ The node of the atom"""
+    depth: int
+    """ The number of events currently waiting in the queue"""
+    capacity: int
+    """ The capacity of the queue (0 is unbounded)"""
+    high_water: int
+    """ The maximum depth the queue reached"""
+    waits: int
+    """ How often a producer had to wait for free capacity"""
+
+
 class Atom(BaseModel):
     node: FlowNodeCommonsFragmentBase
     transport: AtomTransport
@@ -22,29 +86,174 @@ class Atom(BaseModel):
     )
     globals: Dict[str, Any] = Field(default_factory=dict)
     assignment: Assignment
+    queue_size: int = 0
+    """ The capacity of the queue of the atom (0 is unbounded). Can be
+    overwritten by the queue_size node default"""
+
+    poolable: ClassVar[bool] = True
+    """ Whether the atom can be reset and reused (see FlowActor.pool_atoms)"""
 
     _private_queue: asyncio.Queue = None
+    _free: Optional[int] = None
+    _has_space: asyncio.Event = None
+    _reserved: int = 0
+    _high_water: int = 0
+    _waits: int = 0
+    _next: Optional[asyncio.Task] = None
+    _metrics: Optional[MetricsSink] = None
+    _enqueued: Optional[Deque[float]] = None
 
     async def run(self):
         raise NotImplementedError("This needs to be implemented")
 
+    @property
+    def capacity(self) -> int:
+        return self.set_values.get("queue_size", self.queue_size) or 0
+
     async def get(self) -> InEvent:
         assert self._private_queue is not None, "Atom not started"
-        return await self._private_queue.get()
+        event = await self._private_queue.get()
+        if self._free is not None:
+            self._free += 1
+            self._has_space.set()
+        if self._metrics is not None:
+            wait = time.monotonic() - self._enqueued.popleft()
+            self._metrics.observe(self.node.id, Metric.QUEUE_WAIT, wait)
+            self._metrics.observe(self.node.id, Metric.EVENTS_IN)
+        return event
+
+    def observe(self, metric: Metric, value: float = 1):
+        """Records a metric of this atom (if the run collects metrics)"""
+        if self._metrics is not None:
+            self._metrics.observe(self.node.id, metric, value)
+
+    async def next_event(self, timeout: Optional[float] = None) -> Optional[InEvent]:
+        """Gets the next event, or None if none arrived within the timeout
+
+        The pending get is kept (and not cancelled) on timeout, so no event
+        can be lost.
+        """
+        if self._next is None:
+            self._next = asyncio.create_task(self.get())
+
+        done, _ = await asyncio.wait({self._next}, timeout=timeout)
+        if not done:
+            return None
+
+        event = self._next.result()
+        self._next = None
+        return event
+
+    async def reserve(self):
+        """Reserves capacity for an event that will be put into this atom
+
+        Producers reserve the capacity before they hand an event to the
+        transport, so they block (and stop consuming their own queue) when
+        this atom falls behind. This propagates backpressure upstream,
+        without ever blocking the dispatch loop of the actor.
+        """
+        if self._free is not None:
+            await self._acquire()
+            self._reserved += 1
+
+    async def _acquire(self):
+        if self._free <= 0:
+            self._waits += 1
+            while self._free <= 0:
+                self._has_space.clear()
+                await self._has_space.wait()
+
+        self._free -= 1
 
     async def put(self, event: InEvent):
+        """Puts an event into the queue, using a reservation if one was made,
+        otherwise waiting until there is free capacity"""
         assert self._private_queue is not None, "Atom not started"
-        try:
-            logger.info(f"Putting event {event}")
-            await self._private_queue.put(event)  # TODO: Make put no wait?
-        except asyncio.QueueFull as e:
-            logger.error(f"{self.node.id} private queue is full")
-            raise AtomQueueFull(f"{self.node.id} private queue is full") from e
+        if tracer.events:
+            tracer.event("put", event)
+        if self._free is not None:
+            if self._reserved:
+                self._reserved -= 1
+            else:
+                await self._acquire()
+
+        if self._enqueued is not None:
+            self._enqueued.append(time.monotonic())
+        self._private_queue.put_nowait(event)
+        self._high_water = max(self._high_water, self._private_queue.qsize())
+
+    def put_nowait(self, event: InEvent):
+        """Puts an event into the queue
+
+        Raises:
+            AtomQueueFull: If there is no free capacity
+        """
+        assert self._private_queue is not None, "Atom not started"
+        if self._free is not None:
+            if self._reserved:
+                self._reserved -= 1
+            elif self._free <= 0:
+                logger.error("%s private queue is full", self.node.id)
+                raise AtomQueueFull(f"{self.node.id} private queue is full")
+            else:
+                self._free -= 1
+
+        if self._enqueued is not None:
+            self._enqueued.append(time.monotonic())
+        self._private_queue.put_nowait(event)
+        self._high_water = max(self._high_water, self._private_queue.qsize())
+
+    def queue_stats(self) -> AtomQueueStats:
+        return AtomQueueStats(
+            node=self.node.id,
+            depth=self._private_queue.qsize() if self._private_queue else 0,
+            capacity=self.capacity,
+            high_water=self._high_water,
+            waits=self._waits,
+        )
+
+    def reset(
+        self,
+        transport: AtomTransport,
+        assignment: Assignment,
+        globals: Dict[str, Any] = None,
+        alog: Optional[
+            Callable[[str, AssignationLogLevel, str], Awaitable[None]]
+        ] = None,
+    ):
+        """Restores the initial state of the atom and binds it to a new
+        assignment, so that it can be reused (see FlowActor.pool_atoms)
+
+        Every field that is not bound (e.g. the state of a ZipAtom or the
+        buffer of a BufferCompleteAtom) and every private attribute is set
+        back to its default.
+        """
+        for name, field in self.__fields__.items():
+            if name not in BOUND_FIELDS:
+                object.__setattr__(self, name, field.get_default())
+        for name, private in self.__private_attributes__.items():
+            object.__setattr__(self, name, private.get_default())
+
+        self.transport = transport
+        self.assignment = assignment
+        self.globals = globals or {}
+        self.alog = alog
 
     async def aenter(self):
-        self._private_queue = asyncio.Queue()
+        capacity = self.capacity
+        self._private_queue = asyncio.Queue(maxsize=capacity)
+        self._free = capacity if capacity else None
+        self._has_space = asyncio.Event()
+        self._reserved = 0
+        self._high_water = 0
+        self._waits = 0
+        self._metrics = current_metrics.get()
+        self._enqueued = deque() if self._metrics is not None else None
 
     async def aexit(self):
+        if self._next is not None:
+            self._next.cancel()
+            self._next = None
         self._private_queue = None
 
     async def __aenter__(self):
@@ -58,9 +267,9 @@ class Atom(BaseModel):
         try:
             await self.run()
         except Exception as e:
-            logger.error(f"{self.node.id} FAILED", exc_info=True)
+            logger.error("%s FAILED", self.node.id, exc_info=True)
             await self.transport.put(
-                OutEvent(
+                RawOutEvent(
                     handle="return_0",
                     type=EventType.ERROR,
                     source=self.node.id,
@@ -71,9 +280,16 @@ class Atom(BaseModel):
 
     @property
     def set_values(self) -> Dict[str, Any]:
-        defaults = getattr(self.node, "defaults", {}) or {}
-        my_globals = self.globals or {}
-        return {**defaults, **my_globals}
+        return merge_values(self.node, self.globals)
+
+    @property
+    def assign_values(self) -> Dict[str, Any]:
+        """The set values without the atom options, i.e. the kwargs for a node"""
+        return {
+            key: value
+            for key, value in self.set_values.items()
+            if key not in ATOM_OPTIONS
+        }
 
     class Config:
         arbitrary_types_allowed = True
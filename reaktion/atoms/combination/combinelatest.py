@@ -2,7 +2,7 @@ import asyncio
 from typing import List, Tuple, Optional
 from rekuest.api.schema import AssignationLogLevel
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent, InEvent
+from reaktion.events import EventType, RawOutEvent, InEvent
 import logging
 from pydantic import Field
 import functools
@@ -21,7 +21,7 @@ class CombineLatestAtom(CombinationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -36,7 +36,7 @@ class CombineLatestAtom(CombinationAtom):
                 if event.type == EventType.COMPLETE:
                     if streamIndex == 0:
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.COMPLETE,
                                 source=self.node.id,
@@ -50,7 +50,7 @@ class CombineLatestAtom(CombinationAtom):
 
                     if all(map(lambda x: x is not None, self.state)):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.NEXT,
                                 value=functools.reduce(
@@ -62,8 +62,8 @@ class CombineLatestAtom(CombinationAtom):
                         )
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
@@ -2,7 +2,8 @@ import asyncio
 from typing import List, Optional
 from reaktion.atoms.helpers import index_for_handle
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent, InEvent
+from reaktion.events import EventType, RawOutEvent, InEvent
+from reaktion.trace import tracer
 import logging
 import functools
 import asyncio
@@ -23,11 +24,12 @@ class GateAtom(CombinationAtom):
         try:
             while True:
                 event = await self.get()
-                logger.info(f"GateAtom {self.node} received {event}")
+                if tracer.events:
+                    tracer.event("gate", event)
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -43,7 +45,7 @@ class GateAtom(CombinationAtom):
                     if streamIndex == 0:
                         if forward_first:
                             await self.transport.put(
-                                OutEvent(
+                                RawOutEvent(
                                     handle="return_0",
                                     type=EventType.COMPLETE,
                                     value=event.value,
@@ -60,7 +62,7 @@ class GateAtom(CombinationAtom):
                     if streamIndex == 0:
                         if forward_first:
                             await self.transport.put(
-                                OutEvent(
+                                RawOutEvent(
                                     handle="return_0",
                                     type=EventType.NEXT,
                                     value=event.value,
@@ -71,18 +73,18 @@ class GateAtom(CombinationAtom):
                             forward_first = False
 
                         else:
-                            logger.info("Buffering event")
+                            logger.debug("Buffering event")
                             await self.buffer.put(event)
 
                     else:
                         if self.buffer.empty():
                             forward_first = True
-                            logger.info("Buffer is empty, waiting for first event")
+                            logger.debug("Buffer is empty, waiting for first event")
                         else:
                             get_event = await self.buffer.get()
                             if get_event.type == EventType.COMPLETE:
                                 await self.transport.put(
-                                    OutEvent(
+                                    RawOutEvent(
                                         handle="return_0",
                                         type=EventType.COMPLETE,
                                         source=self.node.id,
@@ -95,7 +97,7 @@ class GateAtom(CombinationAtom):
                                 break
                             else:
                                 await self.transport.put(
-                                    OutEvent(
+                                    RawOutEvent(
                                         handle="return_0",
                                         type=EventType.NEXT,
                                         value=get_event.value,
@@ -108,8 +110,8 @@ class GateAtom(CombinationAtom):
                                 )
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
@@ -2,7 +2,7 @@ import asyncio
 from typing import List, Optional
 from reaktion.atoms.helpers import index_for_handle
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent, InEvent
+from reaktion.events import EventType, RawOutEvent, InEvent
 import logging
 import functools
 from typing import Optional
@@ -22,7 +22,7 @@ class WithLatestAtom(CombinationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -37,7 +37,7 @@ class WithLatestAtom(CombinationAtom):
                 if event.type == EventType.COMPLETE:
                     if streamIndex == 0:
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.COMPLETE,
                                 source=self.node.id,
@@ -51,7 +51,7 @@ class WithLatestAtom(CombinationAtom):
 
                     if all(map(lambda x: x is not None, self.state)):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.NEXT,
                                 value=functools.reduce(
@@ -63,8 +63,8 @@ class WithLatestAtom(CombinationAtom):
                         )
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
@@ -2,7 +2,7 @@ import asyncio
 from typing import List, Tuple, Optional
 from rekuest.api.schema import AssignationLogLevel
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent, InEvent
+from reaktion.events import EventType, RawOutEvent, InEvent
 import logging
 from pydantic import Field
 from reaktion.atoms.helpers import index_for_handle
@@ -25,7 +25,7 @@ class ZipAtom(CombinationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -39,7 +39,7 @@ class ZipAtom(CombinationAtom):
                     self.complete[index_for_handle(event.handle)] = event
                     if all(map(lambda x: x is not None, self.complete)):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.COMPLETE,
                                 source=self.node.id,
@@ -52,7 +52,7 @@ class ZipAtom(CombinationAtom):
                     self.state[index_for_handle(event.handle)] = event
                     if all(map(lambda x: x is not None, self.state)):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.NEXT,
                                 source=self.node.id,
@@ -66,8 +66,8 @@ class ZipAtom(CombinationAtom):
                         self.state = list(map(lambda x: None, self.node.instream))
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
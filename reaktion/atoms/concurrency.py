@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightMode(str, Enum):
+    """How the in-flight window of an atom is sized"""
+
+    FIXED = "FIXED"
+    """ Allow at most `max_in_flight` concurrent assignments"""
+    ADAPTIVE = "ADAPTIVE"
+    """ Grow and shrink the window (AIMD) between 1 and `max_in_flight`,
+    depending on the latency of completed assignments"""
+
+
+class InFlightLimiter(BaseModel):
+    """A semaphore-style window limiting the concurrent assignments of an atom
+
+    In ADAPTIVE mode the window starts at one, doubles (slow start) while
+    assignments complete without congestion and then grows by one per
+    window of completions. When an assignment fails, or takes longer than
+    `latency_tolerance` times the fastest assignment seen so far, the
+    window is halved (at most once per window of completions).
+    """
+
+    max_in_flight: int = 0
+    """ The (maximum) size of the window (0 is unlimited)"""
+    mode: InFlightMode = InFlightMode.FIXED
+    latency_tolerance: float = 2.0
+
+    in_flight: int = 0
+    """ The number of assignments currently running"""
+    peak: int = 0
+    """ The maximum number of concurrently running assignments"""
+    limit: float = 0
+    """ The current size of the window"""
+
+    _has_space: asyncio.Event = None
+    _baseline: Optional[float] = None
+    _slow_start: bool = True
+    _since_decrease: int = 0
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._has_space = asyncio.Event()
+        if self.mode == InFlightMode.ADAPTIVE and self.max_in_flight:
+            self.limit = 1
+        else:
+            self.limit = self.max_in_flight
+
+    @property
+    def window(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self):
+        """Waits until there is a free slot in the window and takes it"""
+        if self.max_in_flight:
+            while self.in_flight >= self.window:
+                self._has_space.clear()
+                await self._has_space.wait()
+
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+
+    def release(self, latency: Optional[float] = None, failed: bool = False):
+        """Frees a slot, adapting the window to the latency of the assignment"""
+        self.in_flight -= 1
+        if self.mode == InFlightMode.ADAPTIVE and self.max_in_flight:
+            self.adapt(latency, failed)
+        self._has_space.set()
+
+    def adapt(self, latency: Optional[float], failed: bool):
+        self._since_decrease += 1
+
+        congested = failed
+        if latency is not None:
+            if self._baseline is None or latency < self._baseline:
+                self._baseline = latency
+            elif latency > self._baseline * self.latency_tolerance:
+                congested = True
+
+        if congested:
+            if self._since_decrease >= self.window:
+                self.limit = max(1, self.limit / 2)
+                self._slow_start = False
+                self._since_decrease = 0
+                logger.debug(f"Decreased in-flight window to {self.window}")
+            return
+
+        if self._slow_start:
+            self.limit = min(self.max_in_flight, self.limit + 1)
+        else:
+            self.limit = min(self.max_in_flight, self.limit + 1 / self.window)
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
@@ -0,0 +1,330 @@
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from rekuest.actors.types import Assignment
+from rekuest.postmans.utils import RPCContract
+
+from reaktion.errors import FlowLogicError
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorPolicy(str, Enum):
+    """Where the contract of a local node is called
+
+    Only a FunctionContract can be called off the loop of the actor, the
+    contracts of the actor (e.g. an actoruse) are bound to its loop.
+    """
+
+    INLINE = "INLINE"
+    """ In the event loop of the actor"""
+    THREAD = "THREAD"
+    """ In a pool of threads, that run an event loop each"""
+    PROCESS = "PROCESS"
+    """ In a pool of processes. The function is pickled to the worker, so it
+    needs to be defined at the top level of a module"""
+
+
+DEFAULT_WORKERS = 4
+
+
+class FunctionContract(RPCContract):
+    """Calls a local function as the contract of a local node
+
+    The function is called with the kwargs of the node and returns a dict
+    of its returns (generator functions yield them). It is not bound to an
+    event loop, so it can be offloaded to a THREAD or PROCESS executor.
+    """
+
+    def __init__(self, function: Callable[..., Any]) -> None:
+        self.function = function
+        self.active = True
+
+    async def aenter(self):
+        return self
+
+    async def aexit(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    async def change_state(self, state):
+        pass
+
+    async def aassign(self, kwargs: Dict[str, Any], **_) -> Dict[str, Any]:
+        returns = self.function(**kwargs)
+        if inspect.isawaitable(returns):
+            returns = await returns
+        return returns
+
+    async def aassign_retry(self, kwargs: Dict[str, Any], **_) -> Dict[str, Any]:
+        return await self.aassign(kwargs)
+
+    async def astream(self, kwargs: Dict[str, Any], **_):
+        returns = self.function(**kwargs)
+        if inspect.isasyncgen(returns):
+            async for item in returns:
+                yield item
+        else:
+            for item in returns:
+                yield item
+
+    async def astream_retry(self, kwargs: Dict[str, Any], **_):
+        async for returns in self.astream(kwargs):
+            yield returns
+
+
+def check_executor(node_id: str, contract: Any, policy: ExecutorPolicy):
+    """Raises if the contract of a node can not be called by the executor
+    of the policy (only FunctionContracts can leave the loop of the actor)"""
+    policy = ExecutorPolicy(policy)
+    if policy != ExecutorPolicy.INLINE and not isinstance(contract, FunctionContract):
+        raise FlowLogicError(
+            f"Node {node_id} can not use the {policy.value} executor: its contract"
+            f" ({type(contract).__name__}) is bound to the event loop of the actor."
+            " Only local functions (a FunctionContract) can be offloaded"
+        )
+
+
+class InlineExecutor:
+    """Calls the contract in the running event loop"""
+
+    async def assign(
+        self, contract: RPCContract, kwargs: Dict[str, Any], parent: Assignment
+    ) -> Dict[str, Any]:
+        return await contract.aassign_retry(kwargs=kwargs, parent=parent)
+
+    async def stream(
+        self, contract: RPCContract, kwargs: Dict[str, Any], parent: Assignment
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async for returns in contract.astream_retry(kwargs=kwargs, parent=parent):
+            yield returns
+
+    def shutdown(self):
+        pass
+
+
+class LoopThread:
+    """A daemon thread that runs its own event loop"""
+
+    def __init__(self, name: str) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.pending = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class ThreadExecutor:
+    """Calls function contracts in a pool of loop threads
+
+    Every call goes to the thread with the fewest pending calls, so that a
+    blocking (CPU-bound) function only blocks its own thread, never the loop
+    of the actor.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS) -> None:
+        self.threads = [
+            LoopThread(f"reaktion-executor-{i}") for i in range(max(workers, 1))
+        ]
+
+    def _pick(self) -> LoopThread:
+        thread = min(self.threads, key=lambda x: x.pending)
+        thread.pending += 1
+        return thread
+
+    async def assign(
+        self, contract: RPCContract, kwargs: Dict[str, Any], parent: Assignment
+    ) -> Dict[str, Any]:
+        thread = self._pick()
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                contract.aassign_retry(kwargs=kwargs, parent=parent), thread.loop
+            )
+            return await asyncio.wrap_future(future)
+        finally:
+            thread.pending -= 1
+
+    async def stream(
+        self, contract: RPCContract, kwargs: Dict[str, Any], parent: Assignment
+    ) -> AsyncIterator[Dict[str, Any]]:
+        thread = self._pick()
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def produce():
+            try:
+                async for returns in contract.astream_retry(
+                    kwargs=kwargs, parent=parent
+                ):
+                    loop.call_soon_threadsafe(queue.put_nowait, (returns, None))
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (done, e))
+            else:
+                loop.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+        future = asyncio.run_coroutine_threadsafe(produce(), thread.loop)
+        try:
+            while True:
+                returns, error = await queue.get()
+                if error is not None:
+                    raise error
+                if returns is done:
+                    break
+                yield returns
+        finally:
+            thread.pending -= 1
+            future.cancel()
+
+    def shutdown(self):
+        for thread in self.threads:
+            thread.stop()
+
+
+_process_contracts: Dict[Tuple[int, int], RPCContract] = {}
+""" The contracts that were entered in this (worker) process"""
+
+
+def _assign_in_process(
+    key: Tuple[int, int],
+    contract: RPCContract,
+    kwargs: Dict[str, Any],
+    parent: Assignment,
+) -> Dict[str, Any]:
+    async def assign():
+        if key not in _process_contracts:
+            await contract.aenter()
+            _process_contracts[key] = contract
+        return await _process_contracts[key].aassign_retry(kwargs=kwargs, parent=parent)
+
+    return _process_loop().run_until_complete(assign())
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _process_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+class ProcessExecutor:
+    """Calls function contracts in a pool of processes
+
+    The contract (and its function) is pickled with every call, and entered
+    once per worker process. Streams are not supported across processes,
+    they run on a ThreadExecutor instead.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS) -> None:
+        self.pool = ProcessPoolExecutor(
+            max_workers=max(workers, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._threads: Optional[ThreadExecutor] = None
+
+    async def assign(
+        self, contract: RPCContract, kwargs: Dict[str, Any], parent: Assignment
+    ) -> Dict[str, Any]:
+        key = (os.getpid(), id(contract))
+        return await asyncio.get_running_loop().run_in_executor(
+            self.pool, _assign_in_process, key, contract, kwargs, parent
+        )
+
+    async def stream(
+        self, contract: RPCContract, kwargs: Dict[str, Any], parent: Assignment
+    ) -> AsyncIterator[Dict[str, Any]]:
+        if self._threads is None:
+            logger.warning("Streams can not run in a process, using a thread")
+            self._threads = ThreadExecutor(1)
+        async for returns in self._threads.stream(contract, kwargs, parent):
+            yield returns
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+        if self._threads:
+            self._threads.shutdown()
+
+
+class Executors:
+    """The executors of an owner (e.g. a provisioned FlowActor)
+
+    Executors are created on first use and shared by every atom with the
+    same policy and number of workers, until the owner shuts them down.
+    """
+
+    def __init__(self) -> None:
+        self._executors: Dict[Tuple[ExecutorPolicy, int], Any] = {}
+
+    def get(self, policy: ExecutorPolicy, workers: int = DEFAULT_WORKERS):
+        policy = ExecutorPolicy(policy)
+        if policy == ExecutorPolicy.INLINE:
+            workers = 0
+
+        key = (policy, workers)
+        if key not in self._executors:
+            if policy == ExecutorPolicy.THREAD:
+                self._executors[key] = ThreadExecutor(workers)
+            elif policy == ExecutorPolicy.PROCESS:
+                self._executors[key] = ProcessExecutor(workers)
+            else:
+                self._executors[key] = InlineExecutor()
+
+        return self._executors[key]
+
+    def __len__(self) -> int:
+        return len(self._executors)
+
+    def shutdown(self):
+        """Shuts down every executor (they are created again when needed)"""
+        executors: List[Any] = list(self._executors.values())
+        self._executors.clear()
+        for executor in executors:
+            executor.shutdown()
+
+
+_default_executors = Executors()
+""" The executors of atoms that run outside of an actor (e.g. in tests)"""
+
+
+current_executors: ContextVar[Optional[Executors]] = ContextVar(
+    "current_executors", default=None
+)
+""" The executors of the run (picked up by its atoms)"""
+
+
+def get_executor(policy: ExecutorPolicy, workers: int = DEFAULT_WORKERS):
+    """Gets the (shared) executor for a policy and number of workers, from
+    the executors of the run (or the default ones, outside of a run)"""
+    executors = current_executors.get()
+    if executors is None:
+        executors = _default_executors
+    return executors.get(policy, workers)
+
+
+def shutdown_executors():
+    """Shuts down the default executors"""
+    _default_executors.shutdown()
@@ -1,7 +1,8 @@
 import asyncio
 from typing import List
 from reaktion.atoms.transformation.base import TransformationAtom
-from reaktion.events import EventType, OutEvent, InEvent
+from reaktion.events import EventType, RawOutEvent, InEvent
+from reaktion.trace import tracer
 import logging
 from pydantic import Field
 from functools import reduce
@@ -29,7 +30,7 @@ class AllAtom(TransformationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -41,7 +42,7 @@ class AllAtom(TransformationAtom):
 
                 if event.type == EventType.COMPLETE:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             source=self.node.id,
@@ -54,7 +55,7 @@ class AllAtom(TransformationAtom):
                     try:
                         self.assert_values(event.value, check_list_length=list_length)
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.NEXT,
                                 value=event.value,
@@ -63,10 +64,11 @@ class AllAtom(TransformationAtom):
                             )
                         )
                     except ValueError as e:
-                        logger.exception(f"Atom {self.node} filtered out an event")
+                        if tracer.events:
+                            tracer.event("filtered", event)
 
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_1",
                                 type=EventType.NEXT,
                                 value=event.value,
@@ -76,9 +78,9 @@ class AllAtom(TransformationAtom):
                         )
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception as e:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
             raise e
@@ -1,9 +1,13 @@
 import asyncio
-from reaktion.events import OutEvent, Returns, EventType, InEvent
+import time
+from collections import deque
+from reaktion.events import RawOutEvent, Returns, EventType, InEvent
 from reaktion.atoms.base import Atom
+from reaktion.atoms.concurrency import InFlightLimiter, InFlightMode
+from reaktion.metrics import Metric
 import logging
 from pydantic import Field
-from typing import Dict, List
+from typing import ClassVar, Deque, Dict, List, Optional, Tuple
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -23,7 +27,7 @@ class FilterAtom(Atom):
                         result = await self.filter(event)
                         if result is True:
                             await self.transport.put(
-                                OutEvent(
+                                RawOutEvent(
                                     handle="return_0",
                                     type=EventType.NEXT,
                                     value=event.value,
@@ -34,7 +38,7 @@ class FilterAtom(Atom):
                     except Exception as e:
                         logger.error(f"{self.node.id} map failed", exc_info=True)
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.ERROR,
                                 source=self.node.id,
@@ -47,7 +51,7 @@ class FilterAtom(Atom):
                 if event.type == EventType.COMPLETE:
                     # Everything left of us is done, so we can shut down as well
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             source=self.node.id,
@@ -58,7 +62,7 @@ class FilterAtom(Atom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -70,7 +74,7 @@ class FilterAtom(Atom):
                     # We are not raising the exception here but monadicly killing it to the
                     # left
         except asyncio.CancelledError as e:
-            logger.debug(f"Atom {self.node} is getting cancelled")
+            logger.debug("Atom %s is getting cancelled", self.node.id)
             raise e
 
 
@@ -85,7 +89,9 @@ class MapAtom(Atom):
 
                 if event.type == EventType.NEXT:
                     try:
+                        start = time.monotonic()
                         result = await self.map(event)
+                        self.observe(Metric.PROCESSING, time.monotonic() - start)
                         if result is None:
                             value = ()
                         elif isinstance(result, list) or isinstance(result, tuple):
@@ -94,7 +100,7 @@ class MapAtom(Atom):
                             value = (result,)
 
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.NEXT,
                                 value=value,
@@ -105,7 +111,7 @@ class MapAtom(Atom):
                     except Exception as e:
                         logger.error(f"{self.node.id} map failed", exc_info=True)
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.ERROR,
                                 source=self.node.id,
@@ -118,7 +124,7 @@ class MapAtom(Atom):
                 if event.type == EventType.COMPLETE:
                     # Everything left of us is done, so we can shut down as well
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             source=self.node.id,
@@ -129,7 +135,7 @@ class MapAtom(Atom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -141,7 +147,7 @@ class MapAtom(Atom):
                     # We are not raising the exception here but monadicly killing it to the
                     # left
         except asyncio.CancelledError as e:
-            logger.debug(f"Atom {self.node} is getting cancelled")
+            logger.debug("Atom %s is getting cancelled", self.node.id)
             raise e
 
 
@@ -156,7 +162,11 @@ class MergeMapAtom(Atom):
 
                 if event.type == EventType.NEXT:
                     try:
+                        # Only the time spent in merge_map (not downstream)
+                        busy = 0.0
+                        start = time.monotonic()
                         async for result in self.merge_map(event):
+                            busy += time.monotonic() - start
                             if result is None:
                                 value = ()
                             elif isinstance(result, list) or isinstance(result, tuple):
@@ -164,7 +174,7 @@ class MergeMapAtom(Atom):
                             else:
                                 value = (result,)
                             await self.transport.put(
-                                OutEvent(
+                                RawOutEvent(
                                     handle="return_0",
                                     type=EventType.NEXT,
                                     value=value,
@@ -172,11 +182,14 @@ class MergeMapAtom(Atom):
                                     caused_by=[event.current_t],
                                 )
                             )
+                            start = time.monotonic()
+                        busy += time.monotonic() - start
+                        self.observe(Metric.PROCESSING, busy)
 
                     except Exception as e:
                         logger.error(f"{self.node.id} map failed")
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle="return_0",
                                 type=EventType.ERROR,
                                 source=self.node.id,
@@ -189,7 +202,7 @@ class MergeMapAtom(Atom):
                 if event.type == EventType.COMPLETE:
                     # Everything left of us is done, so we can shut down as well
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             source=self.node.id,
@@ -200,7 +213,7 @@ class MergeMapAtom(Atom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -212,80 +225,97 @@ class MergeMapAtom(Atom):
                     # We are not raising the exception here but monadicly killing it to the
                     # left
         except asyncio.CancelledError as e:
-            logger.debug(f"Atom {self.node} is getting cancelled")
+            logger.debug("Atom %s is getting cancelled", self.node.id)
             raise e
 
 
-class OrderedAtom(Atom):
-    runningEvents: Dict[int, asyncio.Task] = Field(default_factory=dict)
-    publish_queue: List[int] = Field(default_factory=list)
+class BatchMapAtom(Atom):
+    """Maps events in batches
 
-    async def map(self, event: InEvent) -> Returns:
-        raise NotImplementedError("This needs to be implemented")
+    Events are accumulated until `batch_size` events arrived, or
+    `batch_timeout` milliseconds passed since the first event of the batch,
+    and are then mapped with one call to `map_batch`. The results are fanned
+    back out as one event per input event (caused by that event). Both
+    options can be set as node defaults.
+    """
 
-    async def check_ordered(self):
-        tasks_to_remove = []
-        for key, task in self.runningEvents.items():
-            if task.done():
-                exception = task.exception()
-                if exception:
-                    await self.transport.put(
-                        OutEvent(
-                            handle="return_0",
-                            type=EventType.ERROR,
-                            value=exception,
-                            source=self.node.id,
-                            caused_by=[key],
-                        )
-                    )
-                else:
-                    if key in self.publish_queue:
-                        if self.publish_queue[0] == key:
-                            await self.transport.put(
-                                OutEvent(
-                                    handle="return_0",
-                                    type=EventType.NEXT,
-                                    value=task.result(),
-                                    source=self.node.id,
-                                    caused_by=[key],
-                                )
-                            )
-                            self.publish_queue.pop(0)
-                            tasks_to_remove.append(key)
+    batch_size: int = 50
+    batch_timeout: float = 10
+    """ The maximum time (in ms) to wait for a batch to fill up"""
 
-        for key in tasks_to_remove:
-            self.runningEvents.pop(key)
+    async def map_batch(self, events: List[InEvent]) -> List[Returns]:
+        raise NotImplementedError("This needs to be implemented")
 
-    async def publish_changes(self):
-        while True:
-            await asyncio.sleep(0.1)
-            await self.check_ordered()
+    async def collect(self, first: InEvent) -> Tuple[List[InEvent], Optional[InEvent]]:
+        """Collects a batch of NEXT events, starting with `first`. Returns the
+        batch and the non-NEXT event that ended it (if any)"""
+        values = self.set_values
+        batch_size = values.get("batch_size", self.batch_size)
+        deadline = (
+            time.monotonic() + values.get("batch_timeout", self.batch_timeout) / 1000
+        )
+
+        batch = [first]
+        while len(batch) < batch_size:
+            event = await self.next_event(max(0, deadline - time.monotonic()))
+            if event is None:
+                break
+            if event.type != EventType.NEXT:
+                return batch, event
+            batch.append(event)
+
+        return batch, None
 
     async def run(self):
-        publish_task = asyncio.create_task(self.publish_changes())
-
         try:
             while True:
-                event = await self.get()
+                event = await self.next_event()
 
                 if event.type == EventType.NEXT:
-                    self.publish_queue.append(event.current_t)
-                    self.runningEvents[event.current_t] = asyncio.create_task(
-                        self.map(event)
-                    )
+                    batch, event = await self.collect(event)
+                    try:
+                        start = time.monotonic()
+                        results = await self.map_batch(batch)
+                        self.observe(Metric.PROCESSING, time.monotonic() - start)
+                        for batch_event, result in zip(batch, results):
+                            if result is None:
+                                value = ()
+                            elif isinstance(result, list) or isinstance(result, tuple):
+                                value = result
+                            else:
+                                value = (result,)
+
+                            await self.transport.put(
+                                RawOutEvent(
+                                    handle="return_0",
+                                    type=EventType.NEXT,
+                                    value=value,
+                                    source=self.node.id,
+                                    caused_by=[batch_event.current_t],
+                                )
+                            )
+                    except Exception as e:
+                        logger.error(f"{self.node.id} batch map failed", exc_info=True)
+                        await self.transport.put(
+                            RawOutEvent(
+                                handle="return_0",
+                                type=EventType.ERROR,
+                                source=self.node.id,
+                                value=e,
+                                caused_by=[
+                                    batch_event.current_t for batch_event in batch
+                                ],
+                            )
+                        )
+                        break
+
+                    if event is None:
+                        continue
 
                 if event.type == EventType.COMPLETE:
                     # Everything left of us is done, so we can shut down as well
-                    await asyncio.gather(*self.runningEvents.values())
-                    await self.check_ordered()
-
-                    publish_task.cancel()
-                    try:
-                        await publish_task
-                    except asyncio.CancelledError:
-                        pass
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             source=self.node.id,
@@ -295,21 +325,8 @@ class OrderedAtom(Atom):
                     break  # Everything left of us is done, so we can shut down as well
 
                 if event.type == EventType.ERROR:
-                    for key, value in self.runningEvents.items():
-                        value.cancel()
-                        try:
-                            await value
-                        except asyncio.CancelledError:
-                            pass
-
-                    publish_task.cancel()
-                    try:
-                        await publish_task
-                    except asyncio.CancelledError:
-                        pass
-
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -321,58 +338,124 @@ class OrderedAtom(Atom):
                     # We are not raising the exception here but monadicly killing it to the
                     # left
         except asyncio.CancelledError as e:
-            publish_task.cancel()
-            try:
-                await publish_task
-            except asyncio.CancelledError:
-                pass
-
-            logger.debug(f"Atom {self.node} is getting cancelled")
+            logger.debug("Atom %s is getting cancelled", self.node.id)
             raise e
+        finally:
+            if self._next is not None:
+                self._next.cancel()
+                self._next = None
+
+
+class InFlightAtom(Atom):
+    """An atom that runs its map concurrently, limited by an in-flight window
+
+    The window is configured by the `max_in_flight` (0 is unlimited) and
+    `in_flight_mode` node defaults, falling back to the fields of the atom.
+    Finished map tasks signal their key on a completion queue, so results are
+    published the moment they are available (see `publish`).
+
+    If `holds_slots` is set, a slot is only freed once the result of its task
+    was published (see `release`), so the window also bounds the number of
+    results that are waiting to be published.
+    """
 
+    holds_slots: ClassVar[bool] = False
 
-class AsCompletedAtom(Atom):
     runningEvents: Dict[int, asyncio.Task] = Field(default_factory=dict)
+    max_in_flight: int = 0
+    in_flight_mode: InFlightMode = InFlightMode.FIXED
+
+    _limiter: InFlightLimiter = None
+    _completed: asyncio.Queue = None
+    _latencies: Dict[int, float] = None
 
     async def map(self, event: InEvent) -> Returns:
         raise NotImplementedError("This needs to be implemented")
 
-    async def check_as_completed(self):
-        tasks_to_remove = []
-        for key, task in self.runningEvents.items():
-            if task.done():
-                exception = task.exception()
-                if exception:
-                    logger.error(f"{self.node.id} map failed with {exception}")
-                    await self.transport.put(
-                        OutEvent(
-                            handle="return_0",
-                            type=EventType.ERROR,
-                            value=exception,
-                            source=self.node.id,
-                            caused_by=[key],
-                        )
-                    )
-
-                else:
-                    await self.transport.put(
-                        OutEvent(
-                            handle="return_0",
-                            type=EventType.NEXT,
-                            value=task.result(),
-                            source=self.node.id,
-                            caused_by=[key],
-                        )
-                    )
-                tasks_to_remove.append(key)
+    async def publish(self, key: int):
+        """Publishes the results that became available through the completion
+        of the map task of `key`"""
+        raise NotImplementedError("This needs to be implemented")
 
-        for key in tasks_to_remove:
-            self.runningEvents.pop(key)
+    def accept(self, event: InEvent):
+        """Called for every NEXT event once its map task was spawned"""
+        pass
+
+    @property
+    def limiter(self) -> InFlightLimiter:
+        return self._limiter
+
+    async def aenter(self):
+        await super().aenter()
+        values = self.set_values
+        self._limiter = InFlightLimiter(
+            max_in_flight=values.get("max_in_flight", self.max_in_flight) or 0,
+            mode=values.get("in_flight_mode", self.in_flight_mode),
+        )
+        self._completed = asyncio.Queue()
+        self._latencies = {}
+
+    async def spawn_map(self, event: InEvent) -> asyncio.Task:
+        """Waits for a free slot in the window and starts mapping the event"""
+        await self.limiter.acquire()
+        key = event.current_t
+        task = asyncio.create_task(self.limited_map(event))
+        task.add_done_callback(lambda _: self._completed.put_nowait(key))
+        return task
+
+    async def limited_map(self, event: InEvent) -> Returns:
+        start = time.monotonic()
+        failed = True
+        try:
+            result = await self.map(event)
+            failed = False
+            return result
+        finally:
+            latency = time.monotonic() - start
+            self.observe(Metric.PROCESSING, latency)
+            if self.holds_slots:
+                self._latencies[event.current_t] = latency
+            else:
+                self.limiter.release(latency, failed)
+
+    def release(self, key: int, failed: bool = False):
+        """Frees the slot of a published result (if slots are held)"""
+        if self.holds_slots:
+            self.limiter.release(self._latencies.pop(key, None), failed)
 
     async def publish_changes(self):
         while True:
-            await asyncio.sleep(0.1)
-            await self.check_as_completed()
+            key = await self._completed.get()
+            if key is None:
+                break
+            if key in self.runningEvents:
+                await self.publish(key)
+
+    async def publish_error(self, key: int, exception: BaseException):
+        logger.error(f"{self.node.id} map failed with {exception}")
+        await self.transport.put(
+            RawOutEvent(
+                handle="return_0",
+                type=EventType.ERROR,
+                value=exception,
+                source=self.node.id,
+                caused_by=[key],
+            )
+        )
+
+    async def cancel_running(self, publish_task: asyncio.Task):
+        publish_task.cancel()
+        try:
+            await publish_task
+        except asyncio.CancelledError:
+            pass
+
+        for key, value in self.runningEvents.items():
+            value.cancel()
+            try:
+                await value
+            except (asyncio.CancelledError, Exception):
+                pass
 
     async def run(self):
         publish_task = asyncio.create_task(self.publish_changes())
@@ -382,21 +465,20 @@ class AsCompletedAtom(Atom):
                 event = await self.get()
 
                 if event.type == EventType.NEXT:
-                    self.runningEvents[event.current_t] = asyncio.create_task(
-                        self.map(event)
-                    )
+                    self.runningEvents[event.current_t] = await self.spawn_map(event)
+                    self.accept(event)
 
                 if event.type == EventType.COMPLETE:
                     # Everything left of us is done, so we can shut down as well
-                    await asyncio.gather(*self.runningEvents.values())
-                    await self.check_as_completed()
-                    publish_task.cancel()
-                    try:
-                        await publish_task
-                    except asyncio.CancelledError:
-                        pass
+                    await asyncio.gather(
+                        *self.runningEvents.values(), return_exceptions=True
+                    )
+                    # All completions are queued, the sentinel drains the publisher
+                    self._completed.put_nowait(None)
+                    await publish_task
+
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             source=self.node.id,
@@ -406,21 +488,10 @@ class AsCompletedAtom(Atom):
                     break  # Everything left of us is done, so we can shut down as well
 
                 if event.type == EventType.ERROR:
-                    for key, value in self.runningEvents.items():
-                        value.cancel()
-                        try:
-                            await value
-                        except asyncio.CancelledError:
-                            pass
-
-                    publish_task.cancel()
-                    try:
-                        await publish_task
-                    except asyncio.CancelledError:
-                        pass
+                    await self.cancel_running(publish_task)
 
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -432,11 +503,84 @@ class AsCompletedAtom(Atom):
                     # We are not raising the exception here but monadicly killing it to the
                     # left
         except asyncio.CancelledError as e:
-            publish_task.cancel()
-            try:
-                await publish_task
-            except asyncio.CancelledError:
-                pass
+            await self.cancel_running(publish_task)
 
-            logger.debug(f"Atom {self.node} is getting cancelled")
+            logger.debug("Atom %s is getting cancelled", self.node.id)
             raise e
+
+
+class OrderedAtom(InFlightAtom):
+    """Maps events concurrently, but publishes the results in the order
+    the events arrived
+
+    The reorder buffer is the deque of pending keys (in arrival order) and
+    the tasks in `runningEvents`, that hold the finished results. Whenever
+    a task completes, the whole ready prefix of the deque is released in
+    one pass. Failed tasks are published immediately and their key is
+    skipped when it reaches the head.
+
+    Slots are held until a result is published, so at most `max_in_flight`
+    results are buffered. Ordered atoms therefore default to a window of
+    100; a `max_in_flight` of 0 makes the buffer (and the window) unbounded.
+    """
+
+    holds_slots: ClassVar[bool] = True
+    max_in_flight: int = 100
+    publish_queue: Deque[int] = Field(default_factory=deque)
+
+    def accept(self, event: InEvent):
+        self.publish_queue.append(event.current_t)
+
+    async def publish(self, key: int):
+        task = self.runningEvents[key]
+        if not task.cancelled() and task.exception():
+            # Errors are not held back by the ordering
+            self.runningEvents.pop(key)
+            self.release(key, failed=True)
+            await self.publish_error(key, task.exception())
+
+        while self.publish_queue:
+            head = self.publish_queue[0]
+            task = self.runningEvents.get(head)
+            if task is None:
+                self.publish_queue.popleft()  # Already published as an error
+                continue
+            if not task.done():
+                break
+
+            self.publish_queue.popleft()
+            self.runningEvents.pop(head)
+            self.release(head, failed=task.exception() is not None)
+            if task.exception():
+                await self.publish_error(head, task.exception())
+                continue
+
+            await self.transport.put(
+                RawOutEvent(
+                    handle="return_0",
+                    type=EventType.NEXT,
+                    value=task.result(),
+                    source=self.node.id,
+                    caused_by=[head],
+                )
+            )
+
+
+class AsCompletedAtom(InFlightAtom):
+    """Maps events concurrently and publishes the results as they complete"""
+
+    async def publish(self, key: int):
+        task = self.runningEvents.pop(key)
+        exception = task.exception()
+        if exception:
+            await self.publish_error(key, exception)
+        else:
+            await self.transport.put(
+                RawOutEvent(
+                    handle="return_0",
+                    type=EventType.NEXT,
+                    value=task.result(),
+                    source=self.node.id,
+                    caused_by=[key],
+                )
+            )
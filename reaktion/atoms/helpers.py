@@ -1,4 +1,5 @@
 from fluss.api.schema import FlowNodeFragment
+from rekuest.actors.types import Assignment
 from reaktion.events import InEvent
 
 
@@ -6,5 +7,10 @@ def index_for_handle(handle: str) -> int:
     return int(handle.split("_")[1])
 
 
-def node_to_reference(node: FlowNodeFragment, event: InEvent) -> str:
-    return f"{node.id}_{event.current_t}"
+def node_to_reference(
+    node: FlowNodeFragment, event: InEvent, assignment: Assignment
+) -> str:
+    """The reference of the assignation that maps an event. Concurrent runs
+    share the contracts (whose postman keys assignations by reference), so
+    it includes the id of the run"""
+    return f"{assignment.id}_{node.id}_{event.current_t}"
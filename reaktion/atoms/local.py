@@ -2,31 +2,46 @@ from typing import Any, List, Optional
 from rekuest.postmans.utils import RPCContract
 from fluss.api.schema import LocalNodeFragment
 from reaktion.atoms.generic import MapAtom, MergeMapAtom
+from reaktion.atoms.executors import DEFAULT_WORKERS, ExecutorPolicy, get_executor
 from reaktion.events import InEvent
+from reaktion.payloads import reference, resolve
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def node_executor(set_values):
+    """The executor that is set by the `executor` (policy) and
+    `executor_workers` node defaults"""
+    return get_executor(
+        set_values.get("executor", ExecutorPolicy.INLINE),
+        set_values.get("executor_workers", DEFAULT_WORKERS),
+    )
+
+
 class LocalMapAtom(MapAtom):
     node: LocalNodeFragment
     contract: RPCContract
 
+    _executor = None
+
+    async def aenter(self):
+        await super().aenter()
+        self._executor = node_executor(self.set_values)
+
     async def map(self, event: InEvent) -> Optional[List[Any]]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = resolve(arg)
 
-        returns = await self.contract.aassign_retry(
-            kwargs=kwargs, parent=self.assignment
-        )
+        returns = await self._executor.assign(self.contract, kwargs, self.assignment)
 
         out = []
         stream_one = self.node.outstream[0]
         for arg in stream_one:
-            out.append(returns[arg.key])
+            out.append(reference(returns[arg.key]))
 
         return out
         # return await self.contract.aassign(*args)
@@ -36,19 +51,25 @@ class LocalMergeMapAtom(MergeMapAtom):
     node: LocalNodeFragment
     contract: RPCContract
 
+    _executor = None
+
+    async def aenter(self):
+        await super().aenter()
+        self._executor = node_executor(self.set_values)
+
     async def merge_map(self, event: InEvent) -> Optional[List[Any]]:
-        kwargs = self.set_values
+        kwargs = self.assign_values
 
         stream_one = self.node.instream[0]
         for arg, item in zip(event.value, stream_one):
-            kwargs[item.key] = arg
+            kwargs[item.key] = resolve(arg)
 
-        async for returns in self.contract.astream_retry(
-            kwargs=kwargs, parent=self.assignment
+        async for returns in self._executor.stream(
+            self.contract, kwargs, self.assignment
         ):
             out = []
             stream_one = self.node.outstream[0]
             for arg in stream_one:
-                out.append(returns[arg.key])
+                out.append(reference(returns[arg.key]))
 
             yield out
@@ -1,11 +1,20 @@
 import asyncio
-from typing import List
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+from reaktion.atoms.helpers import index_for_handle
 from reaktion.atoms.operations.base import OperationAtom
-from reaktion.events import EventType, OutEvent
+from reaktion.events import EventType, InEvent, RawOutEvent
+from reaktion.payloads import reference, resolve
 from fluss.api.schema import ReactiveImplementationModelInput
+from pydantic import Field
 import logging
 import operator
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 logger = logging.getLogger(__name__)
 
@@ -19,13 +28,99 @@ operation_map = {
     ReactiveImplementationModelInput.POWER: operator.pow,
 }
 
+inplace_operation_map = {
+    ReactiveImplementationModelInput.ADD: operator.iadd,
+    ReactiveImplementationModelInput.SUBTRACT: operator.isub,
+    ReactiveImplementationModelInput.MULTIPLY: operator.imul,
+    ReactiveImplementationModelInput.DIVIDE: operator.itruediv,
+    ReactiveImplementationModelInput.MODULO: operator.imod,
+    ReactiveImplementationModelInput.POWER: operator.ipow,
+}
+""" The in-place variants of the operations (used for numpy arrays)"""
+
+
+def apply_operation(
+    operation: Callable,
+    inplace: Optional[Callable],
+    value: Any,
+    other: Any,
+    in_place: bool = False,
+) -> Any:
+    """Applies an operation to a value (and a number or another value)
+
+    Numpy arrays are computed in one vectorized call, and only modified in
+    place if `in_place` is set. Lists are computed item by item (element-wise
+    with a list or array), so their items keep their types (converting them
+    to an array and back gains nothing, and would turn ints into floats).
+    """
+    if np is not None and isinstance(value, np.ndarray):
+        return _compute(operation, inplace if in_place else None, value, other)
+
+    if isinstance(value, list):
+        if isinstance(other, (list, tuple)) or (
+            np is not None and isinstance(other, np.ndarray)
+        ):
+            return [operation(a, b) for a, b in zip(value, other)]
+        return [operation(item, other) for item in value]
+
+    return operation(value, other)
+
+
+def _compute(operation: Callable, inplace: Optional[Callable], array, other):
+    if inplace is not None:
+        try:
+            return inplace(array, other)
+        except TypeError:
+            # e.g. dividing an int array in place, which would need a cast
+            pass
+    return operation(array, other)
+
 
 class MathAtom(OperationAtom):
+    """Applies a math operation to every value of an event
+
+    With one instream, the operation is applied to the value and the
+    `number` node default. With two instreams, the events of both streams are
+    paired in order, and the operation is applied element-wise to their
+    values. Numpy arrays are computed vectorized (see `apply_operation`),
+    with the `in_place` node default they are modified
+    in place (only safe if no other node receives the same array). Payload
+    refs are resolved, and large results are passed on by reference.
+    """
+
     complete: List[bool] = [False, False]
+    pending: List[Deque[InEvent]] = Field(default_factory=list)
+    """ The unpaired events of every instream (with two instreams)"""
+
+    async def compute(self, values: List[Any], caused_by: List[int]):
+        await self.transport.put(
+            RawOutEvent(
+                handle="return_0",
+                type=EventType.NEXT,
+                value=values,
+                source=self.node.id,
+                caused_by=caused_by,
+            )
+        )
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether no more pairs can be formed (with two instreams), i.e. a
+        completed stream has no unpaired events left"""
+        return any(
+            complete and not pending
+            for complete, pending in zip(self.complete, self.pending)
+        )
 
     async def run(self):
         operation = operation_map.get(self.node.implementation)
+        inplace = inplace_operation_map.get(self.node.implementation)
         number = self.set_values.get("number", 1)
+        in_place = self.set_values.get("in_place", False)
+
+        binary = len(self.node.instream) == 2
+        self.pending = [deque() for _ in self.node.instream]
+        self.complete = [False for _ in self.node.instream]
 
         try:
             while True:
@@ -33,7 +128,7 @@ class MathAtom(OperationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -44,32 +139,71 @@ class MathAtom(OperationAtom):
                     break
 
                 if event.type == EventType.NEXT:
-                    await self.transport.put(
-                        OutEvent(
-                            handle="return_0",
-                            type=EventType.NEXT,
-                            value=[operation(value, number) for value in event.value],
-                            source=self.node.id,
-                            caused_by=[event.current_t],
+                    if not binary:
+                        await self.compute(
+                            [
+                                reference(
+                                    apply_operation(
+                                        operation,
+                                        inplace,
+                                        resolve(value),
+                                        number,
+                                        in_place,
+                                    )
+                                )
+                                for value in event.value
+                            ],
+                            [event.current_t],
                         )
-                    )
+                    else:
+                        self.pending[index_for_handle(event.handle)].append(event)
+                        while all(self.pending):
+                            left, right = (x.popleft() for x in self.pending)
+                            await self.compute(
+                                [
+                                    reference(
+                                        apply_operation(
+                                            operation,
+                                            inplace,
+                                            resolve(a),
+                                            resolve(b),
+                                            in_place,
+                                        )
+                                    )
+                                    for a, b in zip(left.value, right.value)
+                                ],
+                                [left.current_t, right.current_t],
+                            )
+                        if self.exhausted:
+                            await self.transport.put(
+                                RawOutEvent(
+                                    handle="return_0",
+                                    type=EventType.COMPLETE,
+                                    value=[],
+                                    source=self.node.id,
+                                    caused_by=[event.current_t],
+                                )
+                            )
+                            break
 
                 if event.type == EventType.COMPLETE:
-                    await self.transport.put(
-                        OutEvent(
-                            handle="return_0",
-                            type=EventType.COMPLETE,
-                            value=[],
-                            source=self.node.id,
-                            caused_by=[event.current_t],
+                    self.complete[index_for_handle(event.handle)] = True
+                    if not binary or self.exhausted:
+                        await self.transport.put(
+                            RawOutEvent(
+                                handle="return_0",
+                                type=EventType.COMPLETE,
+                                value=[],
+                                source=self.node.id,
+                                caused_by=[event.current_t],
+                            )
                         )
-                    )
-                    break
+                        break
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception as e:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
             raise e
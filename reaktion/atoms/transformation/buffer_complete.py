@@ -1,16 +1,38 @@
 import asyncio
 from typing import List
 from reaktion.atoms.transformation.base import TransformationAtom
-from reaktion.events import EventType, OutEvent, InEvent
+from reaktion.atoms.transformation.spill import SpillBuffer
+from reaktion.events import EventType, RawOutEvent
 import logging
 from pydantic import Field
-from functools import reduce
 
 logger = logging.getLogger(__name__)
 
 
 class BufferCompleteAtom(TransformationAtom):
-    buffer: List[InEvent] = Field(default_factory=list)
+    """Buffers the values of all events and emits them as one list on COMPLETE
+
+    Values are extended into the buffer as they arrive (the events are not
+    kept). With the `spill_after` node default, the buffer is moved to a
+    temporary file (in `spill_dir`) every `spill_after` items.
+    """
+
+    caused_by: List[int] = Field(default_factory=list)
+    """ The timepoints of the buffered events"""
+
+    _buffer: SpillBuffer = None
+
+    async def aenter(self):
+        await super().aenter()
+        self._buffer = SpillBuffer(
+            spill_after=self.set_values.get("spill_after", 0),
+            directory=self.set_values.get("spill_dir", None),
+        )
+
+    async def aexit(self):
+        if self._buffer:
+            self._buffer.close()
+        await super().aexit()
 
     async def run(self):
         try:
@@ -19,7 +41,7 @@ class BufferCompleteAtom(TransformationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -30,36 +52,37 @@ class BufferCompleteAtom(TransformationAtom):
                     break
 
                 if event.type == EventType.NEXT:
-                    self.buffer.append(event)
+                    self._buffer.extend(event.value)
+                    self.caused_by.append(event.current_t)
 
                 if event.type == EventType.COMPLETE:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.NEXT,
                             value=[
-                                reduce(lambda a, b: a + list(b.value), self.buffer, [])
+                                self._buffer.collect()
                             ],  # double brakcets because its  alist :)
                             source=self.node.id,
-                            caused_by=[ev.current_t for ev in self.buffer],
+                            caused_by=self.caused_by,
                         )
                     )
 
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             value=[],
                             source=self.node.id,
-                            caused_by=[ev.current_t for ev in self.buffer],
+                            caused_by=self.caused_by,
                         )
                     )
                     break
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception as e:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
             raise e
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from typing import Any, List, Optional
+from reaktion.atoms.transformation.base import TransformationAtom
+from reaktion.events import EventType, RawOutEvent
+import logging
+from pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+
+class BufferWindowAtom(TransformationAtom):
+    """Buffers the values of events and emits them as lists, without
+    waiting for COMPLETE
+
+    A list is emitted every `buffer_count` items and/or `buffer_time`
+    milliseconds after the first item of the list arrived (whatever comes
+    first). Empty lists are never emitted. On COMPLETE (or ERROR) the
+    remaining items are emitted before the event is passed on. Both options
+    can be set as node defaults or globals (0 disables them).
+    """
+
+    buffer_count: int = 0
+    """ The number of items after which a list is emitted"""
+    buffer_time: float = 0
+    """ The time (in ms) after which a list is emitted"""
+
+    buffer: List[Any] = Field(default_factory=list)
+    caused_by: List[int] = Field(default_factory=list)
+    """ The timepoint of the event of every buffered item"""
+
+    async def flush(self, count: int = 0):
+        """Emits the buffer, in lists of `count` items (if set), each
+        caused by the events of its own items"""
+        size = count or len(self.buffer)
+        for start in range(0, len(self.buffer), size or 1):
+            await self.transport.put(
+                RawOutEvent(
+                    handle="return_0",
+                    type=EventType.NEXT,
+                    value=[self.buffer[start : start + size]],
+                    source=self.node.id,
+                    caused_by=list(dict.fromkeys(self.caused_by[start : start + size])),
+                )
+            )
+
+        self.buffer = []
+        self.caused_by = []
+
+    async def run(self):
+        values = self.set_values
+        count = values.get("buffer_count", self.buffer_count)
+        window = values.get("buffer_time", self.buffer_time) / 1000
+        deadline: Optional[float] = None
+
+        try:
+            while True:
+                timeout = None
+                if deadline is not None:
+                    timeout = max(0, deadline - time.monotonic())
+
+                event = await self.next_event(timeout)
+
+                if event is None:
+                    # The window of the first item elapsed
+                    await self.flush(count)
+                    deadline = None
+                    continue
+
+                if event.type == EventType.ERROR:
+                    await self.flush(count)
+                    await self.transport.put(
+                        RawOutEvent(
+                            handle="return_0",
+                            type=EventType.ERROR,
+                            value=event.value,
+                            source=self.node.id,
+                            caused_by=[event.current_t],
+                        )
+                    )
+                    break
+
+                if event.type == EventType.NEXT:
+                    if window and not self.buffer:
+                        deadline = time.monotonic() + window
+                    self.buffer.extend(event.value)
+                    self.caused_by.extend([event.current_t] * len(event.value))
+
+                    if count and len(self.buffer) >= count:
+                        full = len(self.buffer) - len(self.buffer) % count
+                        rest = self.buffer[full:]
+                        rest_caused_by = self.caused_by[full:]
+                        self.buffer = self.buffer[:full]
+                        self.caused_by = self.caused_by[:full]
+                        await self.flush(count)
+                        if rest:
+                            self.buffer = rest
+                            self.caused_by = rest_caused_by
+                        if not rest or not window:
+                            deadline = None
+                        else:
+                            deadline = time.monotonic() + window
+
+                    # Under a steady stream the timeout never elapses
+                    if deadline is not None and time.monotonic() >= deadline:
+                        await self.flush(count)
+                        deadline = None
+
+                if event.type == EventType.COMPLETE:
+                    await self.flush(count)
+                    await self.transport.put(
+                        RawOutEvent(
+                            handle="return_0",
+                            type=EventType.COMPLETE,
+                            value=[],
+                            source=self.node.id,
+                            caused_by=[event.current_t],
+                        )
+                    )
+                    break
+
+        except asyncio.CancelledError as e:
+            logger.warning("Atom %s is getting cancelled", self.node.id)
+            raise e
+
+        except Exception as e:
+            logger.exception("Atom %s excepted", self.node.id)
+            raise e
+
+
+class BufferCountAtom(BufferWindowAtom):
+    """Emits a list every `buffer_count` items"""
+
+    buffer_count: int = 10
+
+
+class BufferTimeAtom(BufferWindowAtom):
+    """Emits a list `buffer_time` ms after the first item of the list"""
+
+    buffer_time: float = 1000
+
+
+class BufferCountOrTimeAtom(BufferWindowAtom):
+    """Emits a list every `buffer_count` items, or `buffer_time` ms after
+    the first item of the list (whatever comes first)"""
+
+    buffer_count: int = 10
+    buffer_time: float = 1000
@@ -1,7 +1,7 @@
 import asyncio
 from typing import List
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent
+from reaktion.events import EventType, RawOutEvent
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,7 +21,7 @@ class ChunkAtom(CombinationAtom):
 
                 if event.type == EventType.ERROR:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.ERROR,
                             value=event.value,
@@ -43,7 +43,7 @@ class ChunkAtom(CombinationAtom):
                     for i in range(iterations):
                         for value in event.value[0]:
                             await self.transport.put(
-                                OutEvent(
+                                RawOutEvent(
                                     handle="return_0",
                                     type=EventType.NEXT,
                                     value=[value],
@@ -62,7 +62,7 @@ class ChunkAtom(CombinationAtom):
 
                 if event.type == EventType.COMPLETE:
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle="return_0",
                             type=EventType.COMPLETE,
                             value=[],
@@ -73,9 +73,9 @@ class ChunkAtom(CombinationAtom):
                     break
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception as e:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
             raise e
@@ -1,7 +1,7 @@
 import asyncio
 from typing import List
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent
+from reaktion.events import EventType, RawOutEvent
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +19,7 @@ class FilterAtom(CombinationAtom):
                 if event.type == EventType.ERROR:
                     for index, stream in enumerate(self.node.outstream):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle=f"return_{index}",
                                 type=EventType.ERROR,
                                 value=event.value,
@@ -34,7 +34,7 @@ class FilterAtom(CombinationAtom):
                     real_value = value["value"]
                     index = value["use"]
                     await self.transport.put(
-                        OutEvent(
+                        RawOutEvent(
                             handle=f"return_{index}",
                             type=EventType.NEXT,
                             value=(real_value,),
@@ -46,7 +46,7 @@ class FilterAtom(CombinationAtom):
                 if event.type == EventType.COMPLETE:
                     for index, stream in enumerate(self.node.outstream):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle=f"return_{index}",
                                 type=EventType.COMPLETE,
                                 source=self.node.id,
@@ -56,9 +56,9 @@ class FilterAtom(CombinationAtom):
                     break
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception as e:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
             raise e
@@ -0,0 +1,64 @@
+import logging
+import pickle
+import tempfile
+from typing import Any, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SpillBuffer:
+    """An append-only buffer of items that spills to disk
+
+    Items are extended into one list. If `spill_after` is set, the list is
+    pickled to a temporary file (and cleared) whenever it holds that many
+    items, so that at most `spill_after` items are kept in memory while
+    buffering. `collect` reads the spilled chunks back in order, into the
+    list that is returned.
+    """
+
+    def __init__(self, spill_after: int = 0, directory: Optional[str] = None):
+        self.spill_after = spill_after
+        self.directory = directory
+        self.items: List[Any] = []
+        self.spilled = 0
+        self._file = None
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.items)
+
+    def extend(self, values: Iterable[Any]):
+        self.items.extend(values)
+        if self.spill_after and len(self.items) >= self.spill_after:
+            self.spill()
+
+    def spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(
+                prefix="reaktion-buffer-", dir=self.directory
+            )
+            logger.debug(f"Spilling buffer to {self._file.name}")
+        pickle.dump(self.items, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.spilled += len(self.items)
+        self.items = []
+
+    def collect(self) -> List[Any]:
+        """Returns all items (and empties the buffer)"""
+        if self._file is None:
+            items, self.items = self.items, []
+            return items
+
+        items: List[Any] = []
+        self._file.seek(0)
+        while len(items) < self.spilled:
+            items.extend(pickle.load(self._file))
+        items.extend(self.items)
+
+        self.close()
+        return items
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.items = []
+        self.spilled = 0
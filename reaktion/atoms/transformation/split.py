@@ -1,7 +1,7 @@
 import asyncio
 from typing import List
 from reaktion.atoms.combination.base import CombinationAtom
-from reaktion.events import EventType, OutEvent
+from reaktion.events import EventType, RawOutEvent
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +18,7 @@ class SplitAtom(CombinationAtom):
                 if event.type == EventType.ERROR:
                     for index, stream in enumerate(self.node.outstream):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle=f"return_{index}",
                                 type=EventType.ERROR,
                                 value=event.value,
@@ -32,7 +32,7 @@ class SplitAtom(CombinationAtom):
                     for index, stream in enumerate(self.node.outstream):
                         if event.value[index] is not None:
                             await self.transport.put(
-                                OutEvent(
+                                RawOutEvent(
                                     handle=f"return_{index}",
                                     type=EventType.NEXT,
                                     value=(event.value[index],),
@@ -44,7 +44,7 @@ class SplitAtom(CombinationAtom):
                 if event.type == EventType.COMPLETE:
                     for index, stream in enumerate(self.node.outstream):
                         await self.transport.put(
-                            OutEvent(
+                            RawOutEvent(
                                 handle=f"return_{index}",
                                 type=EventType.COMPLETE,
                                 value=None,
@@ -55,9 +55,9 @@ class SplitAtom(CombinationAtom):
                     break
 
         except asyncio.CancelledError as e:
-            logger.warning(f"Atom {self.node} is getting cancelled")
+            logger.warning("Atom %s is getting cancelled", self.node.id)
             raise e
 
         except Exception as e:
-            logger.exception(f"Atom {self.node} excepted")
+            logger.exception("Atom %s excepted", self.node.id)
             raise e
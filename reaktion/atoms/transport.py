@@ -1,23 +1,98 @@
-from pydantic import BaseModel
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional
+from pydantic import BaseModel, Field
 import asyncio
-from reaktion.events import OutEvent
+from reaktion.events import EventType, RawInEvent, RawOutEvent
+from reaktion.utils import RoutingTable, routed_events
+
+
+class ExecutionMode(str, Enum):
+    """How the events of a flow travel between atoms"""
+
+    CENTRAL = "CENTRAL"
+    """ Every event passes through the dispatch loop of the actor, that
+    tracks and routes it"""
+    DIRECT = "DIRECT"
+    """ Atoms put their events straight into the atoms they are connected
+    to (see DirectTransport). Tracking observes the events on the side"""
 
 
 class AtomTransport(BaseModel):
     queue: asyncio.Queue
+    gate: Optional[Callable[[RawOutEvent], Awaitable[None]]] = None
+    """ Awaited before an event is put on the queue, e.g. to reserve
+    capacity in the atoms the event will be routed to"""
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
 
-    async def put(self, event: OutEvent):
+    async def put(self, event: RawOutEvent):
+        if self.gate:
+            await self.gate(event)
         await self.queue.put(event)
 
-    async def get(self) -> OutEvent:
+    async def get(self) -> RawOutEvent:
         return await self.queue.get()
 
     class Config:
         arbitrary_types_allowed = True
 
 
+class DirectTransport(AtomTransport):
+    """Routes the events of an atom directly into the atoms it is connected to
+
+    Every edge becomes a direct channel: an event is routed through the
+    routing table and put into the target atoms by the producing atom
+    itself (waiting if a bounded target is full). Only the events for nodes
+    that are not atoms (i.e. the return node) are put on the queue, already
+    routed, so the actor only sees the results of the flow.
+
+    Timepoints are counted here, and every event is passed to `observe`
+    (e.g. the RunTracker) before it is routed. If the flow is brittle, errors
+    are additionally sent to the `sink` node, so that the run fails.
+    """
+
+    routing_table: RoutingTable
+    atoms: Dict[str, Any] = Field(default_factory=dict)
+    observe: Optional[Callable[[RawOutEvent, int], Awaitable[None]]] = None
+    brittle: bool = False
+    sink: Optional[str] = None
+    """ The node that errors are sent to in brittle flows"""
+    t: int = 0
+    """ The current timepoint"""
+
+    async def put(self, event: RawOutEvent):
+        t = event.t
+        if t is None:
+            t = self.t
+            self.t += 1
+
+        if self.observe:
+            await self.observe(event, t)
+
+        if self.brittle and self.sink and event.type == EventType.ERROR:
+            await self.queue.put(
+                RawInEvent(
+                    target=self.sink,
+                    handle="arg_0",
+                    type=EventType.ERROR,
+                    value=event.value,
+                    current_t=t,
+                )
+            )
+            return
+
+        for in_event in routed_events(self.routing_table, event, t):
+            atom = self.atoms.get(in_event.target)
+            if atom is not None:
+                await atom.put(in_event)
+            else:
+                await self.queue.put(in_event)
+
+
 class MockTransport(AtomTransport):
-    async def get(self, timeout=3) -> OutEvent:
+    async def get(self, timeout=3) -> RawOutEvent:
         return await asyncio.wait_for(self.queue.get(), timeout=timeout)
 
     pass
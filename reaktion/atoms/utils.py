@@ -11,16 +11,24 @@ from fluss.api.schema import (
     MapStrategy,
 )
 import asyncio
+import logging
 from reaktion.atoms.arkitekt import (
     ArkitektMapAtom,
+    ArkitektBatchMapAtom,
     ArkitektMergeMapAtom,
     ArkitektAsCompletedAtom,
     ArkitektOrderedAtom,
 )
 from reaktion.atoms.arkitekt_filter import ArkitektFilterAtom
+from reaktion.atoms.executors import ExecutorPolicy, check_executor
 from reaktion.atoms.local import LocalMapAtom, LocalMergeMapAtom
 from reaktion.atoms.transformation.chunk import ChunkAtom
 from reaktion.atoms.transformation.buffer_complete import BufferCompleteAtom
+from reaktion.atoms.transformation.buffer_window import (
+    BufferCountAtom,
+    BufferCountOrTimeAtom,
+    BufferTimeAtom,
+)
 from reaktion.atoms.transformation.split import SplitAtom
 from reaktion.atoms.combination.zip import ZipAtom
 from reaktion.atoms.transformation.filter import FilterAtom
@@ -28,12 +36,14 @@ from reaktion.atoms.combination.withlatest import WithLatestAtom
 from reaktion.atoms.combination.gate import GateAtom
 from reaktion.atoms.filter.all import AllAtom
 from rekuest.postmans.utils import RPCContract
-from .base import Atom
+from .base import Atom, merge_values
 from .transport import AtomTransport
 from rekuest.actors.types import Assignment
 from typing import Any, Optional
 from reaktion.atoms.operations.math import MathAtom, operation_map
 
+logger = logging.getLogger(__name__)
+
 
 def atomify(
     node: FlowNodeFragment,
@@ -42,10 +52,28 @@ def atomify(
     globals: Dict[str, Any],
     assignment: Assignment,
     alog: Callable[[Assignation, AssignationLogLevel, str], Awaitable[None]] = None,
+    queue_size: int = 0,
 ) -> Atom:
     if isinstance(node, ArkitektNodeFragment):
         if node.kind == NodeKind.FUNCTION:
             if node.map_strategy == MapStrategy.MAP:
+                values = merge_values(node, globals)
+                if values.get("batchable"):
+                    return ArkitektBatchMapAtom(
+                        node=node,
+                        contract=contract,
+                        transport=transport,
+                        assignment=assignment,
+                        globals=globals,
+                        alog=alog,
+                        queue_size=queue_size,
+                    )
+                if values.get("batch_size"):
+                    logger.warning(
+                        "Node %s sets a batch_size, but is not batchable. It is"
+                        " mapped without batching",
+                        node.id,
+                    )
                 return ArkitektMapAtom(
                     node=node,
                     contract=contract,
@@ -53,6 +81,7 @@ def atomify(
                     assignment=assignment,
                     globals=globals,
                     alog=alog,
+                    queue_size=queue_size,
                 )
             if node.map_strategy == MapStrategy.AS_COMPLETED:
                 return ArkitektAsCompletedAtom(
@@ -62,15 +91,17 @@ def atomify(
                     assignment=assignment,
                     globals=globals,
                     alog=alog,
+                    queue_size=queue_size,
                 )
             if node.map_strategy == MapStrategy.ORDERED:
-                return ArkitektAsCompletedAtom(
+                return ArkitektOrderedAtom(
                     node=node,
                     contract=contract,
                     transport=transport,
                     assignment=assignment,
                     globals=globals,
                     alog=alog,
+                    queue_size=queue_size,
                 )
         if node.kind == NodeKind.GENERATOR:
             return ArkitektMergeMapAtom(
@@ -80,6 +111,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
     if isinstance(node, ArkitektFilterNodeFragment):
         if node.kind == NodeKind.FUNCTION:
@@ -91,11 +123,17 @@ def atomify(
                     assignment=assignment,
                     globals=globals,
                     alog=alog,
+                    queue_size=queue_size,
                 )
         if node.kind == NodeKind.GENERATOR:
             raise NotImplementedError("Generator cannot be used as a filter")
 
     if isinstance(node, LocalNodeFragment):
+        check_executor(
+            node.id,
+            contract,
+            merge_values(node, globals).get("executor", ExecutorPolicy.INLINE),
+        )
         if node.kind == NodeKind.FUNCTION:
             return LocalMapAtom(
                 node=node,
@@ -104,6 +142,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.kind == NodeKind.GENERATOR:
             return LocalMergeMapAtom(
@@ -113,6 +152,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
 
     if isinstance(node, ReactiveNodeFragment):
@@ -123,6 +163,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.FILTER:
             return FilterAtom(
@@ -131,6 +172,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.CHUNK:
             return ChunkAtom(
@@ -139,6 +181,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.GATE:
             return GateAtom(
@@ -147,14 +190,33 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.BUFFER_COMPLETE:
+            values = merge_values(node, globals)
+            if values.get("buffer_count") or values.get("buffer_time"):
+                if not values.get("buffer_time"):
+                    window_atom = BufferCountAtom
+                elif not values.get("buffer_count"):
+                    window_atom = BufferTimeAtom
+                else:
+                    window_atom = BufferCountOrTimeAtom
+
+                return window_atom(
+                    node=node,
+                    transport=transport,
+                    assignment=assignment,
+                    globals=globals,
+                    alog=alog,
+                    queue_size=queue_size,
+                )
             return BufferCompleteAtom(
                 node=node,
                 transport=transport,
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.WITHLATEST:
             return WithLatestAtom(
@@ -163,6 +225,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.COMBINELATEST:
             return WithLatestAtom(
@@ -171,6 +234,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.SPLIT:
             return SplitAtom(
@@ -179,6 +243,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation == ReactiveImplementationModelInput.ALL:
             return AllAtom(
@@ -187,6 +252,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
         if node.implementation in operation_map:
             return MathAtom(
@@ -195,6 +261,7 @@ def atomify(
                 assignment=assignment,
                 globals=globals,
                 alog=alog,
+                queue_size=queue_size,
             )
 
     raise NotImplementedError(f"Atom for {node} is not implemented")
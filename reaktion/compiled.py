@@ -0,0 +1,288 @@
+import logging
+import re
+from collections import deque
+from typing import Any, Dict, List, Sequence, Tuple
+
+from fluss.api.schema import (
+    ArgNodeFragment,
+    ArkitektFilterNodeFragment,
+    ArkitektNodeFragment,
+    FlowFragment,
+    FlowFragmentGraph,
+    FlowNodeCommonsFragmentBase,
+    LocalNodeFragment,
+    ReactiveImplementationModelInput,
+    ReactiveNodeFragment,
+    ReturnNodeFragment,
+)
+from pydantic import BaseModel
+from rekuest.api.schema import PortFragment
+
+from reaktion.errors import FlowLogicError, FlowValidationError
+from reaktion.utils import RoutingTable, build_routing_table
+
+logger = logging.getLogger(__name__)
+
+ATOM_NODES = (
+    ArkitektNodeFragment,
+    ArkitektFilterNodeFragment,
+    ReactiveNodeFragment,
+    LocalNodeFragment,
+)
+""" The node types that are run as atoms"""
+
+CONTRACT_NODES = (ArkitektNodeFragment, ArkitektFilterNodeFragment)
+""" The node types that need a contract"""
+
+LOOP_IMPLEMENTATIONS = (
+    ReactiveImplementationModelInput.GATE,
+    ReactiveImplementationModelInput.ZIP,
+    ReactiveImplementationModelInput.WITHLATEST,
+    ReactiveImplementationModelInput.COMBINELATEST,
+)
+""" The combination nodes that can close a feedback loop (e.g. a gate that
+releases its next event when the previous one came back)"""
+
+
+class GlobalTarget(BaseModel):
+    node: str
+    """ The node that receives the global"""
+    key: str
+    """ The key of the global on that node"""
+
+
+class CompiledFlow(BaseModel):
+    """Everything about a flow that does not depend on an assignment
+
+    A CompiledFlow is built once per provision (see `compile_flow`), so that
+    an assignment only needs to bind its arguments (see `bind`).
+    """
+
+    flow: FlowFragment
+    arg_node: ArgNodeFragment
+    """ The node that emits the arguments of the flow"""
+    return_node: ReturnNodeFragment
+    """ The node that receives the returns of the flow"""
+    atom_nodes: List[FlowNodeCommonsFragmentBase]
+    """ The nodes that are run as atoms"""
+    contract_nodes: List[FlowNodeCommonsFragmentBase]
+    """ The nodes that need a contract"""
+    source_nodes: List[FlowNodeCommonsFragmentBase]
+    """ The atom nodes without instream (and incoming edges), that are
+    started by an empty event"""
+    stream_keys: Tuple[str, ...]
+    """ The keys of the args that are streamed through the arg node"""
+    global_targets: Dict[str, Tuple[GlobalTarget, ...]]
+    """ The nodes (and keys) every global arg is sent to"""
+    routing_table: RoutingTable
+    """ The targets of every (source, handle), validated (see
+    `validate_graph`) so that the events routed through it are not checked
+    again"""
+    unreachable: Tuple[str, ...] = ()
+    """ The nodes that can never receive events (they are not run)"""
+
+    def bind(
+        self, ports: Sequence[PortFragment], args: Sequence[Any]
+    ) -> Tuple[List[Any], Dict[str, Dict[str, Any]]]:
+        """Binds the arguments of an assignment
+
+        Args:
+            ports (Sequence[PortFragment]): The args of the definition
+            args (Sequence[Any]): The args of the assignment
+
+        Returns:
+            Tuple[List[Any], Dict[str, Dict[str, Any]]]: The value of the
+                initial event and the globals of every node
+        """
+        assert len(ports) == len(args), "Wrong number of args"
+
+        streamMap: Dict[str, Any] = {}
+        globalMap: Dict[str, Dict[str, Any]] = {}
+
+        for port, arg in zip(ports, args):
+            if port.key in self.stream_keys:
+                streamMap[port.key] = arg
+            for target in self.global_targets.get(port.key, ()):
+                globalMap.setdefault(target.node, {})[target.key] = arg
+
+        return [streamMap[key] for key in self.stream_keys], globalMap
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+_HANDLE = re.compile(r"(arg|return)_(\d+)$")
+
+
+def _handle_index(handle: str, prefix: str):
+    match = _HANDLE.match(handle)
+    if not match or match.group(1) != prefix:
+        return None
+    return int(match.group(2))
+
+
+def _closes_loop(node: FlowNodeCommonsFragmentBase) -> bool:
+    return (
+        isinstance(node, ReactiveNodeFragment)
+        and node.implementation in LOOP_IMPLEMENTATIONS
+    )
+
+
+def validate_graph(graph: FlowFragmentGraph) -> Tuple[str, ...]:
+    """Checks the wiring of a graph, before anything is run
+
+    Every edge needs to connect existing nodes, through handles that index
+    into the outstream of its source and the instream of its target. The
+    return node needs to be reachable from the arg node (or a source node
+    without instream), and every cycle needs to pass through a combination
+    node (see LOOP_IMPLEMENTATIONS). Other nodes that can not be reached
+    are only reported (and not run).
+
+    Args:
+        graph (FlowFragmentGraph): The graph to validate
+
+    Raises:
+        FlowValidationError: With every problem that was found
+
+    Returns:
+        Tuple[str, ...]: The ids of the nodes that can not be reached
+    """
+    problems = []
+    nodes = {}
+    for node in graph.nodes:
+        if node.id in nodes:
+            problems.append(f"Duplicate node {node.id}")
+        nodes[node.id] = node
+
+    arg_ids = [x.id for x in graph.nodes if isinstance(x, ArgNodeFragment)]
+    return_ids = [x.id for x in graph.nodes if isinstance(x, ReturnNodeFragment)]
+
+    successors: Dict[str, List[str]] = {id: [] for id in nodes}
+    indegree = dict.fromkeys(nodes, 0)
+    # The graph without the edges into combination nodes, which has to be
+    # free of cycles
+    loop_successors: Dict[str, List[str]] = {id: [] for id in nodes}
+    loop_indegree = dict.fromkeys(nodes, 0)
+
+    for edge in graph.edges:
+        source, target = nodes.get(edge.source), nodes.get(edge.target)
+        if source is None or target is None:
+            missing = edge.source if source is None else edge.target
+            problems.append(f"Edge {edge.id} is dangling ({missing} does not exist)")
+            continue
+
+        index = _handle_index(edge.source_handle, "return")
+        if index is None or index >= len(source.outstream) or source.id in return_ids:
+            problems.append(
+                f"Edge {edge.id} leaves {source.id} through {edge.source_handle},"
+                f" which has {len(source.outstream)} outstreams"
+            )
+        index = _handle_index(edge.target_handle, "arg")
+        if index is None or index >= len(target.instream) or target.id in arg_ids:
+            problems.append(
+                f"Edge {edge.id} enters {target.id} through {edge.target_handle},"
+                f" which has {len(target.instream)} instreams"
+            )
+
+        successors[source.id].append(target.id)
+        indegree[target.id] += 1
+        if not _closes_loop(target):
+            loop_successors[source.id].append(target.id)
+            loop_indegree[target.id] += 1
+
+    roots = arg_ids + [
+        x.id
+        for x in graph.nodes
+        if isinstance(x, ATOM_NODES) and not x.instream[0] and not indegree[x.id]
+    ]
+    reachable = set(roots)
+    pending = deque(roots)
+    while pending:
+        for successor in successors[pending.popleft()]:
+            if successor not in reachable:
+                reachable.add(successor)
+                pending.append(successor)
+
+    unreachable = tuple(id for id in nodes if id not in reachable)
+    if return_ids and not any(id in reachable for id in return_ids):
+        problems.append("The return node can not be reached from the arg node")
+
+    # Kahn's algorithm, the nodes that are never freed are on (or behind)
+    # cycles that do not pass through a combination node
+    remaining = dict(loop_indegree)
+    freed = 0
+    pending = deque(id for id, degree in remaining.items() if not degree)
+    while pending:
+        freed += 1
+        for successor in loop_successors[pending.popleft()]:
+            remaining[successor] -= 1
+            if not remaining[successor]:
+                pending.append(successor)
+
+    if freed < len(nodes):
+        cyclic = [id for id in nodes if remaining[id]]
+        problems.append(f"Nodes {', '.join(cyclic)} are on or behind a cycle")
+
+    if problems:
+        raise FlowValidationError(problems)
+
+    return unreachable
+
+
+def compile_flow(flow: FlowFragment) -> CompiledFlow:
+    """Compiles a flow
+
+    Args:
+        flow (FlowFragment): The flow to compile
+
+    Raises:
+        FlowLogicError: If the flow has no arg or return node
+        FlowValidationError: If the flow is wired wrong (see `validate_graph`)
+
+    Returns:
+        CompiledFlow: The compiled flow
+    """
+    graph = flow.graph
+
+    arg_nodes = [x for x in graph.nodes if isinstance(x, ArgNodeFragment)]
+    return_nodes = [x for x in graph.nodes if isinstance(x, ReturnNodeFragment)]
+    if not arg_nodes or not return_nodes:
+        raise FlowLogicError("A flow needs an arg and a return node")
+
+    unreachable = validate_graph(graph)
+    if unreachable:
+        logger.warning(
+            "Nodes %s of flow %s can never receive events, they are not run",
+            ", ".join(unreachable),
+            flow.id,
+        )
+
+    atom_nodes = [
+        x for x in graph.nodes if isinstance(x, ATOM_NODES) and x.id not in unreachable
+    ]
+
+    edge_targets = {e.target for e in graph.edges}
+    source_nodes = [
+        x for x in atom_nodes if len(x.instream[0]) == 0 and x.id not in edge_targets
+    ]
+
+    global_targets: Dict[str, List[GlobalTarget]] = {}
+    for glob in graph.globals:
+        for to_key in glob.to_keys:
+            node, key = to_key.split(".")
+            global_targets.setdefault(glob.port.key, []).append(
+                GlobalTarget(node=node, key=key)
+            )
+
+    return CompiledFlow(
+        flow=flow,
+        arg_node=arg_nodes[0],
+        return_node=return_nodes[0],
+        atom_nodes=atom_nodes,
+        contract_nodes=[x for x in atom_nodes if isinstance(x, CONTRACT_NODES)],
+        source_nodes=source_nodes,
+        stream_keys=tuple(port.key for port in graph.args),
+        global_targets={key: tuple(targets) for key, targets in global_targets.items()},
+        routing_table=build_routing_table(graph),
+        unreachable=unreachable,
+    )
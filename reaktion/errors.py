@@ -1,6 +1,17 @@
+from typing import List
+
+
 class ReaktionError(Exception):
     pass
 
 
 class FlowLogicError(ReaktionError):
     pass
+
+
+class FlowValidationError(FlowLogicError):
+    """A flow is wired wrong (found before it is run, see `validate_graph`)"""
+
+    def __init__(self, problems: List[str]) -> None:
+        self.problems = problems
+        super().__init__("Invalid flow: " + "; ".join(problems))
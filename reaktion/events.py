@@ -56,6 +56,8 @@ class OutEvent(BaseModel):
     )
     caused_by: Tuple[int, ...]
     """ The attached value of the event"""
+    t: Optional[int] = None
+    """ The timepoint of the event, if it already has one (see RawOutEvent)"""
 
     @validator("handle")
     def validate_handle(cls, v):
@@ -99,3 +101,131 @@ class OutEvent(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
+
+
+class RawInEvent:
+    """A validation-free InEvent
+
+    Used for the internal traffic between the actor and its atoms, where the
+    routing table was already validated when the flow was compiled. Use
+    `validate` to get a (validated) InEvent at the boundaries.
+    """
+
+    __slots__ = ("target", "handle", "type", "value", "current_t")
+
+    def __init__(
+        self,
+        *,
+        target: str,
+        handle: str,
+        type: EventType,
+        value: Optional[Union[Exception, Returns]] = None,
+        current_t: int,
+    ) -> None:
+        self.target = target
+        self.handle = handle
+        self.type = type
+        self.value = value
+        self.current_t = current_t
+
+    def validate(self) -> InEvent:
+        return InEvent(
+            target=self.target,
+            handle=self.handle,
+            type=self.type,
+            value=self.value,
+            current_t=self.current_t,
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (RawInEvent, InEvent)):
+            return NotImplemented
+        return (
+            self.target == other.target
+            and self.handle == other.handle
+            and self.type == other.type
+            and self.value == other.value
+            and self.current_t == other.current_t
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"RawInEvent(target={self.target!r}, handle={self.handle!r},"
+            f" type={self.type!r}, value={self.value!r}, current_t={self.current_t!r})"
+        )
+
+
+class RawOutEvent:
+    """A validation-free OutEvent
+
+    Atoms emit these to the actor. The value and caused_by are only coerced
+    to tuples (like the validators of OutEvent do), no other checks are run.
+    Use `validate` to get a (validated) OutEvent at the boundaries.
+    """
+
+    __slots__ = ("source", "handle", "type", "value", "caused_by", "t")
+
+    def __init__(
+        self,
+        *,
+        source: str,
+        handle: str,
+        type: EventType,
+        value: Optional[Union[Exception, Returns]] = None,
+        caused_by: Tuple[int, ...],
+        t: Optional[int] = None,
+    ) -> None:
+        self.source = source
+        self.handle = handle
+        self.type = type
+        self.value = (
+            value
+            if value is None or isinstance(value, (tuple, Exception))
+            else tuple(value)
+        )
+        self.caused_by = caused_by if isinstance(caused_by, tuple) else tuple(caused_by)
+        self.t = t
+        """ The timepoint of the event, if it already has one (the events of a
+        partition are counted by its worker), otherwise it gets the next one"""
+
+    def validate(self) -> OutEvent:
+        return OutEvent(
+            source=self.source,
+            handle=self.handle,
+            type=self.type,
+            value=self.value,
+            caused_by=self.caused_by,
+            t=self.t,
+        )
+
+    def to_state(self):
+        if self.value:
+            value = (
+                self.value if not isinstance(self.value, Exception) else str(self.value)
+            )
+        else:
+            value = None
+
+        return {
+            "source": self.source,
+            "handle": self.handle,
+            "type": self.type,
+            "value": value,
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (RawOutEvent, OutEvent)):
+            return NotImplemented
+        return (
+            self.source == other.source
+            and self.handle == other.handle
+            and self.type == other.type
+            and self.value == other.value
+            and self.caused_by == other.caused_by
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"RawOutEvent(source={self.source!r}, handle={self.handle!r},"
+            f" type={self.type!r}, value={self.value!r}, caused_by={self.caused_by!r})"
+        )
@@ -42,6 +42,22 @@ from rekuest.definition.registry import DefinitionRegistry
 from rekuest.actors.actify import reactify
 from rekuest.actors.base import ActorTransport
 
+ACTOR_PARAMS = (
+    "atom_queue_size",
+    "execution_mode",
+    "max_parallel_runs",
+    "metrics_port",
+    "payload_threshold",
+    "placement",
+    "pool_atoms",
+    "process_partitions",
+    "tracking_mode",
+    "tracking_sample_every",
+    "tracking_rate_limit",
+    "tracking_rate_window",
+)
+""" Template params that configure the FlowActor"""
+
 
 class ReaktionExtension(BaseModel):
     structure_registry: StructureRegistry = Field(
@@ -63,6 +79,8 @@ class ReaktionExtension(BaseModel):
 
         t = await aget_flow(id=x.params["flow"])
 
+        params = {key: x.params[key] for key in ACTOR_PARAMS if key in x.params}
+
         return FlowActor(
             flow=t,
             is_generator=x.node.kind == NodeKind.GENERATOR,
@@ -71,6 +89,7 @@ class ReaktionExtension(BaseModel):
             definition=x.node,
             agent=agent,
             collector=agent.collector,
+            **params,
         )
 
     async def aregister_definitions(
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Metric(str, Enum):
+    """What is measured (per node)"""
+
+    QUEUE_WAIT = "queue_wait_seconds"
+    """ The time an event waited in the queue of an atom"""
+    PROCESSING = "processing_seconds"
+    """ The time an atom took to map an event (or a batch)"""
+    DISPATCH = "dispatch_seconds"
+    """ The time the dispatch loop of the actor took to route an event"""
+    EVENTS_IN = "events_in"
+    """ The events an atom got from its queue"""
+    EVENTS_OUT = "events_out"
+    """ The events a node sent"""
+    ERRORS = "errors"
+    """ The ERROR events a node sent"""
+
+    @property
+    def timing(self) -> bool:
+        return self.value.endswith("_seconds")
+
+
+TIMING_METRICS = frozenset(metric.value for metric in Metric if metric.timing)
+
+
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1,
+    5,
+    10,
+    30,
+    60,
+)
+""" The upper bounds (in seconds) of the buckets of a Histogram"""
+
+
+class Histogram:
+    """Counts observations in buckets (like a Prometheus histogram, but
+    the bucket counts are not cumulative)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile (as the upper bound of its bucket, or the
+        maximum for the last bucket)"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsSink:
+    """Receives the metrics of the atoms and the actor
+
+    Subclass this to send metrics somewhere else (e.g. to statsd). Timing
+    metrics are observed in seconds, counters with a value of 1.
+    """
+
+    def observe(self, node: str, metric: Metric, value: float = 1):
+        raise NotImplementedError("This needs to be implemented")
+
+
+class MemoryMetrics(MetricsSink):
+    """Keeps the metrics in memory, as histograms (timing metrics) and
+    counters (everything else) per node"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.clear()
+
+    def observe(self, node: str, metric: Metric, value: float = 1):
+        # Keyed by the (str) value, as hashing an enum member is slow
+        name = metric._value_
+        if name in TIMING_METRICS:
+            table = self._histograms[name]
+            histogram = table.get(node)
+            if histogram is None:
+                histogram = table[node] = Histogram(self.buckets)
+            histogram.observe(value)
+        else:
+            table = self._counters[name]
+            table[node] = table.get(node, 0) + value
+
+    def histogram(self, node: str, metric: Metric) -> Optional[Histogram]:
+        return self._histograms[metric.value].get(node)
+
+    def counter(self, node: str, metric: Metric) -> int:
+        return self._counters[metric.value].get(node, 0)
+
+    def histograms(self, metric: Metric) -> Dict[str, Histogram]:
+        """The histograms of a timing metric (by node)"""
+        return self._histograms[metric.value]
+
+    def counters(self, metric: Metric) -> Dict[str, int]:
+        """The counters of a metric (by node)"""
+        return self._counters[metric.value]
+
+    @property
+    def nodes(self) -> List[str]:
+        tables = [*self._histograms.values(), *self._counters.values()]
+        return sorted({node for table in tables for node in table})
+
+    def slowest(
+        self, metric: Metric = Metric.PROCESSING, n: int = 5
+    ) -> List[Tuple[str, Histogram]]:
+        """The nodes that spent the most time (in total) on a timing metric"""
+        histograms = sorted(
+            self.histograms(metric).items(),
+            key=lambda item: item[1].sum,
+            reverse=True,
+        )
+        return histograms[:n]
+
+    def clear(self):
+        self._histograms: Dict[str, Dict[str, Histogram]] = {
+            metric.value: {} for metric in Metric if metric.timing
+        }
+        self._counters: Dict[str, Dict[str, int]] = {
+            metric.value: {} for metric in Metric if not metric.timing
+        }
+
+
+def _labels(node: str, **extra: str) -> str:
+    escaped = node.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    labels = [f'node="{escaped}"'] + [
+        f'{key}="{value}"' for key, value in extra.items()
+    ]
+    return "{" + ",".join(labels) + "}"
+
+
+def render_prometheus(metrics: MemoryMetrics, prefix: str = "reaktion_atom") -> str:
+    """Renders the metrics in the Prometheus text format"""
+    lines = []
+    for metric in Metric:
+        name = f"{prefix}_{metric.value}"
+        if metric.timing:
+            entries = sorted(metrics.histograms(metric).items())
+            if not entries:
+                continue
+            lines.append(f"# TYPE {name} histogram")
+            for node, histogram in entries:
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket{_labels(node, le=repr(float(bound)))} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_bucket{_labels(node, le='+Inf')} {histogram.count}"
+                )
+                lines.append(f"{name}_sum{_labels(node)} {histogram.sum}")
+                lines.append(f"{name}_count{_labels(node)} {histogram.count}")
+        else:
+            entries = sorted(metrics.counters(metric).items())
+            if not entries:
+                continue
+            lines.append(f"# TYPE {name}_total counter")
+            for node, value in entries:
+                lines.append(f"{name}_total{_labels(node)} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """Serves the metrics in the Prometheus text format over HTTP (on every
+    path), on a local port (0 picks a free one, see `port` once started)"""
+
+    def __init__(
+        self, metrics: MemoryMetrics, host: str = "127.0.0.1", port: int = 9464
+    ) -> None:
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            body = render_prometheus(self.metrics).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (
+            asyncio.TimeoutError,
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def aenter(self):
+        self._server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def aexit(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.aenter()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aexit()
+
+
+current_metrics: ContextVar[Optional[MetricsSink]] = ContextVar(
+    "current_metrics", default=None
+)
+""" The metrics sink of the run (picked up by its atoms)"""
@@ -0,0 +1,729 @@
+import asyncio
+import logging
+import multiprocessing
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, ClassVar, Dict, FrozenSet, List, Optional, Tuple
+
+from fluss.api.schema import FlowNodeCommonsFragmentBase, ReactiveNodeFragment
+from pydantic import BaseModel
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.base import Atom
+from reaktion.atoms.transport import AtomTransport, DirectTransport
+from reaktion.atoms.utils import atomify
+from reaktion.compiled import CompiledFlow
+from reaktion.errors import ReaktionError
+from reaktion.events import EventType, RawInEvent, RawOutEvent
+from reaktion.payloads import PayloadStore, current_payloads
+from reaktion.utils import RoutingTable
+
+logger = logging.getLogger(__name__)
+
+
+class Placement(str, Enum):
+    """Where the atom of a node runs"""
+
+    LOCAL = "LOCAL"
+    """ In the event loop of the actor"""
+    PROCESS = "PROCESS"
+    """ In one of the worker processes of the actor (see ProcessEngine)"""
+
+
+PLACEABLE_NODES = (ReactiveNodeFragment,)
+""" The node types that can be placed in a process (nodes with contracts
+need the connections of the actor)"""
+
+
+class PartitionError(ReaktionError):
+    pass
+
+
+START = "start"
+EVENT = "event"
+TRACK = "track"
+STOP = "stop"
+CLOSE = "close"
+
+MAX_BUFFERED = 16 * 1024 * 1024
+""" The bytes a channel buffers (pickled but not yet written to the pipe)
+before its senders wait (see `Channel.drain`)"""
+MAX_INBOX = 10_000
+""" The received messages that may wait for their consumer before a channel
+stops reading from the pipe"""
+
+T_STRIDE = 1 << 48
+""" The timepoints of a run in partition i are counted from (i + 1) * T_STRIDE,
+so that they never collide with those of the actor (or another partition)"""
+
+Exits = FrozenSet[Tuple[str, str]]
+""" The (source, handle) pairs of a partition with targets outside of it"""
+
+
+def placement_of(node: FlowNodeCommonsFragmentBase, default: Placement) -> Placement:
+    """The placement of a node, set by its `placement` default"""
+    placement = (getattr(node, "defaults", None) or {}).get("placement", default)
+    return Placement(placement)
+
+
+def partition_flow(
+    compiled: CompiledFlow, partitions: int, default: Placement = Placement.LOCAL
+) -> Dict[str, int]:
+    """Assigns the nodes that are placed in a process to a partition
+
+    Nodes with a `partition` default are pinned to that partition (modulo the
+    number of partitions). The others are visited depth first from the arg
+    node and join the partition of their first predecessor, as long as it
+    holds less than its share of the nodes, otherwise the least loaded
+    partition. Chains stay together (so most edges stay within a process),
+    while parallel branches are spread across the partitions.
+
+    Args:
+        compiled (CompiledFlow): The compiled flow
+        partitions (int): The number of partitions
+        default (Placement): The placement of nodes without a placement default
+
+    Returns:
+        Dict[str, int]: The partition of every node that runs in a process
+    """
+    placed = [
+        node
+        for node in compiled.atom_nodes
+        if placement_of(node, default) == Placement.PROCESS
+    ]
+    for node in placed:
+        if not isinstance(node, PLACEABLE_NODES):
+            logger.warning(
+                f"{node.id} can not be placed in a process, keeping it local"
+            )
+    placed = [node for node in placed if isinstance(node, PLACEABLE_NODES)]
+    if not placed or partitions <= 0:
+        return {}
+
+    share = -(-len(placed) // partitions)
+    loads = [0] * partitions
+    assigned: Dict[str, int] = {}
+
+    for node in placed:
+        pinned = (node.defaults or {}).get("partition")
+        if pinned is not None:
+            assigned[node.id] = int(pinned) % partitions
+            loads[assigned[node.id]] += 1
+
+    successors: Dict[str, List[str]] = {}
+    for (source, _), targets in compiled.routing_table.items():
+        successors.setdefault(source, []).extend(t.target for t in targets)
+
+    predecessor: Dict[str, str] = {}
+    missing: Dict[str, int] = {}
+    for source, targets in successors.items():
+        for target in targets:
+            predecessor.setdefault(target, source)
+            missing[target] = missing.get(target, 0) + 1
+
+    # Depth first topological order: a branch is finished before the next
+    # one is started, and joins come after all of their branches
+    ids = {node.id for node in placed}
+    order: List[str] = []
+    stack = [compiled.arg_node.id] + [node.id for node in compiled.source_nodes]
+    while stack:
+        node_id = stack.pop()
+        if node_id in ids:
+            order.append(node_id)
+        for target in reversed(successors.get(node_id, [])):
+            missing[target] -= 1
+            if missing[target] == 0:
+                stack.append(target)
+    order += [node.id for node in placed if node.id not in order]
+
+    for node_id in order:
+        if node_id in assigned:
+            continue
+        partition = assigned.get(predecessor.get(node_id))
+        if partition is None or loads[partition] >= share:
+            partition = loads.index(min(loads))
+        assigned[node_id] = partition
+        loads[partition] += 1
+
+    return assigned
+
+
+def split_routing_table(
+    table: RoutingTable, placements: Dict[str, int]
+) -> Tuple[RoutingTable, Dict[int, RoutingTable]]:
+    """Splits a routing table into the edges that cross partitions (routed
+    by the actor) and the edges within every partition (routed in the worker)"""
+    cross: RoutingTable = {}
+    local: Dict[int, RoutingTable] = {}
+
+    for key, targets in table.items():
+        partition = placements.get(key[0])
+        inside = tuple(t for t in targets if placements.get(t.target, -1) == partition)
+        outside = tuple(t for t in targets if t not in inside)
+        if inside and partition is not None:
+            local.setdefault(partition, {})[key] = inside
+        if outside:
+            cross[key] = outside
+
+    return cross, local
+
+
+def encode_out(event: RawOutEvent, t: int) -> tuple:
+    value = event.value
+    if event.type == EventType.ERROR:
+        try:
+            pickle.dumps(value)
+        except Exception:
+            value = PartitionError(repr(value))
+    return (event.source, event.handle, event.type.value, value, event.caused_by, t)
+
+
+def encode_track(event: RawOutEvent, t: int) -> tuple:
+    """Encodes an event that stays within a partition, for tracking only
+    (without its value)"""
+    return (event.source, event.handle, event.type.value, event.caused_by, t)
+
+
+def decode_track(message: tuple) -> RawOutEvent:
+    source, handle, type, caused_by, t = message
+    return RawOutEvent(
+        source=source,
+        handle=handle,
+        type=EventType(type),
+        value=None,
+        caused_by=caused_by,
+        t=t,
+    )
+
+
+def decode_out(message: tuple) -> RawOutEvent:
+    source, handle, type, value, caused_by, t = message
+    return RawOutEvent(
+        source=source,
+        handle=handle,
+        type=EventType(type),
+        value=value,
+        caused_by=caused_by,
+        t=t,
+    )
+
+
+def encode_in(event: RawInEvent, payloads: Optional[PayloadStore] = None) -> tuple:
+    """Encodes an event for a worker, sharing its payload refs (if the run
+    has a payload store)"""
+    value = event.value
+    if payloads is not None and event.type == EventType.NEXT:
+        value = tuple(payloads.share(item) for item in value)
+    return (event.target, event.handle, event.type.value, value, event.current_t)
+
+
+def decode_in(message: tuple) -> RawInEvent:
+    target, handle, type, value, current_t = message
+    return RawInEvent(
+        target=target,
+        handle=handle,
+        type=EventType(type),
+        value=value,
+        current_t=current_t,
+    )
+
+
+class Channel:
+    """One end of a pipe between the actor and a worker process
+
+    Messages are pickled in batches: everything sent during one iteration of
+    the event loop is flushed as one message, from a single writer thread
+    (so that a full pipe never blocks the loop, and the order is kept).
+    Received batches are read when the pipe becomes readable and handed to
+    `on_message` one by one. `on_close` is called when the other end closes.
+
+    Both directions are bounded: senders `drain` the channel, which waits
+    while more than `max_buffered` bytes are not yet written to the pipe,
+    and receivers `pause_reading` while they can not keep up, so that the
+    pipe fills up and the sending side waits in turn.
+
+    The pipe is watched with `loop.add_reader`, which needs a selector event
+    loop (i.e. not the ProactorEventLoop of Windows).
+    """
+
+    def __init__(
+        self,
+        conn: Any,
+        on_message: Callable[[tuple], None],
+        on_close: Callable[[], None],
+        max_buffered: int = MAX_BUFFERED,
+    ) -> None:
+        self.conn = conn
+        self.on_message = on_message
+        self.on_close = on_close
+        self.max_buffered = max_buffered
+        self.sent = 0
+        self.received = 0
+        self.buffered = 0
+        self.paused = False
+        self._pending: List[tuple] = []
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._loop.add_reader(conn.fileno(), self._read)
+        except NotImplementedError:
+            self._writer.shutdown()
+            raise PartitionError(
+                "Process partitions need an event loop that can watch pipes"
+                " (loop.add_reader), e.g. the SelectorEventLoop on Windows"
+            ) from None
+        self._closed = False
+
+    def send(self, message: tuple):
+        if self._closed:
+            return
+        if not self._pending:
+            self._loop.call_soon(self._flush)
+        self._pending.append(message)
+
+    async def drain(self):
+        """Waits until the buffered messages fit into the channel again"""
+        if self.buffered > self.max_buffered:
+            await self._drained.wait()
+
+    def _flush(self):
+        batch, self._pending = self._pending, []
+        if batch and not self._closed:
+            self.sent += len(batch)
+            data = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+            self.buffered += len(data)
+            if self.buffered > self.max_buffered:
+                self._drained.clear()
+            self._writer.submit(self._write, data)
+
+    def _write(self, data: bytes):
+        try:
+            self.conn.send_bytes(data)
+        except (BrokenPipeError, OSError):
+            logger.debug("Pipe closed while sending")
+        try:
+            self._loop.call_soon_threadsafe(self._written, len(data))
+        except RuntimeError:
+            pass  # The loop is closed
+
+    def _written(self, nbytes: int):
+        self.buffered -= nbytes
+        if self.buffered <= self.max_buffered:
+            self._drained.set()
+
+    def pause_reading(self):
+        if not self.paused and not self._closed:
+            self.paused = True
+            self._loop.remove_reader(self.conn.fileno())
+
+    def resume_reading(self):
+        if self.paused and not self._closed:
+            self.paused = False
+            self._loop.add_reader(self.conn.fileno(), self._read)
+
+    def _read(self):
+        try:
+            while not self.paused and self.conn.poll():
+                batch = pickle.loads(self.conn.recv_bytes())
+                self.received += len(batch)
+                for message in batch:
+                    self.on_message(message)
+        except (EOFError, OSError):
+            self.close()
+            self.on_close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._flush()
+        self._closed = True
+        self._drained.set()
+        if not self.paused:
+            self._loop.remove_reader(self.conn.fileno())
+        self._writer.shutdown(wait=True)
+        self.conn.close()
+
+
+class PartitionWorker(BaseModel):
+    """Runs the atoms of one partition in a worker process
+
+    Every run (see START) gets its own atoms, that send their events
+    straight to the atoms of the same partition (a DirectTransport over the
+    edges within the partition). Events that leave the partition (see
+    `exits`) and errors are sent to the actor, which tracks them and routes
+    them to their targets. Of the events that stay within the partition the
+    actor only gets a compact record (without the value), to track them.
+    Timepoints of the events within a partition are counted by the worker,
+    from the first timepoint the actor assigned to the partition (see
+    T_STRIDE), and are kept by the actor.
+    """
+
+    conn: Any
+    nodes: Dict[str, FlowNodeCommonsFragmentBase]
+    routing_table: RoutingTable
+    exits: Exits = frozenset()
+    queue_size: int = 0
+
+    _channel: Channel = None
+    _inbox: asyncio.Queue = None
+    _runs: Dict[str, Tuple[Dict[str, Atom], List[asyncio.Task], PayloadStore]] = None
+
+    async def start_run(
+        self,
+        run_id: str,
+        assignment: Assignment,
+        globalMap: Dict[str, Dict],
+        first_t: int,
+    ):
+        exits = self.exits
+
+        async def forward(event: RawOutEvent, t: int):
+            if (event.source, event.handle) in exits or event.type == EventType.ERROR:
+                self._channel.send((EVENT, run_id, encode_out(event, t)))
+            else:
+                self._channel.send((TRACK, run_id, encode_track(event, t)))
+            await self._channel.drain()
+
+        transport = DirectTransport(
+            queue=asyncio.Queue(),
+            routing_table=self.routing_table,
+            observe=forward,
+            t=first_t,
+        )
+        atoms = {
+            node.id: atomify(
+                node,
+                transport,
+                None,
+                globalMap.get(node.id, {}),
+                assignment,
+                queue_size=self.queue_size,
+            )
+            for node in self.nodes.values()
+        }
+        transport.atoms = atoms
+
+        # Resolves the payload refs that the actor shares with the worker
+        payloads = PayloadStore(remote=True)
+        token = current_payloads.set(payloads)
+        try:
+            for atom in atoms.values():
+                await atom.aenter()
+            tasks = [asyncio.create_task(atom.start()) for atom in atoms.values()]
+        finally:
+            current_payloads.reset(token)
+        self._runs[run_id] = (atoms, tasks, payloads)
+
+    async def stop_run(self, run_id: str):
+        atoms, tasks, payloads = self._runs.pop(run_id, ({}, [], None))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for atom in atoms.values():
+            await atom.aexit()
+        if payloads:
+            payloads.release()
+
+    def receive(self, message: tuple):
+        self._inbox.put_nowait(message)
+        if self._inbox.qsize() >= MAX_INBOX:
+            self._channel.pause_reading()
+
+    async def arun(self):
+        self._inbox = asyncio.Queue()
+        self._runs = {}
+        self._channel = Channel(
+            self.conn, self.receive, lambda: self._inbox.put_nowait((CLOSE,))
+        )
+
+        try:
+            while True:
+                message = await self._inbox.get()
+                if self._channel.paused and self._inbox.qsize() < MAX_INBOX // 2:
+                    self._channel.resume_reading()
+                kind = message[0]
+
+                if kind == EVENT:
+                    run = self._runs.get(message[1])
+                    if run:
+                        event = decode_in(message[2])
+                        await run[0][event.target].put(event)
+                elif kind == START:
+                    await self.start_run(*message[1:])
+                elif kind == STOP:
+                    await self.stop_run(message[1])
+                elif kind == CLOSE:
+                    break
+        finally:
+            for run_id in list(self._runs):
+                await self.stop_run(run_id)
+            self._channel.close()
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
+
+
+def run_partition(conn, nodes, routing_table, exits, queue_size):
+    """The entrypoint of a worker process"""
+    worker = PartitionWorker(
+        conn=conn,
+        nodes=nodes,
+        routing_table=routing_table,
+        exits=exits,
+        queue_size=queue_size,
+    )
+    asyncio.run(worker.arun())
+
+
+class RemoteAtom(Atom):
+    """Stands in for an atom that runs in a worker process
+
+    Events that are put into it are sent to the worker. Capacity can not be
+    reserved across processes, producers only wait while the channel to the
+    worker is full.
+    """
+
+    partition: Any
+    run_id: str
+
+    poolable: ClassVar[bool] = False
+
+    async def aenter(self):
+        pass
+
+    async def reserve(self):
+        pass
+
+    async def put(self, event: RawInEvent):
+        self.put_nowait(event)
+        await self.partition.drain()
+
+    def put_nowait(self, event: RawInEvent):
+        message = encode_in(event, current_payloads.get())
+        self.partition.send((EVENT, self.run_id, message))
+
+    async def run(self):
+        await asyncio.Event().wait()
+
+
+class ProcessPartition(BaseModel):
+    """A worker process that runs the atoms of a partition"""
+
+    index: int
+    nodes: Dict[str, FlowNodeCommonsFragmentBase]
+    routing_table: RoutingTable
+    """ The edges within the partition"""
+    exits: Exits = frozenset()
+    """ The outputs of the partition that are routed by the actor"""
+    queue_size: int = 0
+
+    _process: Any = None
+    _channel: Channel = None
+
+    def start(self, on_message: Callable[[tuple], None], on_close: Callable[[], None]):
+        context = multiprocessing.get_context("spawn")
+        parent, child = context.Pipe()
+        self._process = context.Process(
+            target=run_partition,
+            args=(child, self.nodes, self.routing_table, self.exits, self.queue_size),
+            name=f"reaktion-partition-{self.index}",
+            daemon=True,
+        )
+        self._process.start()
+        child.close()
+        self._channel = Channel(parent, on_message, on_close)
+
+    def send(self, message: tuple):
+        self._channel.send(message)
+
+    async def drain(self):
+        await self._channel.drain()
+
+    def pause_reading(self):
+        self._channel.pause_reading()
+
+    def resume_reading(self):
+        self._channel.resume_reading()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    async def aclose(self, timeout: float = 5):
+        if self._process is None:
+            return
+        self._channel.send((CLOSE,))
+        self._channel.close()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._process.join, timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
+
+
+class ProcessEngine(BaseModel):
+    """Runs the nodes of a flow that are placed in a process on a pool of
+    worker processes
+
+    The nodes are partitioned across the workers (see `partition_flow`),
+    and every worker runs the atoms of its partition for every run. Edges
+    within a partition stay in the worker, edges that cross partitions (or
+    lead to local nodes) are routed by the actor through `routing_table`:
+    events are pickled (in batches) over a pipe to and from the workers.
+    Events within a partition only reach the actor as tracking records.
+
+    The pipes are watched with `loop.add_reader`, so the engine needs a
+    selector event loop (on Windows the default ProactorEventLoop raises a
+    PartitionError).
+
+    The actor gets a RemoteAtom for every node in a process (see
+    `remote_atoms`), and runs `pump` to receive the events of the workers.
+    """
+
+    compiled: CompiledFlow
+    placements: Dict[str, int]
+    """ The partition of every node that runs in a process"""
+    routing_table: RoutingTable
+    """ The edges the actor routes (i.e. that cross partitions)"""
+    partitions: Dict[int, ProcessPartition]
+
+    _inboxes: Dict[str, asyncio.Queue] = None
+
+    @classmethod
+    def from_flow(
+        cls,
+        compiled: CompiledFlow,
+        partitions: int,
+        default: Placement = Placement.LOCAL,
+        queue_size: int = 0,
+    ) -> "ProcessEngine":
+        placements = partition_flow(compiled, partitions, default)
+        cross, local = split_routing_table(compiled.routing_table, placements)
+        nodes = {node.id: node for node in compiled.atom_nodes}
+
+        return cls(
+            compiled=compiled,
+            placements=placements,
+            routing_table=cross,
+            partitions={
+                index: ProcessPartition(
+                    index=index,
+                    nodes={
+                        node_id: nodes[node_id]
+                        for node_id, partition in placements.items()
+                        if partition == index
+                    },
+                    routing_table=local.get(index, {}),
+                    exits=frozenset(
+                        key for key in cross if placements.get(key[0]) == index
+                    ),
+                    queue_size=queue_size,
+                )
+                for index in sorted(set(placements.values()))
+            },
+        )
+
+    async def aenter(self):
+        self._inboxes = {}
+        for partition in self.partitions.values():
+            partition.start(
+                lambda message, p=partition: self.on_message(p, message),
+                lambda p=partition: self.on_close(p),
+            )
+
+    async def aexit(self):
+        for partition in self.partitions.values():
+            await partition.aclose()
+
+    def on_message(self, partition: ProcessPartition, message: tuple):
+        inbox = self._inboxes.get(message[1])
+        if inbox is None:
+            return
+        if message[0] == TRACK:
+            inbox.put_nowait(decode_track(message[2]))
+        else:
+            inbox.put_nowait(decode_out(message[2]))
+        if inbox.qsize() >= MAX_INBOX:
+            partition.pause_reading()
+
+    def on_close(self, partition: ProcessPartition):
+        logger.error(f"Partition {partition.index} exited")
+        for inbox in self._inboxes.values():
+            for node_id in partition.nodes:
+                inbox.put_nowait(
+                    RawOutEvent(
+                        handle="return_0",
+                        type=EventType.ERROR,
+                        source=node_id,
+                        value=PartitionError(f"Partition {partition.index} exited"),
+                        caused_by=[-1],
+                    )
+                )
+
+    def remote_atoms(
+        self,
+        run_id: str,
+        transport: AtomTransport,
+        assignment: Assignment,
+        globalMap: Dict[str, Dict[str, Any]],
+    ) -> Dict[str, RemoteAtom]:
+        """Starts a run on every worker, and returns the RemoteAtoms of the
+        nodes in a process"""
+        self._inboxes[run_id] = asyncio.Queue()
+        for partition in self.partitions.values():
+            partition.send(
+                (
+                    START,
+                    run_id,
+                    assignment,
+                    {
+                        key: globalMap[key]
+                        for key in partition.nodes
+                        if key in globalMap
+                    },
+                    (partition.index + 1) * T_STRIDE,
+                )
+            )
+
+        return {
+            node_id: RemoteAtom(
+                node=self.partitions[index].nodes[node_id],
+                transport=transport,
+                assignment=assignment,
+                partition=self.partitions[index],
+                run_id=run_id,
+            )
+            for node_id, index in self.placements.items()
+        }
+
+    async def pump(self, run_id: str, transport: AtomTransport):
+        """Puts the events that the workers send for a run on its transport"""
+        inbox = self._inboxes[run_id]
+        payloads = current_payloads.get()
+        while True:
+            event = await inbox.get()
+            if inbox.qsize() < MAX_INBOX // 2:
+                for partition in self.partitions.values():
+                    partition.resume_reading()
+            if payloads is not None and event.type == EventType.NEXT:
+                for value in event.value or ():
+                    payloads.received(value)
+            await transport.put(event)
+
+    def stop_run(self, run_id: str):
+        if self._inboxes.pop(run_id, None) is None:
+            return
+        for partition in self.partitions.values():
+            partition.send((STOP, run_id))
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
@@ -0,0 +1,298 @@
+import logging
+from contextvars import ContextVar
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from reaktion.errors import ReaktionError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadError(ReaktionError):
+    """Raised if a payload reference can not be resolved"""
+
+
+class PayloadRef:
+    """A handle to a large payload, that is passed through the graph instead
+    of the payload itself (see PayloadStore)
+
+    Not a tuple on purpose: refs are nested in the lists and tuples of
+    events (e.g. by buffer and zip atoms), and need to be told apart
+    from them.
+    """
+
+    __slots__ = ("key", "nbytes", "shared", "shape", "dtype")
+
+    def __init__(
+        self,
+        key: int,
+        nbytes: int,
+        shared: Optional[str] = None,
+        shape: Optional[Tuple[int, ...]] = None,
+        dtype: Optional[str] = None,
+    ) -> None:
+        self.key = key
+        self.nbytes = nbytes
+        # The name of the shared memory block (once shared with a worker)
+        self.shared = shared
+        # The shape and dtype of the payload (if it is a numpy array)
+        self.shape = shape
+        self.dtype = dtype
+
+    def _fields(self) -> tuple:
+        return (self.key, self.nbytes, self.shared, self.shape, self.dtype)
+
+    def replace(self, **changes: Any) -> "PayloadRef":
+        fields = dict(zip(self.__slots__, self._fields()))
+        return PayloadRef(**{**fields, **changes})
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, PayloadRef):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    def __hash__(self) -> int:
+        return hash(self._fields())
+
+    def __reduce__(self):
+        return (PayloadRef, self._fields())
+
+    def __repr__(self) -> str:
+        return (
+            f"PayloadRef(key={self.key}, nbytes={self.nbytes}, shared={self.shared!r})"
+        )
+
+
+def _walk(value: Any, leaf: Callable[[PayloadRef], Any]) -> Any:
+    """Applies `leaf` to the refs in a value, also to those nested in
+    lists, tuples and dicts (which are rebuilt)"""
+    cls = type(value)
+    if cls is PayloadRef:
+        return leaf(value)
+    if cls is list:
+        return [_walk(item, leaf) for item in value]
+    if cls is tuple:
+        return tuple(_walk(item, leaf) for item in value)
+    if cls is dict:
+        return {key: _walk(item, leaf) for key, item in value.items()}
+    return value
+
+
+def payload_size(value: Any) -> int:
+    """The size (in bytes) of a buffer-like value, or 0 if it is not one
+    (only bytes, bytearrays, memoryviews and numpy arrays are referenced)"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, memoryview):
+        return value.nbytes
+    if np is not None and isinstance(value, np.ndarray) and value.dtype.kind != "O":
+        return value.nbytes
+    return 0
+
+
+class PayloadStore(BaseModel):
+    """The payloads of one run, by reference
+
+    Buffer-like values of at least `threshold` bytes are replaced by a
+    PayloadRef when they enter the graph (the args of the flow and the
+    returns of Arkitekt and local nodes), and the store keeps the value.
+    Reactive atoms pass the refs along as they are, atoms that compute on
+    values `resolve` them (without copying), and Arkitekt atoms and the
+    return node `materialize` them.
+
+    A ref that is sent to a worker process is shared once: the payload is
+    copied into a shared memory block, which the worker maps (again without
+    copying). `bytes_copied` counts every copy of a payload the run made (or
+    caused, e.g. by pickling an unreferenced buffer to a worker),
+    `bytes_referenced` the payloads that were passed by reference instead.
+    """
+
+    threshold: int = 0
+    """ The minimum size (in bytes) of a referenced payload (0 creates no
+    refs, but still resolves refs that are shared with this process)"""
+    remote: bool = False
+    """ The store of a worker process, that resolves the refs the actor
+    shares with it"""
+    bytes_copied: int = 0
+    bytes_referenced: int = 0
+
+    _payloads: Dict[int, Any] = None
+    _shared: Dict[int, PayloadRef] = None
+    _blocks: Dict[str, shared_memory.SharedMemory] = None
+    _owned: Dict[str, shared_memory.SharedMemory] = None
+    _attached: Dict[str, Any] = None
+
+    def __init__(self, **data) -> None:
+        super().__init__(**data)
+        self._payloads = {}
+        self._shared = {}
+        self._blocks = {}
+        self._owned = {}
+        self._attached = {}
+
+    def ref(self, value: Any) -> Any:
+        """Returns a ref for a large payload (or the value itself)"""
+        if not self.threshold:
+            return value
+        nbytes = payload_size(value)
+        if nbytes < self.threshold:
+            return value
+
+        key = len(self._payloads)
+        self._payloads[key] = value
+        self.bytes_referenced += nbytes
+        return PayloadRef(key=key, nbytes=nbytes)
+
+    @property
+    def holds_refs(self) -> bool:
+        """Whether values can contain refs of this store at all (if not,
+        they are not searched for nested refs)"""
+        return bool(self._payloads) or self.remote
+
+    def resolve(self, value: Any) -> Any:
+        """Returns the payload of a ref (or the value, with the payloads of
+        its nested refs), without copying it. Payloads of shared refs are
+        views on the shared memory, and only valid during the run."""
+        if type(value) is PayloadRef:
+            return self._resolve(value)
+        if not self.holds_refs:
+            return value
+        return _walk(value, self._resolve)
+
+    def _resolve(self, value: PayloadRef) -> Any:
+        if value.shared is None:
+            try:
+                return self._payloads[value.key]
+            except KeyError:
+                raise PayloadError(f"Unknown payload {value.key}") from None
+        if value.shared in self._owned:
+            return self._payloads[value.key]
+        if value.shared not in self._attached:
+            self._attached[value.shared] = self._attach(value)
+        return self._attached[value.shared]
+
+    def materialize(self, value: Any) -> Any:
+        """Returns the payload of a ref (or the value, with the payloads of
+        its nested refs) as a value that outlives the run (copying it only
+        if it lives in a shared memory block of another process)"""
+        if type(value) is PayloadRef:
+            return self._materialize(value)
+        if not self.holds_refs:
+            return value
+        return _walk(value, self._materialize)
+
+    def _materialize(self, value: PayloadRef) -> Any:
+        if value.shared is None or value.shared in self._owned:
+            return self._resolve(value)
+
+        payload = self._resolve(value)
+        self.bytes_copied += value.nbytes
+        if value.dtype is not None:
+            return payload.copy()
+        return bytes(payload)
+
+    def share(self, value: Any) -> Any:
+        """Prepares a value to be sent to a worker process: refs (also
+        nested ones) are shared (once), unreferenced buffers are counted,
+        as they get pickled"""
+        if type(value) is PayloadRef:
+            return self._share(value)
+        self.bytes_copied += payload_size(value)
+        if not self.holds_refs:
+            return value
+        return _walk(value, self._share)
+
+    def _share(self, value: PayloadRef) -> PayloadRef:
+        if value.shared is not None:
+            return value
+        if value.key in self._shared:
+            return self._shared[value.key]
+
+        payload = self._resolve(value)
+        block = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+        self._owned[block.name] = block
+        shape = dtype = None
+        if np is not None and isinstance(payload, np.ndarray):
+            shape, dtype = payload.shape, payload.dtype.str
+            np.ndarray(shape, dtype=payload.dtype, buffer=block.buf)[...] = payload
+        else:
+            block.buf[: value.nbytes] = memoryview(payload).cast("B")
+        self.bytes_copied += value.nbytes
+
+        shared = value.replace(shared=block.name, shape=shape, dtype=dtype)
+        self._shared[value.key] = shared
+        return shared
+
+    def received(self, value: Any):
+        """Counts a value that was received from a worker process (and was
+        pickled, if it is an unreferenced buffer)"""
+        if type(value) is not PayloadRef:
+            self.bytes_copied += payload_size(value)
+
+    def _attach(self, ref: PayloadRef) -> Any:
+        try:
+            block = shared_memory.SharedMemory(name=ref.shared)
+        except FileNotFoundError:
+            raise PayloadError(f"Payload {ref.key} was released") from None
+        self._blocks[ref.shared] = block
+        if ref.dtype is not None:
+            return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=block.buf)
+        return block.buf[: ref.nbytes]
+
+    def release(self):
+        """Releases the payloads (and unlinks the shared memory blocks) of
+        the run. Views that are still held keep their mapping alive."""
+        self._payloads.clear()
+        self._shared.clear()
+        self._attached.clear()
+        for block in self._blocks.values():
+            _close(block)
+        for block in self._owned.values():
+            _close(block)
+            block.unlink()
+        self._blocks = {}
+        self._owned = {}
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
+
+
+def _close(block: shared_memory.SharedMemory):
+    try:
+        block.close()
+    except BufferError:
+        # A view on the block is still held, the mapping goes with it
+        pass
+
+
+current_payloads: ContextVar[Optional[PayloadStore]] = ContextVar(
+    "current_payloads", default=None
+)
+""" The payload store of the run (set for the atoms of a run)"""
+
+
+def reference(value: Any) -> Any:
+    """Returns a ref for a large payload, if the run has a payload store"""
+    store = current_payloads.get()
+    return store.ref(value) if store else value
+
+
+def resolve(value: Any) -> Any:
+    """Returns the payload of a ref (without copying it)"""
+    store = current_payloads.get()
+    return store.resolve(value) if store else value
+
+
+def materialize(value: Any) -> Any:
+    """Returns the payload of a ref, for Arkitekt and the return node"""
+    store = current_payloads.get()
+    return store.materialize(value) if store else value
@@ -0,0 +1,549 @@
+"""Synthetic flows for tests, benchmarks and scaling studies
+
+Builds valid `FlowFragment`s of arbitrary size and shape (chains, fan-outs,
+combination trees, generator-fed chunk streams) without a fluss server, and
+`SyntheticContract`s that stand in for the arkitekt nodes of these flows
+with a configurable latency. A synthetic flow runs offline on a FlowActor
+that uses a `SyntheticContractor` as its `arkitekt_contractor`.
+"""
+import asyncio
+import logging
+import math
+import random
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from fluss.api.schema import ArkitektNodeFragment, FlowFragment
+from pydantic import BaseModel, Field
+from rekuest.actors.base import Actor
+from rekuest.postmans.utils import RPCContract
+
+logger = logging.getLogger(__name__)
+
+
+def build_port(key: str, kind: str = "INT", nullable: bool = False, child=None):
+    port = {"key": key, "kind": kind, "scope": "GLOBAL", "nullable": nullable}
+    if kind == "LIST":
+        port["child"] = child or {"kind": "INT", "scope": "GLOBAL", "nullable": False}
+    return port
+
+
+def build_ports(count: int, key: str = "a", **kwargs) -> List[Dict]:
+    """Builds `count` ports with distinct keys (args are bound by key)"""
+    return [build_port(f"{key}_{index}", **kwargs) for index in range(count)]
+
+
+def build_node(id: str, typename: str, instream=None, outstream=None, **kwargs):
+    return {
+        "__typename": typename,
+        "id": id,
+        "typename": typename,
+        "position": {"x": 0, "y": 0},
+        "instream": instream if instream is not None else [[build_port("a")]],
+        "outstream": outstream if outstream is not None else [[build_port("a")]],
+        "constream": [],
+        **kwargs,
+    }
+
+
+def build_reactive_node(id: str, implementation: str, defaults=None, **kwargs):
+    return build_node(
+        id,
+        "ReactiveNode",
+        implementation=implementation,
+        defaults=defaults if defaults is not None else {},
+        **kwargs,
+    )
+
+
+def build_arkitekt_node(
+    id: str,
+    kind: str = "FUNCTION",
+    strategy: str = "MAP",
+    hash: str = "synthetic",
+    defaults=None,
+    **kwargs,
+):
+    """Builds an arkitekt node (its contract is set up by the
+    `arkitekt_contractor` of the actor, e.g. a `SyntheticContractor`)"""
+    return build_node(
+        id,
+        "ArkitektNode",
+        name=hash,
+        hash=hash,
+        kind=kind,
+        mapStrategy=strategy,
+        allowLocal=False,
+        reserveParams={},
+        assignTimeout=0,
+        yieldTimeout=0,
+        reserveTimeout=0,
+        maxRetries=0,
+        retryDelay=0,
+        defaults=defaults if defaults is not None else {},
+        **kwargs,
+    )
+
+
+def build_edge(
+    source: str, target: str, source_handle="return_0", target_handle="arg_0"
+):
+    return {
+        "__typename": "LabeledEdge",
+        "id": f"{source}-{source_handle}-{target}-{target_handle}",
+        "typename": "LabeledEdge",
+        "source": source,
+        "sourceHandle": source_handle,
+        "target": target,
+        "targetHandle": target_handle,
+        "stream": [build_port("a")],
+    }
+
+
+def build_flow(nodes, edges, args=None, returns=None, globals=None, name="flow"):
+    return FlowFragment(
+        **{
+            "__typename": "Flow",
+            "id": "1",
+            "name": name,
+            "hash": name,
+            "brittle": False,
+            "createdAt": "2023-01-01T00:00:00",
+            "workspace": None,
+            "graph": {
+                "nodes": nodes,
+                "edges": edges,
+                "globals": globals or [],
+                "args": args if args is not None else [build_port("a")],
+                "returns": returns if returns is not None else [build_port("a")],
+            },
+        }
+    )
+
+
+def _chain(
+    nodes, edges, previous: str, prefix: str, length: int, build, handle="return_0"
+) -> str:
+    """Appends `length` nodes (built by `build(id)`) after the `handle` of
+    `previous`, and returns the id of the last one"""
+    for i in range(length):
+        node_id = f"{prefix}_{i}"
+        nodes.append(build(node_id))
+        edges.append(build_edge(previous, node_id, handle if i == 0 else "return_0"))
+        previous = node_id
+    return previous
+
+
+def _adder(implementation: str):
+    return lambda id: build_reactive_node(id, implementation, defaults={"number": 1})
+
+
+def _chunked(list_port) -> Tuple[List[Dict], List[Dict]]:
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]], outstream=[[list_port]]),
+        build_reactive_node("chunk", "CHUNK", instream=[[list_port]]),
+    ]
+    return nodes, [build_edge("arg", "chunk")]
+
+
+def build_linear_flow(length: int, implementation: str = "ADD"):
+    """Builds a flow of `length` reactive nodes chained between
+    the arg and the return node"""
+    nodes = [build_node("arg", "ArgNode", instream=[[]])]
+    edges = []
+
+    previous = _chain(
+        nodes, edges, "arg", implementation.lower(), length, _adder(implementation)
+    )
+
+    nodes.append(build_node("return", "ReturnNode", outstream=[[]]))
+    edges.append(build_edge(previous, "return"))
+
+    return build_flow(nodes, edges, name=f"linear_{length}")
+
+
+def build_map_chain_flow(length: int, strategy: str = "MAP", **defaults):
+    """Builds a flow of `length` arkitekt nodes (MapAtoms, or the atom of
+    `strategy`) chained between the arg and the return node"""
+    nodes = [build_node("arg", "ArgNode", instream=[[]])]
+    edges = []
+
+    previous = _chain(
+        nodes,
+        edges,
+        "arg",
+        "map",
+        length,
+        lambda id: build_arkitekt_node(id, strategy=strategy, defaults=defaults),
+    )
+
+    nodes.append(build_node("return", "ReturnNode", outstream=[[]]))
+    edges.append(build_edge(previous, "return"))
+
+    return build_flow(nodes, edges, name=f"map_chain_{length}")
+
+
+def build_chunk_flow(implementation: str = "ADD", defaults=None, chunk_defaults=None):
+    """Builds a flow that chunks the list argument, applies one reactive node
+    to every item and buffers the results until completion"""
+    list_port = build_port("a", kind="LIST")
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]], outstream=[[list_port]]),
+        build_reactive_node("chunk", "CHUNK", chunk_defaults, instream=[[list_port]]),
+        build_reactive_node(
+            "map", implementation, defaults={"number": 1, **(defaults or {})}
+        ),
+        build_reactive_node("buffer", "BUFFER_COMPLETE", outstream=[[list_port]]),
+        build_node("return", "ReturnNode", instream=[[list_port]], outstream=[[]]),
+    ]
+    edges = [
+        build_edge("arg", "chunk"),
+        build_edge("chunk", "map"),
+        build_edge("map", "buffer"),
+        build_edge("buffer", "return"),
+    ]
+    return build_flow(nodes, edges, args=[list_port], returns=[list_port], name="chunk")
+
+
+def build_generator_flow(depth: int = 1, strategy: str = "MAP", **defaults):
+    """Builds a flow whose list argument is streamed by an arkitekt generator
+    (as often as its contract yields), chunked and mapped by `depth`
+    arkitekt nodes, and buffered until completion"""
+    list_port = build_port("a", kind="LIST")
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]], outstream=[[list_port]]),
+        build_arkitekt_node(
+            "generator",
+            kind="GENERATOR",
+            instream=[[list_port]],
+            outstream=[[list_port]],
+        ),
+        build_reactive_node("chunk", "CHUNK", instream=[[list_port]]),
+        build_reactive_node("buffer", "BUFFER_COMPLETE", outstream=[[list_port]]),
+        build_node("return", "ReturnNode", instream=[[list_port]], outstream=[[]]),
+    ]
+    edges = [build_edge("arg", "generator"), build_edge("generator", "chunk")]
+
+    previous = _chain(
+        nodes,
+        edges,
+        "chunk",
+        "map",
+        depth,
+        lambda id: build_arkitekt_node(id, strategy=strategy, defaults=defaults),
+    )
+    edges.append(build_edge(previous, "buffer"))
+    edges.append(build_edge("buffer", "return"))
+
+    return build_flow(
+        nodes,
+        edges,
+        args=[list_port],
+        returns=[list_port],
+        name=f"generator_{depth}",
+    )
+
+
+def build_fanout_flow(width: int, depth: int = 1, implementation: str = "ADD"):
+    """Builds a flow that chunks the list argument into `width` parallel
+    branches of `depth` reactive nodes, that are zipped back together"""
+    list_port = build_port("a", kind="LIST")
+    nodes, edges = _chunked(list_port)
+    nodes += [
+        build_reactive_node(
+            "zip",
+            "ZIP",
+            instream=[[build_port("a")] for _ in range(width)],
+            outstream=[build_ports(width)],
+        ),
+        build_node(
+            "return", "ReturnNode", instream=[build_ports(width)], outstream=[[]]
+        ),
+    ]
+    edges.append(build_edge("zip", "return"))
+
+    for branch in range(width):
+        previous = _chain(
+            nodes,
+            edges,
+            "chunk",
+            f"{implementation.lower()}_{branch}",
+            depth,
+            _adder(implementation),
+        )
+        edges.append(build_edge(previous, "zip", target_handle=f"arg_{branch}"))
+
+    return build_flow(
+        nodes,
+        edges,
+        args=[list_port],
+        returns=build_ports(width),
+        name=f"fanout_{width}_{depth}",
+    )
+
+
+def build_split_flow(width: int, depth: int = 1, implementation: str = "ADD"):
+    """Builds a flow that splits its `width` arguments into `width` parallel
+    branches of `depth` reactive nodes, that are zipped back together"""
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]], outstream=[build_ports(width)]),
+        build_reactive_node(
+            "split",
+            "SPLIT",
+            instream=[build_ports(width)],
+            outstream=[[build_port("a")] for _ in range(width)],
+        ),
+        build_reactive_node(
+            "zip",
+            "ZIP",
+            instream=[[build_port("a")] for _ in range(width)],
+            outstream=[build_ports(width)],
+        ),
+        build_node(
+            "return", "ReturnNode", instream=[build_ports(width)], outstream=[[]]
+        ),
+    ]
+    edges = [build_edge("arg", "split"), build_edge("zip", "return")]
+
+    for branch in range(width):
+        previous = _chain(
+            nodes,
+            edges,
+            "split",
+            f"{implementation.lower()}_{branch}",
+            depth,
+            _adder(implementation),
+            handle=f"return_{branch}",
+        )
+        edges.append(build_edge(previous, "zip", target_handle=f"arg_{branch}"))
+
+    return build_flow(
+        nodes,
+        edges,
+        args=build_ports(width),
+        returns=build_ports(width),
+        name=f"split_{width}_{depth}",
+    )
+
+
+def build_fanin_flow(width: int, implementation: str = "ADD", combinator: str = "ZIP"):
+    """Builds a flow that chunks the list argument into `width` branches of
+    one reactive node, that are merged pairwise by a tree of combination
+    nodes (ZIP or WITHLATEST) of depth ceil(log2(width))"""
+    list_port = build_port("a", kind="LIST")
+    nodes, edges = _chunked(list_port)
+
+    level = []
+    for branch in range(width):
+        node_id = f"{implementation.lower()}_{branch}"
+        nodes.append(_adder(implementation)(node_id))
+        edges.append(build_edge("chunk", node_id))
+        level.append((node_id, 1))
+
+    depth = 0
+    while len(level) > 1:
+        merged = []
+        for i in range(0, len(level) - 1, 2):
+            (left, left_size), (right, right_size) = level[i], level[i + 1]
+            node_id = f"{combinator.lower()}_{depth}_{i // 2}"
+            size = left_size + right_size
+            nodes.append(
+                build_reactive_node(
+                    node_id,
+                    combinator,
+                    instream=[build_ports(left_size), build_ports(right_size)],
+                    outstream=[build_ports(size)],
+                )
+            )
+            edges.append(build_edge(left, node_id))
+            edges.append(build_edge(right, node_id, target_handle="arg_1"))
+            merged.append((node_id, size))
+        if len(level) % 2:
+            # The odd one out is merged on the next level
+            merged.append(level[-1])
+        level = merged
+        depth += 1
+
+    returns = build_ports(width)
+    nodes.append(build_node("return", "ReturnNode", instream=[returns], outstream=[[]]))
+    edges.append(build_edge(level[0][0], "return"))
+
+    return build_flow(
+        nodes,
+        edges,
+        args=[list_port],
+        returns=returns,
+        name=f"fanin_{combinator.lower()}_{width}",
+    )
+
+
+def build_diamond_flow(depth: int = 1, implementation: str = "ADD"):
+    """Builds a flow that chunks the list argument into one reactive node,
+    whose events take two branches of `depth` reactive nodes, that are
+    zipped back together"""
+    list_port = build_port("a", kind="LIST")
+    pair = build_ports(2)
+    nodes, edges = _chunked(list_port)
+    nodes += [
+        _adder(implementation)("top"),
+        build_reactive_node(
+            "zip",
+            "ZIP",
+            instream=[[build_port("a")], [build_port("a")]],
+            outstream=[pair],
+        ),
+        build_node("return", "ReturnNode", instream=[pair], outstream=[[]]),
+    ]
+    edges += [build_edge("chunk", "top"), build_edge("zip", "return")]
+
+    for branch in range(2):
+        previous = _chain(
+            nodes,
+            edges,
+            "top",
+            f"{implementation.lower()}_{branch}",
+            depth,
+            _adder(implementation),
+        )
+        edges.append(build_edge(previous, "zip", target_handle=f"arg_{branch}"))
+
+    return build_flow(
+        nodes, edges, args=[list_port], returns=pair, name=f"diamond_{depth}"
+    )
+
+
+class Distribution(str, Enum):
+    CONSTANT = "CONSTANT"
+    UNIFORM = "UNIFORM"
+    """ Uniform between mean - spread and mean + spread"""
+    EXPONENTIAL = "EXPONENTIAL"
+    """ Exponential with the mean (spread is ignored)"""
+    LOGNORMAL = "LOGNORMAL"
+    """ Log-normal with the mean and a standard deviation of spread"""
+
+
+class Latency(BaseModel):
+    """A distribution of latencies (in seconds)"""
+
+    distribution: Distribution = Distribution.CONSTANT
+    mean: float = 0
+    spread: float = 0
+    seed: Optional[int] = None
+    """ Seeds the latencies of the contract (for reproducible runs)"""
+
+    _random: Optional[random.Random] = None
+
+    def sample(self) -> float:
+        if self._random is None:
+            self._random = random.Random(self.seed)
+
+        if self.mean <= 0:
+            return 0
+        if self.distribution == Distribution.UNIFORM:
+            return max(
+                0.0,
+                self._random.uniform(self.mean - self.spread, self.mean + self.spread),
+            )
+        if self.distribution == Distribution.EXPONENTIAL:
+            return self._random.expovariate(1 / self.mean)
+        if self.distribution == Distribution.LOGNORMAL:
+            sigma = math.sqrt(math.log(1 + (self.spread / self.mean) ** 2))
+            return self._random.lognormvariate(
+                math.log(self.mean) - sigma**2 / 2, sigma
+            )
+        return self.mean
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
+
+
+class SyntheticContract(RPCContract):
+    """Stands in for the contract of an arkitekt node
+
+    Every assignment waits for a sampled latency and returns its args (in
+    the order of the instream) under the keys of the outstream, generators
+    yield them `stream_count` times (each after a sampled latency).
+    """
+
+    def __init__(
+        self,
+        node: ArkitektNodeFragment,
+        latency: Optional[Latency] = None,
+        stream_count: int = 3,
+    ) -> None:
+        self.node = node
+        self.latency = latency or Latency()
+        self.stream_count = stream_count
+        self.active = False
+        self.assignments = 0
+
+    async def aenter(self):
+        self.active = True
+        return self
+
+    async def aexit(self):
+        self.active = False
+
+    async def __aenter__(self):
+        return await self.aenter()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aexit()
+
+    def echo(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        args = [kwargs.get(port.key) for port in self.node.instream[0]]
+        return {
+            port.key: args[index] if index < len(args) else None
+            for index, port in enumerate(self.node.outstream[0])
+        }
+
+    async def aassign(self, kwargs: Dict[str, Any], **_) -> Dict[str, Any]:
+        assert self.active, "We never entered the contract"
+        self.assignments += 1
+        await asyncio.sleep(self.latency.sample())
+        return self.echo(kwargs)
+
+    async def aassign_retry(self, kwargs: Dict[str, Any], **_) -> Dict[str, Any]:
+        return await self.aassign(kwargs)
+
+    async def astream(self, kwargs: Dict[str, Any], **_):
+        assert self.active, "We never entered the contract"
+        self.assignments += 1
+        for _ in range(self.stream_count):
+            await asyncio.sleep(self.latency.sample())
+            yield self.echo(kwargs)
+
+    async def astream_retry(self, kwargs: Dict[str, Any], **_):
+        async for returns in self.astream(kwargs):
+            yield returns
+
+
+class SyntheticContractor(BaseModel):
+    """A NodeContractor that gives every arkitekt node a SyntheticContract
+    (with the latency of its node id in `latencies`, or `latency`)"""
+
+    latency: Latency = Field(default_factory=Latency)
+    latencies: Dict[str, Latency] = Field(default_factory=dict)
+    stream_count: int = 3
+    """ How often generator nodes yield"""
+
+    contracts: Dict[str, SyntheticContract] = Field(default_factory=dict)
+    """ The contracts that were set up (by node id)"""
+
+    async def __call__(self, node: ArkitektNodeFragment, actor: Actor):
+        latency = self.latencies.get(node.id, self.latency)
+        if latency.seed is not None:
+            # Every node samples its own (reproducible) sequence
+            latency = latency.copy(update={"seed": latency.seed + len(self.contracts)})
+        contract = SyntheticContract(
+            node=node,
+            latency=latency.copy(),
+            stream_count=self.stream_count,
+        )
+        self.contracts[node.id] = contract
+        return contract
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
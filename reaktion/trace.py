@@ -0,0 +1,110 @@
+import logging
+import os
+from enum import IntEnum
+from typing import Any, Optional
+
+logger = logging.getLogger("reaktion.trace")
+
+
+class TraceLevel(IntEnum):
+    """How much of a run is traced"""
+
+    OFF = 0
+    RUNS = 1
+    """ The lifecycle of runs (started, yielded, done)"""
+    EVENTS = 2
+    """ Additionally every event that is put, routed or received"""
+    VALUES = 3
+    """ Additionally the values of the events (can be large)"""
+
+
+class LazyEvent:
+    """Formats an event only if a trace record of it is emitted"""
+
+    __slots__ = ("event", "values")
+
+    def __init__(self, event: Any, values: bool = False) -> None:
+        self.event = event
+        self.values = values
+
+    def __str__(self) -> str:
+        event = self.event
+        where = getattr(event, "target", None) or getattr(event, "source", None)
+        t = getattr(event, "current_t", None)
+        if t is None:
+            t = getattr(event, "caused_by", None)
+        text = f"{where}.{event.handle} {event.type.value} t={t}"
+        if self.values:
+            text += f" value={event.value!r}"
+        return text
+
+
+class EventTracer:
+    """Traces runs and events to the `reaktion.trace` logger
+
+    The level and the sampling rate can be changed at runtime (see
+    `configure`). The checks on the hot path are plain attribute reads
+    (`tracer.events`), and records are formatted lazily, so that tracing
+    costs nothing while it is off (or filtered by the logging config).
+    Every record carries the traced fields as `record.trace` (for
+    structured handlers).
+    """
+
+    def __init__(self, level: TraceLevel = TraceLevel.OFF, sample_every: int = 1):
+        self.configure(level, sample_every)
+
+    def configure(
+        self, level: Optional[TraceLevel] = None, sample_every: Optional[int] = None
+    ):
+        """Sets the level and/or traces only every nth event"""
+        if level is not None:
+            self.level = TraceLevel(level)
+        if sample_every is not None:
+            self.sample_every = max(1, sample_every)
+        self.runs = self.level >= TraceLevel.RUNS
+        self.events = self.level >= TraceLevel.EVENTS
+        self.values = self.level >= TraceLevel.VALUES
+        self._seen = 0
+
+    def run(self, what: str, run: Any, **fields: Any):
+        """Traces a step in the lifecycle of a run"""
+        if self.runs and logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "run %s %s",
+                run,
+                what,
+                extra={"trace": {"kind": what, "run": run, **fields}},
+            )
+
+    def event(self, what: str, event: Any):
+        """Traces an event (sampled)"""
+        if not self.events:
+            return
+        self._seen += 1
+        if self._seen % self.sample_every or not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            "%s %s",
+            what,
+            LazyEvent(event, self.values),
+            extra={"trace": {"kind": what, "event": event}},
+        )
+
+
+def _level_from_env() -> TraceLevel:
+    name = os.environ.get("REAKTION_TRACE", "OFF").upper()
+    return TraceLevel[name] if name in TraceLevel.__members__ else TraceLevel.OFF
+
+
+tracer = EventTracer(
+    _level_from_env(), int(os.environ.get("REAKTION_TRACE_SAMPLE", "1") or 1)
+)
+""" The tracer of the process (set up from the REAKTION_TRACE and
+REAKTION_TRACE_SAMPLE environment variables)"""
+
+
+def configure_trace(
+    level: Optional[TraceLevel] = None, sample_every: Optional[int] = None
+):
+    """Changes the level and/or sampling rate of the tracer at runtime"""
+    tracer.configure(level, sample_every)
@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+from pydantic import BaseModel
+
+from reaktion.events import EventType
+
+logger = logging.getLogger(__name__)
+
+
+class DropPolicy(str, Enum):
+    """What the RunTracker does when more than `max_pending` records are waiting"""
+
+    BLOCK = "BLOCK"
+    """ Block the caller until the writer caught up (backpressure)"""
+    DROP_OLDEST = "DROP_OLDEST"
+    """ Drop the oldest pending record"""
+    DROP_NEWEST = "DROP_NEWEST"
+    """ Drop the record that is being tracked"""
+
+
+class TrackingMode(str, Enum):
+    """Which events of a run are reported"""
+
+    ALL = "ALL"
+    """ Track every event"""
+    OFF = "OFF"
+    """ Track nothing (and take no snapshots)"""
+    ERRORS = "ERRORS"
+    """ Only track ERROR and COMPLETE events"""
+    SAMPLE = "SAMPLE"
+    """ Track every `sample_every`th NEXT event of a node (and all others)"""
+    RATE = "RATE"
+    """ Track at most `rate_limit` NEXT events of a node per `rate_window`"""
+
+
+class TrackRecord(NamedTuple):
+    source: str
+    handle: str
+    type: EventType
+    value: Any
+    caused_by: Tuple[int, ...]
+    t: int
+
+
+class RunTracker(BaseModel):
+    """Reports the events of a run in the background
+
+    Events are tracked by appending them to a bounded buffer, that is drained
+    by a writer task. The writer flushes whenever `flush_size` records are
+    pending or `flush_interval` seconds passed, sends the records of a batch
+    concurrently and snapshots the run every `snapshot_interval` timepoints.
+    The dispatch loop therefore never waits for a round-trip to fluss
+    (unless the drop policy is BLOCK and the writer falls behind).
+
+    ERROR and COMPLETE records are never dropped, so the buffer can exceed
+    `max_pending` by at most two records per node.
+    """
+
+    run: Any
+    track_mutation: Callable
+    snapshot_mutation: Callable
+    snapshot_interval: int = 40
+    flush_size: int = 50
+    flush_interval: float = 0.5
+    max_pending: int = 1000
+    drop_policy: DropPolicy = DropPolicy.DROP_OLDEST
+    mode: TrackingMode = TrackingMode.ALL
+    sample_every: int = 10
+    rate_limit: int = 1
+    rate_window: float = 1.0
+
+    dropped: int = 0
+    """ The number of records (and snapshots) that were dropped"""
+    skipped: int = 0
+    """ The number of events that were not tracked because of the mode"""
+
+    _pending: Deque[TrackRecord] = None
+    _state: Dict[str, Any] = None
+    _has_pending: asyncio.Event = None
+    _has_space: asyncio.Event = None
+    _writer: Optional[asyncio.Task] = None
+    _closing: bool = False
+    _last_snapshot_t: int = 0
+    _write_lock: asyncio.Lock = None
+    _seen: Dict[str, int] = None
+    _windows: Dict[str, Tuple[float, int]] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def aenter(self):
+        self._pending = deque()
+        self._state = {}
+        self._has_pending = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._write_lock = asyncio.Lock()
+        self._seen = {}
+        self._windows = {}
+        self._closing = False
+        self._writer = asyncio.create_task(self.write())
+
+    async def aexit(self):
+        if self._writer:
+            # The writer finishes the batch it is writing and stops
+            self._closing = True
+            self._has_pending.set()
+            try:
+                await self._writer
+            except Exception:
+                logger.error("Tracking writer failed", exc_info=True)
+            self._writer = None
+
+        await self.aflush()
+
+    async def __aenter__(self):
+        await self.aenter()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aexit()
+
+    def should_track(self, event) -> bool:
+        """Decides (according to the mode) if an event should be tracked"""
+        if self.mode == TrackingMode.ALL:
+            return True
+        if self.mode == TrackingMode.OFF:
+            return False
+        if event.type != EventType.NEXT:
+            return True
+        if self.mode == TrackingMode.ERRORS:
+            return False
+
+        if self.mode == TrackingMode.SAMPLE:
+            seen = self._seen.get(event.source, 0)
+            self._seen[event.source] = seen + 1
+            return seen % self.sample_every == 0
+
+        now = time.monotonic()
+        window_start, count = self._windows.get(event.source, (now, 0))
+        if now - window_start >= self.rate_window:
+            window_start, count = now, 0
+        self._windows[event.source] = (window_start, count + 1)
+        return count < self.rate_limit
+
+    async def track(self, event, t: int):
+        """Queues an event for reporting (if the mode allows it)"""
+        if not self.should_track(event):
+            self.skipped += 1
+            return
+
+        record = TrackRecord(
+            source=event.source,
+            handle=event.handle,
+            type=event.type,
+            value=event.value,
+            caused_by=event.caused_by,
+            t=t,
+        )
+
+        if len(self._pending) >= self.max_pending and record.type == EventType.NEXT:
+            if self.drop_policy == DropPolicy.BLOCK:
+                while len(self._pending) >= self.max_pending:
+                    self._has_space.clear()
+                    await self._has_space.wait()
+            elif self.drop_policy == DropPolicy.DROP_NEWEST:
+                self.dropped += 1
+                return
+            else:
+                for index, pending in enumerate(self._pending):
+                    if pending.type == EventType.NEXT:
+                        del self._pending[index]
+                        self.dropped += 1
+                        break
+
+        self._pending.append(record)
+        if len(self._pending) >= self.flush_size:
+            self._has_pending.set()
+
+    async def asnapshot(self, t: int):
+        """Flushes all pending records and snapshots the run at timepoint t"""
+        if self.mode == TrackingMode.OFF:
+            return
+
+        await self.aflush()
+        await self.write_snapshot(t)
+
+    async def write_snapshot(self, t: int):
+        """Snapshots the run at timepoint t. A failed snapshot is logged
+        and counted as dropped (it never fails the run)"""
+        try:
+            await self.snapshot_mutation(
+                run=self.run, events=list(self._state.values()), t=t
+            )
+            self._last_snapshot_t = t
+        except Exception:
+            self.dropped += 1
+            logger.error("Snapshotting failed", exc_info=True)
+
+    async def aflush(self):
+        """Writes all pending records, and waits for the batch that the
+        writer is writing"""
+        while True:
+            while self._pending:
+                await self.write_batch()
+            async with self._write_lock:
+                if not self._pending:
+                    return
+
+    async def write_batch(self):
+        async with self._write_lock:
+            batch = [
+                self._pending.popleft()
+                for _ in range(min(self.flush_size, len(self._pending)))
+            ]
+            self._has_space.set()
+
+            if not batch:
+                return
+
+            results = await asyncio.gather(
+                *[
+                    self.track_mutation(
+                        run=self.run,
+                        source=record.source,
+                        handle=record.handle,
+                        caused_by=record.caused_by,
+                        value=(
+                            record.value
+                            if record.value and not isinstance(record.value, Exception)
+                            else str(record.value)
+                        ),
+                        type=record.type,
+                        t=record.t,
+                    )
+                    for record in batch
+                ],
+                return_exceptions=True,
+            )
+
+            for record, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Tracking {record.source} failed", exc_info=result)
+                    continue
+                self._state[record.source] = result.id
+
+            t = batch[-1].t
+            if (
+                t // self.snapshot_interval
+                > self._last_snapshot_t // self.snapshot_interval
+            ):
+                await self.write_snapshot(t)
+
+    async def write(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(
+                    self._has_pending.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+            self._has_pending.clear()
+            await self.write_batch()
+
+            if len(self._pending) >= self.flush_size:
+                self._has_pending.set()
+
+    class Config:
+        arbitrary_types_allowed = True
+        underscore_attrs_are_private = True
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from rekuest.api.schema import NodeKindInput, DefinitionInput, PortInput, NodeKind
 from fluss.api.schema import (
     FlowFragmentGraph,
@@ -10,7 +10,7 @@ from fluss.api.schema import (
     ArkitektNodeFragment,
     GraphNodeFragment,
 )
-from .events import OutEvent, InEvent
+from .events import OutEvent, InEvent, RawInEvent
 import pydantic
 from .errors import FlowLogicError
 
@@ -38,6 +38,66 @@ def connected_events(
     return events
 
 
+class EdgeTarget(NamedTuple):
+    target: str
+    """ The node that the edge points to """
+    handle: str
+    """ The handle of the port on the target node """
+
+
+RoutingTable = Dict[Tuple[str, str], Tuple[EdgeTarget, ...]]
+
+
+def build_routing_table(graph: FlowFragmentGraph) -> RoutingTable:
+    """Builds a routing table for the edges of a graph
+
+    The table maps every (source, source_handle) pair to the targets
+    that are connected to it, so that routing an event only costs
+    as much as its fan-out, instead of a scan over all edges.
+
+    The handles of every edge are validated here, so that the
+    events that are routed through the table do not need to be
+    validated again.
+
+    Args:
+        graph (FlowFragmentGraph): The graph to compile
+
+    Raises:
+        FlowLogicError: If an edge connects invalid handles
+
+    Returns:
+        RoutingTable: The routing table
+    """
+    table: Dict[Tuple[str, str], List[EdgeTarget]] = {}
+
+    for edge in graph.edges:
+        if not edge.source_handle.startswith("return_"):
+            raise FlowLogicError(f"Invalid source handle for {edge}")
+        if not edge.target_handle.startswith("arg_"):
+            raise FlowLogicError(f"Invalid target handle for {edge}")
+
+        table.setdefault((edge.source, edge.source_handle), []).append(
+            EdgeTarget(target=edge.target, handle=edge.target_handle)
+        )
+
+    return {key: tuple(targets) for key, targets in table.items()}
+
+
+def routed_events(table: RoutingTable, event: OutEvent, t: int) -> List[RawInEvent]:
+    """Same as connected_events, but uses a prebuilt (and already validated)
+    routing table and creates validation-free events"""
+    return [
+        RawInEvent(
+            target=edge_target.target,
+            handle=edge_target.handle,
+            type=event.type,
+            value=event.value,
+            current_t=t,
+        )
+        for edge_target in table.get((event.source, event.handle), ())
+    ]
+
+
 def infer_kind_from_graph(graph: FlowFragmentGraph) -> NodeKindInput:
     kind = NodeKindInput.FUNCTION
 
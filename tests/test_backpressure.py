@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.errors import AtomQueueFull
+from reaktion.atoms.transport import MockTransport
+from reaktion.atoms.utils import atomify
+from reaktion.atoms.operations.math import MathAtom
+from reaktion.events import EventType, InEvent
+
+from .utils import MockAssignTransport, build_chunk_flow, build_flow_actor
+
+
+def next_event(node, t):
+    return InEvent(
+        target=node.id, handle="arg_0", type=EventType.NEXT, value=(t,), current_t=t
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_bounded_atom_blocks_and_raises(reactive_chunk_node):
+    atomtransport = MockTransport(queue=asyncio.Queue())
+    assignment = Assignment(assignation=1, user=1, provision=1, args=[])
+
+    async with MathAtom(
+        node=reactive_chunk_node.copy(update={"implementation": "ADD"}),
+        transport=atomtransport,
+        assignment=assignment,
+        queue_size=2,
+    ) as atom:
+        await atom.put(next_event(atom.node, 0))
+        await atom.put(next_event(atom.node, 1))
+
+        with pytest.raises(AtomQueueFull):
+            atom.put_nowait(next_event(atom.node, 2))
+
+        blocked = asyncio.create_task(atom.put(next_event(atom.node, 2)))
+        await asyncio.sleep(0.05)
+        assert not blocked.done(), "Put should wait for free capacity"
+
+        await atom.get()
+        await asyncio.wait_for(blocked, timeout=0.1)
+
+        stats = atom.queue_stats()
+        assert stats.depth == 2
+        assert stats.capacity == 2
+        assert stats.high_water == 2
+        assert stats.waits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_reservations_are_used_by_put(reactive_chunk_node):
+    atomtransport = MockTransport(queue=asyncio.Queue())
+    assignment = Assignment(assignation=1, user=1, provision=1, args=[])
+
+    async with MathAtom(
+        node=reactive_chunk_node.copy(update={"defaults": {"queue_size": 1}}),
+        transport=atomtransport,
+        assignment=assignment,
+    ) as atom:
+        await atom.reserve()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(atom.reserve(), timeout=0.05)
+
+        # The reservation is consumed, so this does not block
+        await asyncio.wait_for(atom.put(next_event(atom.node, 0)), timeout=0.05)
+        assert atom.queue_stats().depth == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_backpressure_bounds_queues_in_flow():
+    atoms = []
+
+    def recording_atomify(*args, **kwargs):
+        atom = atomify(*args, **kwargs)
+        atoms.append(atom)
+        return atom
+
+    actor = build_flow_actor(
+        build_chunk_flow(), atom_queue_size=4, atomifier=recording_atomify
+    )
+    await actor.on_provide(actor.passport)
+
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[list(range(500))]),
+        actor.collector,
+        transport,
+    )
+
+    assert transport.changes[-1]["returns"] == ([i + 1 for i in range(500)],)
+    for atom in atoms:
+        assert atom.queue_stats().high_water <= 4
+    assert any(atom.queue_stats().waits > 0 for atom in atoms)
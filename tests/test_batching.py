@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from fluss.api.schema import FlowNodeFragmentBaseArkitektNode
+from rekuest.actors.types import Assignment
+from rekuest.postmans.utils import mockuse
+
+from reaktion.atoms.arkitekt import ArkitektBatchMapAtom, ArkitektMapAtom
+from reaktion.atoms.transport import MockTransport
+from reaktion.atoms.utils import atomify
+from reaktion.events import EventType, InEvent
+
+from .utils import expectnext
+
+
+class BatchMockContract(mockuse):
+    """A mockuse contract for a node that doubles a list of ints"""
+
+    def __init__(self):
+        self.reserve_sleep = 0
+        self.unreserve_sleep = 0
+        self.batches = []
+
+    async def aassign_retry(self, kwargs, parent=None, reference=None, **_):
+        assert self.active, "We never entered the contract"
+        self.batches.append(len(kwargs["1"]))
+        await asyncio.sleep(0.001)
+        return {"1": [value * 2 for value in kwargs["1"]]}
+
+
+def batch_node(node: FlowNodeFragmentBaseArkitektNode, **defaults):
+    return node.copy(update={"defaults": defaults})
+
+
+def next_event(atom, t):
+    return InEvent(
+        target=atom.node.id,
+        handle="arg_0",
+        type=EventType.NEXT,
+        value=(t,),
+        current_t=t,
+    )
+
+
+def atomify_node(node, globals=None, contract=None, transport=None):
+    return atomify(
+        node,
+        transport or MockTransport(queue=asyncio.Queue()),
+        contract or BatchMockContract(),
+        globals or {},
+        Assignment(assignation=1, user=1, provision=1, args=[]),
+    )
+
+
+@pytest.mark.actor
+def test_batchable_opts_into_batching(arkitekt_functional_node):
+    atom = atomify_node(
+        batch_node(arkitekt_functional_node, batchable=True, batch_size=10)
+    )
+    assert isinstance(atom, ArkitektBatchMapAtom)
+    assert atom.assign_values == {}, "Batch options are no kwargs"
+
+
+@pytest.mark.actor
+def test_batch_size_can_be_a_global(arkitekt_functional_node):
+    atom = atomify_node(
+        batch_node(arkitekt_functional_node, batchable=True), {"batch_size": 10}
+    )
+    assert isinstance(atom, ArkitektBatchMapAtom)
+    assert atom.set_values["batch_size"] == 10
+
+
+@pytest.mark.actor
+def test_batchable_can_be_a_global(arkitekt_functional_node):
+    atom = atomify_node(batch_node(arkitekt_functional_node), {"batchable": True})
+    assert isinstance(atom, ArkitektBatchMapAtom)
+
+
+@pytest.mark.actor
+def test_batch_size_needs_batchable(arkitekt_functional_node, caplog):
+    atom = atomify_node(batch_node(arkitekt_functional_node, batch_size=10))
+    assert type(atom) is ArkitektMapAtom
+    assert "without batching" in caplog.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_batches_are_fanned_out(arkitekt_functional_node):
+    contract = BatchMockContract()
+    await contract.aenter()
+    atomtransport = MockTransport(queue=asyncio.Queue())
+
+    async with atomify_node(
+        batch_node(arkitekt_functional_node, batchable=True, batch_size=4),
+        contract=contract,
+        transport=atomtransport,
+    ) as atom:
+        for t in range(10):
+            await atom.put(next_event(atom, t))
+        await atom.put(
+            InEvent(
+                target=atom.node.id,
+                handle="arg_0",
+                type=EventType.COMPLETE,
+                current_t=10,
+            )
+        )
+        await atom.start()
+
+        for t in range(10):
+            answer = await atomtransport.get(timeout=0.1)
+            expectnext(answer)
+            assert answer.value == (t * 2,)
+            assert answer.caused_by == (t,)
+
+        answer = await atomtransport.get(timeout=0.1)
+        assert answer.type == EventType.COMPLETE
+
+    assert contract.batches == [4, 4, 2]
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_partial_batches_are_flushed_on_timeout(arkitekt_functional_node):
+    contract = BatchMockContract()
+    await contract.aenter()
+    atomtransport = MockTransport(queue=asyncio.Queue())
+
+    async with atomify_node(
+        batch_node(
+            arkitekt_functional_node, batchable=True, batch_size=100, batch_timeout=5
+        ),
+        contract=contract,
+        transport=atomtransport,
+    ) as atom:
+        task = asyncio.create_task(atom.start())
+        await atom.put(next_event(atom, 1))
+
+        answer = await atomtransport.get(timeout=0.1)
+        expectnext(answer)
+        assert answer.value == (2,)
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    assert contract.batches == [1]
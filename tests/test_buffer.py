@@ -0,0 +1,211 @@
+import asyncio
+import time
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.transformation.buffer_complete import BufferCompleteAtom
+from reaktion.atoms.transformation.buffer_window import (
+    BufferCountAtom,
+    BufferCountOrTimeAtom,
+    BufferTimeAtom,
+)
+from reaktion.atoms.transformation.spill import SpillBuffer
+from reaktion.atoms.transport import MockTransport
+from reaktion.atoms.utils import atomify
+from reaktion.events import EventType, RawInEvent
+
+from .utils import expectnext
+
+
+async def buffer_items(node, items):
+    transport = MockTransport(queue=asyncio.Queue())
+    async with BufferCompleteAtom(
+        node=node, transport=transport, assignment=Assignment(assignation="1")
+    ) as atom:
+        task = asyncio.create_task(atom.start())
+        for t, item in enumerate(items):
+            atom.put_nowait(
+                RawInEvent(
+                    target=node.id,
+                    handle="arg_0",
+                    type=EventType.NEXT,
+                    value=(item,),
+                    current_t=t,
+                )
+            )
+        atom.put_nowait(
+            RawInEvent(
+                target=node.id,
+                handle="arg_0",
+                type=EventType.COMPLETE,
+                current_t=len(items),
+            )
+        )
+
+        event = await transport.get()
+        expectnext(event)
+        assert event.caused_by == tuple(range(len(items)))
+        assert (await transport.get()).type == EventType.COMPLETE
+        await task
+
+    return event.value[0]
+
+
+@pytest.mark.asyncio
+async def test_buffer_complete(reactive_zip_node):
+    items = list(range(100000))
+    assert await buffer_items(reactive_zip_node, items) == items
+
+
+@pytest.mark.asyncio
+async def test_buffer_complete_spills(reactive_zip_node, tmp_path):
+    node = reactive_zip_node.copy(
+        update={"defaults": {"spill_after": 1000, "spill_dir": str(tmp_path)}}
+    )
+    items = [str(i) for i in range(25500)]
+    assert await buffer_items(node, items) == items
+
+
+def test_spill_buffer_keeps_at_most_spill_after_items(tmp_path):
+    buffer = SpillBuffer(spill_after=10, directory=str(tmp_path))
+    for i in range(95):
+        buffer.extend([i])
+        assert len(buffer.items) < 10
+
+    assert len(buffer) == 95
+    assert buffer.collect() == list(range(95))
+    assert len(buffer) == 0
+
+
+def next_event(node, t, value):
+    return RawInEvent(
+        target=node.id, handle="arg_0", type=EventType.NEXT, value=value, current_t=t
+    )
+
+
+@pytest.mark.asyncio
+async def test_buffer_count(reactive_zip_node):
+    node = reactive_zip_node.copy(
+        update={"implementation": "BUFFER_COMPLETE", "defaults": {"buffer_count": 3}}
+    )
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(node, transport, None, {}, Assignment(assignation="1"))
+    assert isinstance(atom, BufferCountAtom)
+
+    async with atom:
+        task = asyncio.create_task(atom.start())
+        for t in range(5):
+            await atom.put(next_event(node, t, (t,)))
+        # An event with more items than fit in the window is split
+        await atom.put(next_event(node, 5, (5, 6)))
+
+        # Every list is caused by the events of its own items
+        event = await transport.get()
+        assert event.value == ([0, 1, 2],)
+        assert event.caused_by == (0, 1, 2)
+        event = await transport.get()
+        assert event.value == ([3, 4, 5],)
+        assert event.caused_by == (3, 4, 5)
+
+        await atom.put(
+            RawInEvent(
+                target=node.id, handle="arg_0", type=EventType.COMPLETE, current_t=6
+            )
+        )
+        event = await transport.get()
+        assert event.value == ([6],)
+        assert event.caused_by == (5,)
+        assert (await transport.get()).type == EventType.COMPLETE
+        await task
+
+
+@pytest.mark.parametrize(
+    "globals, atom_class",
+    [
+        ({}, BufferCompleteAtom),
+        ({"buffer_count": 3}, BufferCountAtom),
+        ({"buffer_time": 50}, BufferTimeAtom),
+        ({"buffer_count": 3, "buffer_time": 50}, BufferCountOrTimeAtom),
+    ],
+)
+def test_buffer_window_is_selected_from_globals(reactive_zip_node, globals, atom_class):
+    node = reactive_zip_node.copy(
+        update={"implementation": "BUFFER_COMPLETE", "defaults": {}}
+    )
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(node, transport, None, globals, Assignment(assignation="1"))
+    assert type(atom) is atom_class
+
+
+@pytest.mark.asyncio
+async def test_buffer_time_and_count(reactive_zip_node):
+    node = reactive_zip_node.copy(
+        update={
+            "implementation": "BUFFER_COMPLETE",
+            "defaults": {"buffer_count": 3, "buffer_time": 50},
+        }
+    )
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(node, transport, None, {}, Assignment(assignation="1"))
+    assert isinstance(atom, BufferCountOrTimeAtom)
+
+    async with atom:
+        task = asyncio.create_task(atom.start())
+        await atom.put(next_event(node, 0, (0,)))
+        await atom.put(next_event(node, 1, (1,)))
+
+        # The window of the first item elapses
+        with pytest.raises(asyncio.TimeoutError):
+            await transport.get(timeout=0.02)
+        event = await transport.get(timeout=0.1)
+        assert event.value == ([0, 1],)
+        assert event.caused_by == (0, 1)
+
+        # Nothing is emitted while the buffer is empty
+        with pytest.raises(asyncio.TimeoutError):
+            await transport.get(timeout=0.1)
+
+        for t in range(2, 5):
+            await atom.put(next_event(node, t, (t,)))
+        assert (await transport.get(timeout=0.01)).value == ([2, 3, 4],)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_buffer_time_under_steady_input(reactive_zip_node):
+    node = reactive_zip_node.copy(
+        update={"implementation": "BUFFER_COMPLETE", "defaults": {"buffer_time": 10}}
+    )
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(node, transport, None, {}, Assignment(assignation="1"))
+
+    async with atom:
+        task = asyncio.create_task(atom.start())
+
+        # The queue of the atom never runs empty for 30 windows
+        t = 0
+        end = time.monotonic() + 0.3
+        while time.monotonic() < end:
+            for _ in range(50):
+                atom.put_nowait(next_event(node, t, (t,)))
+                t += 1
+            await asyncio.sleep(0)
+
+        atom.put_nowait(
+            RawInEvent(
+                target=node.id, handle="arg_0", type=EventType.COMPLETE, current_t=t
+            )
+        )
+        await task
+
+    lists = []
+    while not transport.queue.empty():
+        event = await transport.get()
+        if event.type == EventType.NEXT:
+            lists.append(event.value[0])
+
+    assert len(lists) > 10, "A list should be emitted for every elapsed window"
+    assert [item for items in lists for item in items] == list(range(t))
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+
+import pytest
+from rekuest.actors.types import Assignment
+from rekuest.api.schema import PortFragment
+
+from reaktion.compiled import compile_flow
+from reaktion.errors import FlowLogicError, FlowValidationError
+from reaktion.synthetic import (
+    SyntheticContractor,
+    build_arkitekt_node,
+    build_reactive_node,
+)
+
+from .utils import (
+    MockAssignTransport,
+    build_edge,
+    build_flow,
+    build_flow_actor,
+    build_linear_flow,
+    build_node,
+    build_port,
+)
+
+
+def build_global_flow():
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]]),
+        build_node(
+            "add",
+            "ReactiveNode",
+            implementation="ADD",
+            constream=[[build_port("number")]],
+            defaults={},
+        ),
+        build_node(
+            "source",
+            "ReactiveNode",
+            implementation="ADD",
+            instream=[[]],
+            defaults={},
+        ),
+        build_node("return", "ReturnNode", outstream=[[]]),
+    ]
+    edges = [build_edge("arg", "add"), build_edge("add", "return")]
+    globals = [{"toKeys": ["add.number"], "port": build_port("number")}]
+    return build_flow(nodes, edges, globals=globals)
+
+
+def test_compile_classifies_nodes():
+    compiled = compile_flow(build_linear_flow(3))
+
+    assert compiled.arg_node.id == "arg"
+    assert compiled.return_node.id == "return"
+    assert [node.id for node in compiled.atom_nodes] == ["add_0", "add_1", "add_2"]
+    assert compiled.contract_nodes == []
+    assert compiled.source_nodes == []
+    assert compiled.stream_keys == ("a",)
+
+
+def test_bind_routes_globals():
+    compiled = compile_flow(build_global_flow())
+
+    assert [node.id for node in compiled.source_nodes] == ["source"]
+
+    ports = [
+        PortFragment(key="a", kind="INT", nullable=False, scope="GLOBAL"),
+        PortFragment(key="number", kind="INT", nullable=False, scope="GLOBAL"),
+    ]
+    value, globalMap = compiled.bind(ports, [1, 5])
+    assert value == [1]
+    assert globalMap == {"add": {"number": 5}}
+
+
+def test_compile_needs_arg_and_return_node():
+    flow = build_linear_flow(1)
+    broken = flow.copy(
+        update={
+            "graph": flow.graph.copy(
+                update={"nodes": [n for n in flow.graph.nodes if n.id != "return"]}
+            )
+        }
+    )
+
+    with pytest.raises(FlowLogicError):
+        compile_flow(broken)
+
+
+def rewire(flow, edge):
+    """Adds an edge (dict) to a flow"""
+    edges = [*flow.graph.edges, type(flow.graph.edges[0])(**edge)]
+    return flow.copy(update={"graph": flow.graph.copy(update={"edges": edges})})
+
+
+def build_gate_loop_flow():
+    """Builds a flow whose gate releases the next arg when the previous one
+    came back from the add node"""
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]]),
+        build_reactive_node(
+            "gate", "GATE", instream=[[build_port("a")], [build_port("a")]]
+        ),
+        build_reactive_node("add", "ADD", defaults={"number": 1}),
+        build_node("return", "ReturnNode", outstream=[[]]),
+    ]
+    edges = [
+        build_edge("arg", "gate"),
+        build_edge("gate", "add"),
+        build_edge("add", "gate", target_handle="arg_1"),
+        build_edge("add", "return"),
+    ]
+    return build_flow(nodes, edges)
+
+
+def test_compile_allows_loops_through_combination_nodes():
+    compiled = compile_flow(build_gate_loop_flow())
+    assert [node.id for node in compiled.atom_nodes] == ["gate", "add"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_gate_loops_run():
+    actor = build_flow_actor(build_gate_loop_flow())
+    await actor.on_provide(actor.passport)
+    transport = MockAssignTransport()
+    try:
+        await asyncio.wait_for(
+            actor.on_assign(
+                Assignment(assignation="1", args=[1]), actor.collector, transport
+            ),
+            timeout=5,
+        )
+    finally:
+        await actor.on_unprovide()
+
+    assert list(transport.changes[-1]["returns"]) == [2]
+
+
+@pytest.mark.parametrize(
+    "edge, problem",
+    [
+        (build_edge("add_0", "ghost"), "dangling"),
+        (build_edge("add_0", "add_1", target_handle="arg_1"), "1 instreams"),
+        (build_edge("add_0", "add_1", source_handle="return_3"), "1 outstreams"),
+        (build_edge("add_1", "arg"), "enters arg"),
+        (build_edge("add_2", "add_0", target_handle="arg_0"), "cycle"),
+    ],
+)
+def test_compile_rejects_wiring(edge, problem):
+    flow = build_linear_flow(3)
+    with pytest.raises(FlowValidationError) as error:
+        compile_flow(rewire(flow, edge))
+    assert any(problem in p for p in error.value.problems)
+
+
+def test_compile_rejects_unreachable_return_node():
+    flow = build_linear_flow(2)
+    edges = [e for e in flow.graph.edges if e.target != "add_1"]
+    broken = flow.copy(update={"graph": flow.graph.copy(update={"edges": edges})})
+
+    with pytest.raises(FlowValidationError) as error:
+        compile_flow(broken)
+    assert error.value.problems == [
+        "The return node can not be reached from the arg node",
+    ]
+
+
+def build_stray_flow():
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]]),
+        build_arkitekt_node("map"),
+        build_arkitekt_node("stray"),
+        build_node("return", "ReturnNode", outstream=[[]]),
+    ]
+    edges = [build_edge("arg", "map"), build_edge("map", "return")]
+    return build_flow(nodes, edges)
+
+
+def test_compile_skips_unreachable_nodes(caplog):
+    with caplog.at_level(logging.WARNING, logger="reaktion.compiled"):
+        compiled = compile_flow(build_stray_flow())
+
+    assert compiled.unreachable == ("stray",)
+    assert [node.id for node in compiled.atom_nodes] == ["map"]
+    assert [node.id for node in compiled.contract_nodes] == ["map"]
+    assert "stray" in caplog.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_flows_with_unreachable_nodes_run():
+    contracted = []
+    contractor = SyntheticContractor()
+
+    async def recording_contractor(node, actor):
+        contracted.append(node.id)
+        return await contractor(node, actor)
+
+    actor = build_flow_actor(
+        build_stray_flow(), arkitekt_contractor=recording_contractor
+    )
+    await actor.on_provide(actor.passport)
+    transport = MockAssignTransport()
+    try:
+        await actor.on_assign(
+            Assignment(assignation="1", args=[1]), actor.collector, transport
+        )
+    finally:
+        await actor.on_unprovide()
+
+    assert contracted == ["map"]
+    assert list(transport.changes[-1]["returns"]) == [1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_invalid_flows_fail_before_contracts_are_set_up():
+    flow = build_linear_flow(2)
+    flow = rewire(flow, build_edge("x", "add_0"))
+    contracted = []
+
+    async def contractor(node, actor):
+        contracted.append(node)
+
+    actor = build_flow_actor(flow, arkitekt_contractor=contractor)
+    with pytest.raises(FlowLogicError):
+        await actor.on_provide(actor.passport)
+    assert contracted == []
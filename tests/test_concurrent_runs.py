@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.synthetic import (
+    Latency,
+    SyntheticContract,
+    SyntheticContractor,
+    build_map_chain_flow,
+)
+
+from .utils import MockAssignTransport, build_chunk_flow, build_flow_actor
+
+
+async def run_concurrently(actor, n):
+    transports = [MockAssignTransport() for _ in range(n)]
+    peak = 0
+
+    async def monitor():
+        nonlocal peak
+        while True:
+            peak = max(peak, actor.active_runs)
+            await asyncio.sleep(0.001)
+
+    monitor_task = asyncio.create_task(monitor())
+    await asyncio.gather(
+        *[
+            actor.on_assign(
+                Assignment(assignation=str(i), args=[[i] * 3]),
+                actor.collector,
+                transport,
+            )
+            for i, transport in enumerate(transports)
+        ]
+    )
+    monitor_task.cancel()
+    return transports, peak
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_concurrent_runs_are_isolated():
+    actor = build_flow_actor(build_chunk_flow(chunk_defaults={"sleep": 5}))
+    await actor.on_provide(actor.passport)
+
+    transports, peak = await run_concurrently(actor, 4)
+
+    assert peak == 4
+    for i, transport in enumerate(transports):
+        assert transport.changes[-1]["returns"] == ([i + 1] * 3,)
+    assert actor.run_states == {}, "Run states are removed after a run"
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_max_parallel_runs_caps_runs():
+    actor = build_flow_actor(
+        build_chunk_flow(chunk_defaults={"sleep": 5}), max_parallel_runs=2
+    )
+    await actor.on_provide(actor.passport)
+
+    transports, peak = await run_concurrently(actor, 5)
+
+    assert peak == 2
+    for i, transport in enumerate(transports):
+        assert transport.changes[-1]["returns"] == ([i + 1] * 3,)
+    # The atoms of the parallel runs are pooled for later runs
+    assert all(len(pool) == 2 for pool in actor._atom_pool.values())
+
+
+class ReferenceRecordingContract(SyntheticContract):
+    def __init__(self, node, **kwargs):
+        super().__init__(node, **kwargs)
+        self.references = []
+
+    async def aassign_retry(self, kwargs, reference=None, **_):
+        self.references.append(reference)
+        return await self.aassign(kwargs)
+
+
+class SharedContractor(SyntheticContractor):
+    async def __call__(self, node, actor):
+        contract = self.contracts.get("shared")
+        if contract is None:
+            contract = self.contracts["shared"] = ReferenceRecordingContract(
+                node=node, latency=Latency(mean=0.005)
+            )
+        return contract
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_concurrent_runs_use_distinct_references():
+    contractor = SharedContractor()
+    actor = build_flow_actor(build_map_chain_flow(2), arkitekt_contractor=contractor)
+    await actor.on_provide(actor.passport)
+
+    transports = [MockAssignTransport() for _ in range(2)]
+    try:
+        await asyncio.gather(
+            *[
+                actor.on_assign(
+                    Assignment(assignation=str(i), args=[i]),
+                    actor.collector,
+                    transport,
+                )
+                for i, transport in enumerate(transports)
+            ]
+        )
+    finally:
+        await actor.on_unprovide()
+
+    for i, transport in enumerate(transports):
+        assert list(transport.changes[-1]["returns"]) == [i]
+
+    # Both runs map the same nodes at the same timepoints
+    references = contractor.contracts["shared"].references
+    assert len(references) == 4
+    assert len(set(references)) == 4
@@ -0,0 +1,52 @@
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.transport import ExecutionMode
+
+from .utils import (
+    MockAssignTransport,
+    MockMutations,
+    build_chunk_flow,
+    build_fanout_flow,
+    build_flow_actor,
+    build_linear_flow,
+)
+
+
+async def run_flow(flow, args, **kwargs):
+    mutations = MockMutations()
+    actor = build_flow_actor(flow, mutations=mutations, **kwargs)
+    await actor.on_provide(actor.passport)
+
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=args), actor.collector, transport
+    )
+    return transport.changes[-1], mutations
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+@pytest.mark.parametrize("mode", list(ExecutionMode))
+@pytest.mark.parametrize(
+    "flow, args, returns",
+    [
+        (build_linear_flow(5), [1], (6,)),
+        (build_chunk_flow(), [[1, 2, 3]], ([2, 3, 4],)),
+        (build_fanout_flow(4, 2), [[1]], (3, 3, 3, 3)),
+    ],
+)
+async def test_execution_modes_agree(mode, flow, args, returns):
+    change, _ = await run_flow(flow, args, execution_mode=mode, atom_queue_size=2)
+    assert change["returns"] == returns
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_direct_mode_tracks_on_the_side():
+    flow = build_linear_flow(3)
+    _, central = await run_flow(flow, [1])
+    _, direct = await run_flow(flow, [1], execution_mode=ExecutionMode.DIRECT)
+
+    key = lambda track: (track["source"], track["type"])  # noqa: E731
+    assert sorted(map(key, direct.tracks)) == sorted(map(key, central.tracks))
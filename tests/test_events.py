@@ -0,0 +1,57 @@
+import pytest
+
+from reaktion.errors import FlowLogicError
+from reaktion.events import EventType, InEvent, OutEvent, RawInEvent, RawOutEvent
+from reaktion.utils import build_routing_table
+
+from .utils import build_linear_flow
+
+
+def test_raw_out_event_coerces_like_out_event():
+    raw = RawOutEvent(
+        handle="return_0",
+        type=EventType.NEXT,
+        source="1",
+        value=[1, 2],
+        caused_by=map(int, [0, 1]),
+    )
+    assert raw.value == (1, 2)
+    assert raw.caused_by == (0, 1)
+    assert raw == raw.validate()
+    assert isinstance(raw.validate(), OutEvent)
+
+
+def test_raw_out_event_keeps_exceptions_and_none():
+    error = Exception("failed")
+    raw = RawOutEvent(
+        handle="return_0", type=EventType.ERROR, source="1", value=error, caused_by=[0]
+    )
+    assert raw.value is error
+
+    raw = RawOutEvent(
+        handle="return_0", type=EventType.COMPLETE, source="1", caused_by=[0]
+    )
+    assert raw.value is None
+
+
+def test_raw_in_event_validates_at_boundary():
+    raw = RawInEvent(target="1", handle="return_0", type=EventType.NEXT, current_t=0)
+    with pytest.raises(ValueError):
+        raw.validate()
+
+    raw = RawInEvent(
+        target="1", handle="arg_0", type=EventType.NEXT, value=(1,), current_t=0
+    )
+    assert isinstance(raw.validate(), InEvent)
+    assert raw == raw.validate()
+
+
+def test_routing_table_validates_handles():
+    flow = build_linear_flow(2)
+    edge = flow.graph.edges[0]
+    broken = flow.graph.copy(
+        update={"edges": (edge.copy(update={"target_handle": "return_0"}),)}
+    )
+
+    with pytest.raises(FlowLogicError):
+        build_routing_table(broken)
@@ -0,0 +1,204 @@
+import asyncio
+import functools
+import threading
+import time
+
+import pytest
+from fluss.api.schema import FlowNodeFragmentBaseLocalNode
+from rekuest.actors.types import Assignment
+from rekuest.postmans.utils import mockuse
+
+from reaktion.atoms.executors import (
+    ExecutorPolicy,
+    FunctionContract,
+    _default_executors,
+    shutdown_executors,
+)
+from reaktion.atoms.utils import atomify
+from reaktion.atoms.local import LocalMapAtom, LocalMergeMapAtom
+from reaktion.atoms.transport import MockTransport
+from reaktion.errors import FlowLogicError
+from reaktion.events import EventType, RawInEvent
+
+from .utils import (
+    MockAssignTransport,
+    build_edge,
+    build_flow,
+    build_flow_actor,
+    build_node,
+    build_port,
+    expectnext,
+)
+
+
+def blocking_double(a, block: float = 0.3):
+    """A local function that blocks (like CPU-bound work)"""
+    time.sleep(block)
+    return {"a": a * 2}
+
+
+def blocking_count(a, block: float = 0.3):
+    for i in range(2):
+        time.sleep(block)
+        yield {"a": a + i}
+
+
+def blocking_contract(block: float = 0.3, stream: bool = False):
+    function = blocking_count if stream else blocking_double
+    return FunctionContract(functools.partial(function, block=block))
+
+
+def build_local_node(kind="FUNCTION", **defaults):
+    return FlowNodeFragmentBaseLocalNode(
+        id="local",
+        position={"x": 0, "y": 0},
+        instream=[[build_port("a")]],
+        outstream=[[build_port("a")]],
+        constream=[],
+        maxRetries=1,
+        retryDelay=0,
+        hash="local",
+        kind=kind,
+        allowLocal=True,
+        mapStrategy="MAP",
+        interface="local",
+        assignTimeout=1,
+        yieldTimeout=1,
+        defaults=defaults,
+    )
+
+
+async def max_loop_lag(atom_class, node, contract, events=1):
+    """Runs the atom and returns the largest lag of a ticker on the loop"""
+    transport = MockTransport(queue=asyncio.Queue())
+    atom = atomify(node, transport, contract, {}, Assignment(assignation="1"))
+    assert isinstance(atom, atom_class)
+    await contract.aenter()
+
+    lag = 0.0
+
+    async def ticker():
+        nonlocal lag
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - start - 0.01)
+
+    async with atom:
+        tick = asyncio.create_task(ticker())
+        task = asyncio.create_task(atom.start())
+        for t in range(events):
+            await atom.put(
+                RawInEvent(
+                    target="local",
+                    handle="arg_0",
+                    type=EventType.NEXT,
+                    value=(t + 1,),
+                    current_t=t,
+                )
+            )
+        results = []
+        for _ in range(events * (2 if atom_class is LocalMergeMapAtom else 1)):
+            event = await transport.get(timeout=5)
+            expectnext(event)
+            results.append(event.value)
+
+        await asyncio.sleep(0.02)
+        tick.cancel()
+        task.cancel()
+        await asyncio.gather(tick, task, return_exceptions=True)
+
+    return lag, results
+
+
+@pytest.mark.asyncio
+async def test_thread_executor_keeps_the_loop_free():
+    inline, results = await max_loop_lag(
+        LocalMapAtom, build_local_node(), blocking_contract()
+    )
+    assert inline > 0.2
+    assert results == [(2,)]
+
+    threaded, results = await max_loop_lag(
+        LocalMapAtom,
+        build_local_node(executor=ExecutorPolicy.THREAD, executor_workers=2),
+        blocking_contract(),
+    )
+    assert threaded < 0.1
+    assert results == [(2,)]
+
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_thread_executor_streams():
+    lag, results = await max_loop_lag(
+        LocalMergeMapAtom,
+        build_local_node(kind="GENERATOR", executor=ExecutorPolicy.THREAD),
+        blocking_contract(block=0.1, stream=True),
+    )
+    assert lag < 0.05
+    assert results == [(1,), (2,)]
+
+    shutdown_executors()
+
+
+@pytest.mark.asyncio
+async def test_process_executor():
+    lag, results = await max_loop_lag(
+        LocalMapAtom,
+        build_local_node(executor=ExecutorPolicy.PROCESS, executor_workers=2),
+        blocking_contract(),
+        events=2,
+    )
+    assert results == [(2,), (4,)]
+
+    shutdown_executors()
+
+
+@pytest.mark.parametrize("policy", [ExecutorPolicy.THREAD, ExecutorPolicy.PROCESS])
+def test_contracts_of_the_actor_can_not_be_offloaded(policy):
+    with pytest.raises(FlowLogicError, match="bound to the event loop"):
+        atomify(
+            build_local_node(executor=policy),
+            MockTransport(queue=asyncio.Queue()),
+            mockuse(),
+            {},
+            Assignment(assignation="1"),
+        )
+
+
+def executor_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("reaktion-executor")]
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_unprovide_shuts_down_executors():
+    local = build_local_node(executor=ExecutorPolicy.THREAD, executor_workers=2)
+    flow = build_flow(
+        [
+            build_node("arg", "ArgNode", instream=[[]]),
+            {**local.dict(by_alias=True), "__typename": "LocalNode"},
+            build_node("return", "ReturnNode", outstream=[[]]),
+        ],
+        [build_edge("arg", "local"), build_edge("local", "return")],
+    )
+
+    def local_atomify(node, transport, contract, *args, **kwargs):
+        contract = blocking_contract(block=0) if node.id == "local" else contract
+        return atomify(node, transport, contract, *args, **kwargs)
+
+    actor = build_flow_actor(flow, atomifier=local_atomify)
+    await actor.on_provide(actor.passport)
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[2]), actor.collector, transport
+    )
+    assert transport.changes[-1]["returns"] == (4,)
+    assert len(actor._executors) == 1 and len(executor_threads()) == 2
+
+    await actor.on_unprovide()
+    assert actor._executors is None
+    assert executor_threads() == []
+    assert len(_default_executors) == 0
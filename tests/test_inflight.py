@@ -0,0 +1,149 @@
+import asyncio
+import random
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.concurrency import InFlightLimiter, InFlightMode
+from reaktion.atoms.generic import AsCompletedAtom, OrderedAtom
+from reaktion.atoms.transport import MockTransport
+from reaktion.events import EventType, InEvent
+
+from .utils import expectnext
+
+
+class CountingMixin:
+    running = 0
+    peak = 0
+
+    async def map(self, event: InEvent):
+        CountingMixin.running += 1
+        CountingMixin.peak = max(CountingMixin.peak, CountingMixin.running)
+        await asyncio.sleep(random.uniform(0.001, 0.02))
+        CountingMixin.running -= 1
+        return event.value
+
+
+class CountingAsCompletedAtom(CountingMixin, AsCompletedAtom):
+    pass
+
+
+class CountingOrderedAtom(CountingMixin, OrderedAtom):
+    pass
+
+
+async def run_events(atom, atomtransport, n):
+    task = asyncio.create_task(atom.start())
+    for t in range(n):
+        await atom.put(
+            InEvent(
+                target=atom.node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    await atom.put(
+        InEvent(
+            target=atom.node.id,
+            handle="arg_0",
+            type=EventType.COMPLETE,
+            current_t=n,
+        )
+    )
+
+    values = []
+    for _ in range(n):
+        answer = await atomtransport.get(timeout=1)
+        expectnext(answer)
+        values.append(answer.value[0])
+
+    answer = await atomtransport.get(timeout=1)
+    assert answer.type == EventType.COMPLETE
+    await task
+    return values
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+@pytest.mark.parametrize("atom_class", [CountingAsCompletedAtom, CountingOrderedAtom])
+async def test_max_in_flight_limits_concurrency(reactive_chunk_node, atom_class):
+    CountingMixin.running = 0
+    CountingMixin.peak = 0
+    atomtransport = MockTransport(queue=asyncio.Queue())
+
+    async with atom_class(
+        node=reactive_chunk_node.copy(update={"defaults": {"max_in_flight": 3}}),
+        transport=atomtransport,
+        assignment=Assignment(assignation=1, user=1, provision=1, args=[]),
+    ) as atom:
+        values = await run_events(atom, atomtransport, 30)
+
+    assert CountingMixin.peak == 3
+    assert atom.limiter.peak == 3
+    if atom_class is CountingOrderedAtom:
+        assert values == list(range(30))
+    else:
+        assert sorted(values) == list(range(30))
+
+
+def test_adaptive_window_grows_and_shrinks():
+    limiter = InFlightLimiter(max_in_flight=16, mode=InFlightMode.ADAPTIVE)
+    assert limiter.window == 1
+
+    for _ in range(20):
+        limiter.in_flight += 1
+        limiter.release(latency=0.01)
+    assert limiter.window == 16, "Fast completions should open the window"
+
+    limiter.in_flight += 1
+    limiter.release(latency=0.1)
+    assert limiter.window == 8, "A slow completion should halve the window"
+
+    for _ in range(7):
+        limiter.in_flight += 1
+        limiter.release(latency=0.1, failed=True)
+    assert limiter.window == 8, "Decreases are limited to one per window"
+
+    limiter.in_flight += 1
+    limiter.release(failed=True)
+    assert limiter.window == 4
+
+
+class EchoAsCompletedAtom(AsCompletedAtom):
+    async def map(self, event: InEvent):
+        return event.value
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_results_are_published_on_completion(reactive_chunk_node):
+    atomtransport = MockTransport(queue=asyncio.Queue())
+
+    async with EchoAsCompletedAtom(
+        node=reactive_chunk_node,
+        transport=atomtransport,
+        assignment=Assignment(assignation=1, user=1, provision=1, args=[]),
+    ) as atom:
+        task = asyncio.create_task(atom.start())
+        await atom.put(
+            InEvent(
+                target=atom.node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(1,),
+                current_t=0,
+            )
+        )
+
+        # The result should not wait for a polling tick
+        answer = await atomtransport.get(timeout=0.02)
+        expectnext(answer)
+        assert answer.value == (1,)
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
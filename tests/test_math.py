@@ -0,0 +1,81 @@
+import asyncio
+import operator
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.operations import math
+from reaktion.atoms.operations.math import MathAtom, apply_operation
+from reaktion.atoms.transport import MockTransport
+from reaktion.events import EventType, RawInEvent
+
+from .utils import expectnext
+
+
+def test_lists_are_computed_item_by_item():
+    pytest.importorskip("numpy")
+    assert apply_operation(operator.mul, operator.imul, [1.0, 2.5], 2) == [2.0, 5.0]
+    assert apply_operation(operator.add, operator.iadd, [1.0, 2.0], [10, 20]) == [
+        11.0,
+        22.0,
+    ]
+    # Python ints are kept, so nothing overflows or turns into a float
+    assert apply_operation(operator.pow, operator.ipow, [10], 30) == [10**30]
+    assert apply_operation(operator.mul, operator.imul, [2**62], 4) == [2**64]
+    for result in (
+        apply_operation(operator.add, operator.iadd, [1, 2], 1),
+        apply_operation(operator.add, operator.iadd, [1, 2], [1, 1]),
+        apply_operation(operator.add, operator.iadd, [1, 2.5], 1),
+    ):
+        assert result[0] == 2 and type(result[0]) is int
+
+
+def test_lists_without_numpy(monkeypatch):
+    monkeypatch.setattr(math, "np", None)
+    assert apply_operation(operator.mul, operator.imul, [1, 2, 3], 2) == [2, 4, 6]
+    assert apply_operation(operator.add, operator.iadd, [1, 2], [10, 20]) == [11, 22]
+
+
+def test_arrays_in_place():
+    np = pytest.importorskip("numpy")
+    array = np.arange(5, dtype=float)
+
+    result = apply_operation(operator.add, operator.iadd, array, 1)
+    assert result is not array
+    assert array[0] == 0
+
+    result = apply_operation(operator.add, operator.iadd, array, 1, in_place=True)
+    assert result is array
+    assert array[0] == 1
+
+
+def event(node, handle, t, value=None, type=EventType.NEXT):
+    return RawInEvent(
+        target=node.id, handle=handle, type=type, value=value, current_t=t
+    )
+
+
+@pytest.mark.asyncio
+async def test_binary_math(reactive_zip_node):
+    node = reactive_zip_node.copy(update={"implementation": "SUBTRACT"})
+    transport = MockTransport(queue=asyncio.Queue())
+
+    async with MathAtom(
+        node=node, transport=transport, assignment=Assignment(assignation="1")
+    ) as atom:
+        task = asyncio.create_task(atom.start())
+        await atom.put(event(node, "arg_0", 0, (10,)))
+        await atom.put(event(node, "arg_0", 1, ([5, 6],)))
+        await atom.put(event(node, "arg_0", 2, type=EventType.COMPLETE))
+        await atom.put(event(node, "arg_1", 3, (1,)))
+
+        result = await transport.get()
+        expectnext(result)
+        assert result.value == (9,)
+        assert result.caused_by == (0, 3)
+
+        await atom.put(event(node, "arg_1", 4, ([1, 2],)))
+        assert (await transport.get()).value == ([4, 4],)
+        # The first stream completed without unpaired events
+        assert (await transport.get()).type == EventType.COMPLETE
+        await task
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.generic import MapAtom
+from reaktion.atoms.transport import ExecutionMode, MockTransport
+from reaktion.events import EventType, RawInEvent
+from reaktion.metrics import (
+    Histogram,
+    MemoryMetrics,
+    Metric,
+    current_metrics,
+    render_prometheus,
+)
+
+from .utils import MockAssignTransport, build_flow_actor, build_linear_flow
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 2):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1]
+    assert histogram.mean == pytest.approx(0.7625)
+    assert histogram.quantile(0.5) == 1
+    assert histogram.quantile(1) == 2
+
+
+def test_render_prometheus():
+    metrics = MemoryMetrics(buckets=(0.1, 1))
+    metrics.observe("a", Metric.PROCESSING, 0.5)
+    metrics.observe("a", Metric.EVENTS_IN)
+    metrics.observe("a", Metric.EVENTS_IN)
+
+    assert render_prometheus(metrics).splitlines() == [
+        "# TYPE reaktion_atom_processing_seconds histogram",
+        'reaktion_atom_processing_seconds_bucket{node="a",le="0.1"} 0',
+        'reaktion_atom_processing_seconds_bucket{node="a",le="1.0"} 1',
+        'reaktion_atom_processing_seconds_bucket{node="a",le="+Inf"} 1',
+        'reaktion_atom_processing_seconds_sum{node="a"} 0.5',
+        'reaktion_atom_processing_seconds_count{node="a"} 1',
+        "# TYPE reaktion_atom_events_in_total counter",
+        'reaktion_atom_events_in_total{node="a"} 2',
+    ]
+
+
+class SlowMapAtom(MapAtom):
+    async def map(self, event):
+        await asyncio.sleep(0.02)
+        return event.value
+
+
+@pytest.mark.asyncio
+async def test_map_atom_metrics(reactive_zip_node):
+    metrics = MemoryMetrics()
+    token = current_metrics.set(metrics)
+    transport = MockTransport(queue=asyncio.Queue())
+    try:
+        async with SlowMapAtom(
+            node=reactive_zip_node,
+            transport=transport,
+            assignment=Assignment(assignation="1"),
+        ) as atom:
+            task = asyncio.create_task(atom.start())
+            for t in range(3):
+                await atom.put(
+                    RawInEvent(
+                        target=atom.node.id,
+                        handle="arg_0",
+                        type=EventType.NEXT,
+                        value=(t,),
+                        current_t=t,
+                    )
+                )
+            for _ in range(3):
+                await transport.get()
+            task.cancel()
+    finally:
+        current_metrics.reset(token)
+
+    node = reactive_zip_node.id
+    processing = metrics.histogram(node, Metric.PROCESSING)
+    assert processing.count == 3 and processing.mean >= 0.02
+    # The last event waited for the first two to be mapped
+    assert metrics.histogram(node, Metric.QUEUE_WAIT).max >= 0.04
+    assert metrics.counter(node, Metric.EVENTS_IN) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+@pytest.mark.parametrize("mode", list(ExecutionMode))
+async def test_flow_metrics_are_exported(mode):
+    actor = build_flow_actor(build_linear_flow(3), execution_mode=mode, metrics_port=0)
+    await actor.on_provide(actor.passport)
+    try:
+        await actor.on_assign(
+            Assignment(assignation="1", args=[1]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+
+        reader, writer = await asyncio.open_connection(
+            "127.0.0.1", actor._exporter.port
+        )
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = (await reader.read()).decode()
+        writer.close()
+    finally:
+        await actor.on_unprovide()
+
+    metrics = actor.metrics
+    for node in ("add_0", "add_1", "add_2"):
+        # NEXT and COMPLETE
+        assert metrics.counter(node, Metric.EVENTS_IN) == 2
+        assert metrics.counter(node, Metric.EVENTS_OUT) == 2
+        assert metrics.histogram(node, Metric.QUEUE_WAIT).count == 2
+    assert metrics.counter("arg", Metric.EVENTS_OUT) == 2
+    assert (metrics.histogram("arg", Metric.DISPATCH) is None) == (
+        mode == ExecutionMode.DIRECT
+    )
+
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'reaktion_atom_events_in_total{node="add_1"} 2' in response
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_flow_metrics_are_opt_in():
+    actor = build_flow_actor(build_linear_flow(2))
+    await actor.on_provide(actor.passport)
+    try:
+        transport = MockAssignTransport()
+        await actor.on_assign(
+            Assignment(assignation="1", args=[1]), actor.collector, transport
+        )
+        assert transport.changes[-1]["returns"] == (3,)
+    finally:
+        await actor.on_unprovide()
+
+    assert actor.metrics is None and actor._exporter is None
+
+    metrics = MemoryMetrics()
+    actor = build_flow_actor(build_linear_flow(2), metrics=metrics)
+    await actor.on_provide(actor.passport)
+    try:
+        await actor.on_assign(
+            Assignment(assignation="1", args=[1]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+    finally:
+        await actor.on_unprovide()
+
+    assert metrics.counter("add_1", Metric.EVENTS_OUT) == 2
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from fluss.api.schema import FlowNodeFragmentBaseArkitektNode, MapStrategy
+from rekuest.actors.types import Assignment
+from rekuest.postmans.utils import mockuse
+
+from reaktion.atoms.arkitekt import ArkitektOrderedAtom
+from reaktion.atoms.transport import MockTransport
+from reaktion.atoms.utils import atomify
+from reaktion.events import EventType, InEvent
+
+from .utils import expectnext
+
+
+class ReversedMockContract(mockuse):
+    """A mockuse contract whose later assignments finish first
+
+    mockuse only stubs `aassign_retry` (and is not a pydantic model), so
+    the retrying assignment is implemented here.
+    """
+
+    def __init__(self, fail_on: int = -1):
+        self.fail_on = fail_on
+        self.reserve_sleep = 0
+        self.unreserve_sleep = 0
+        self.running = 0
+        self.peak = 0
+
+    async def aassign_retry(self, kwargs, parent=None, reference=None, **_):
+        assert self.active, "We never entered the contract"
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            value = kwargs["1"]
+            await asyncio.sleep(0.02 / (value + 1))
+            if value == self.fail_on:
+                raise ValueError(f"Failed on {value}")
+            return {"1": value}
+        finally:
+            self.running -= 1
+
+
+def ordered_node(node: FlowNodeFragmentBaseArkitektNode, **defaults):
+    return node.copy(update={"map_strategy": MapStrategy.ORDERED, "defaults": defaults})
+
+
+async def put_all(atom, n):
+    for t in range(n):
+        await atom.put(
+            InEvent(
+                target=atom.node.id,
+                handle="arg_0",
+                type=EventType.NEXT,
+                value=(t,),
+                current_t=t,
+            )
+        )
+    await atom.put(
+        InEvent(
+            target=atom.node.id,
+            handle="arg_0",
+            type=EventType.COMPLETE,
+            current_t=n,
+        )
+    )
+
+
+@pytest.mark.actor
+def test_ordered_strategy_is_atomified(arkitekt_functional_node):
+    atom = atomify(
+        ordered_node(arkitekt_functional_node),
+        MockTransport(queue=asyncio.Queue()),
+        ReversedMockContract(),
+        {},
+        Assignment(assignation=1, user=1, provision=1, args=[]),
+    )
+    assert isinstance(atom, ArkitektOrderedAtom)
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_ordered_atom_keeps_order(arkitekt_functional_node):
+    contract = ReversedMockContract()
+    await contract.aenter()
+    atomtransport = MockTransport(queue=asyncio.Queue())
+
+    async with ArkitektOrderedAtom(
+        node=ordered_node(arkitekt_functional_node, max_in_flight=4),
+        contract=contract,
+        transport=atomtransport,
+        assignment=Assignment(assignation=1, user=1, provision=1, args=[]),
+    ) as atom:
+        task = asyncio.create_task(atom.start())
+        await put_all(atom, 40)
+
+        for t in range(40):
+            answer = await atomtransport.get(timeout=1)
+            expectnext(answer)
+            assert answer.value == (t,)
+            assert answer.caused_by == (t,)
+
+        answer = await atomtransport.get(timeout=1)
+        assert answer.type == EventType.COMPLETE
+        await task
+
+    assert contract.peak == 4
+    # Slots are held until publishing, so the reorder buffer stays bounded
+    assert atom.limiter.peak == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_ordered_atom_publishes_errors(arkitekt_functional_node):
+    contract = ReversedMockContract(fail_on=2)
+    await contract.aenter()
+    atomtransport = MockTransport(queue=asyncio.Queue())
+
+    async with ArkitektOrderedAtom(
+        node=ordered_node(arkitekt_functional_node),
+        contract=contract,
+        transport=atomtransport,
+        assignment=Assignment(assignation=1, user=1, provision=1, args=[]),
+    ) as atom:
+        task = asyncio.create_task(atom.start())
+        await put_all(atom, 5)
+
+        events = [await atomtransport.get(timeout=1) for _ in range(6)]
+        await task
+
+    errors = [event for event in events if event.type == EventType.ERROR]
+    assert len(errors) == 1 and errors[0].caused_by == (2,)
+    nexts = [event.value for event in events if event.type == EventType.NEXT]
+    assert nexts == [(0,), (1,), (3,), (4,)]
+    assert events[-1].type == EventType.COMPLETE
@@ -0,0 +1,144 @@
+import asyncio
+import multiprocessing
+import threading
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.transport import ExecutionMode
+from reaktion.compiled import compile_flow
+from reaktion.partition import (
+    Channel,
+    Placement,
+    partition_flow,
+    split_routing_table,
+)
+
+from .utils import (
+    MockAssignTransport,
+    MockMutations,
+    build_fanout_flow,
+    build_flow_actor,
+    build_linear_flow,
+)
+
+
+def test_partitioning_keeps_chains_together():
+    compiled = compile_flow(build_fanout_flow(4, 2))
+    placements = partition_flow(compiled, 2, default=Placement.PROCESS)
+
+    assert len(placements) == 10
+    assert sorted(placements.values()) == [0] * 5 + [1] * 5
+    for branch in range(4):
+        assert placements[f"add_{branch}_0"] == placements[f"add_{branch}_1"]
+
+    cross, local = split_routing_table(compiled.routing_table, placements)
+    routed = sum(len(targets) for targets in cross.values())
+    within = sum(len(t) for table in local.values() for t in table.values())
+    assert routed + within == len(compiled.flow.graph.edges)
+    assert routed == 6
+
+
+def test_placement_defaults():
+    flow = build_linear_flow(3)
+    flow.graph.nodes[1].defaults["placement"] = "PROCESS"
+    flow.graph.nodes[1].defaults["partition"] = 3
+    flow.graph.nodes[2].defaults["placement"] = "PROCESS"
+
+    placements = partition_flow(compile_flow(flow), 2)
+    assert placements == {"add_0": 1, "add_1": 0}
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+@pytest.mark.parametrize("mode", list(ExecutionMode))
+async def test_flow_runs_across_processes(mode):
+    mutations = MockMutations()
+    actor = build_flow_actor(
+        build_fanout_flow(4, 2),
+        mutations=mutations,
+        execution_mode=mode,
+        process_partitions=2,
+        placement=Placement.PROCESS,
+    )
+    await actor.on_provide(actor.passport)
+    try:
+        assert len(actor._engine.partitions) == 2
+
+        for i in range(2):
+            transport = MockAssignTransport()
+            await actor.on_assign(
+                Assignment(assignation=str(i), args=[[i]]), actor.collector, transport
+            )
+            assert transport.changes[-1]["returns"] == (i + 2,) * 4
+    finally:
+        await actor.on_unprovide()
+
+    sources = {track["source"] for track in mutations.tracks}
+    assert "add_3_1" in sources and "zip" in sources
+
+    # Events within a partition reach the actor without their value
+    values = {
+        track["source"]: track["value"]
+        for track in mutations.tracks
+        if track["type"] == "NEXT"
+    }
+    assert values["add_3_0"] == str(None) and values["zip"] != str(None)
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+@pytest.mark.parametrize("mode", list(ExecutionMode))
+async def test_timepoints_of_partitioned_runs_are_unique(mode):
+    flow = build_fanout_flow(4, 2)
+    mutations = MockMutations()
+    actor = build_flow_actor(
+        flow,
+        mutations=mutations,
+        execution_mode=mode,
+        process_partitions=2,
+        placement=Placement.PROCESS,
+    )
+    await actor.on_provide(actor.passport)
+    try:
+        transport = MockAssignTransport()
+        await actor.on_assign(
+            Assignment(assignation="1", args=[[1]]), actor.collector, transport
+        )
+        assert transport.changes[-1]["returns"] == (3,) * 4
+    finally:
+        await actor.on_unprovide()
+
+    timepoints = [track["t"] for track in mutations.tracks]
+    assert len(timepoints) == len(set(timepoints))
+
+    # Every event was caused by an event of its node, or of one upstream of it
+    sources = {track["t"]: track["source"] for track in mutations.tracks}
+    edges = {(edge.source, edge.target) for edge in flow.graph.edges}
+    edges |= {(node.id, node.id) for node in flow.graph.nodes}
+    for track in mutations.tracks:
+        for cause in track["caused_by"]:
+            if cause != -1:
+                assert (sources[cause], track["source"]) in edges, track
+
+
+@pytest.mark.asyncio
+async def test_channel_applies_backpressure():
+    sender, receiver = multiprocessing.Pipe()
+    channel = Channel(sender, lambda message: None, lambda: None, max_buffered=1024)
+    try:
+        # Larger than the buffer of the pipe, so the writer blocks
+        channel.send(("event", b"x" * 1_000_000))
+        await asyncio.sleep(0)
+        assert channel.buffered > 1024
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(channel.drain(), timeout=0.1)
+
+        reader = threading.Thread(target=receiver.recv_bytes)
+        reader.start()
+        await asyncio.wait_for(channel.drain(), timeout=5)
+        reader.join()
+        assert channel.buffered == 0
+    finally:
+        channel.close()
+        receiver.close()
@@ -0,0 +1,216 @@
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.atoms.utils import atomify
+from reaktion.partition import Placement
+from reaktion.payloads import PayloadRef, PayloadStore, current_payloads
+from reaktion.synthetic import (
+    SyntheticContract,
+    SyntheticContractor,
+    build_arkitekt_node,
+    build_edge,
+    build_flow,
+    build_node,
+    build_port,
+    build_reactive_node,
+)
+
+from .utils import (
+    MockAssignTransport,
+    MockMutations,
+    build_flow_actor,
+    build_linear_flow,
+)
+
+
+def test_large_payloads_are_referenced():
+    store = PayloadStore(threshold=100)
+    small, large = b"x" * 99, bytearray(100)
+
+    assert store.ref(small) is small
+    ref = store.ref(large)
+    assert ref == PayloadRef(key=0, nbytes=100)
+    assert store.resolve(ref) is large
+    assert store.materialize(ref) is large
+    assert store.bytes_referenced == 100
+    assert store.bytes_copied == 0
+
+
+def test_nested_refs_are_materialized():
+    store = PayloadStore(threshold=100)
+    large = bytearray(100)
+    value = ([store.ref(large), 1], {"a": (store.ref(large),)})
+
+    assert store.materialize(value) == ([large, 1], {"a": (large,)})
+    assert store.resolve(value)[0][0] is large
+
+
+def test_shared_payloads_are_mapped():
+    np = pytest.importorskip("numpy")
+    owner, worker = PayloadStore(threshold=1), PayloadStore()
+    array = np.arange(1000, dtype=float)
+
+    shared = owner.share(owner.ref(array))
+    assert shared.shared and owner.share(shared) is shared
+    assert owner.bytes_copied == array.nbytes
+
+    view = worker.resolve(shared)
+    assert np.array_equal(view, array)
+    assert worker.bytes_copied == 0
+
+    copy = worker.materialize(shared)
+    assert np.array_equal(copy, array)
+    assert worker.bytes_copied == array.nbytes
+
+    del view
+    worker.release()
+    owner.release()
+
+
+def recording_atomify(stores):
+    def recording(*args, **kwargs):
+        stores.append(current_payloads.get())
+        return atomify(*args, **kwargs)
+
+    return recording
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_payloads_pass_by_reference_in_flow():
+    np = pytest.importorskip("numpy")
+    stores = []
+    mutations = MockMutations()
+    actor = build_flow_actor(
+        build_linear_flow(3),
+        mutations=mutations,
+        payload_threshold=1024,
+        atomifier=recording_atomify(stores),
+    )
+    await actor.on_provide(actor.passport)
+
+    array = np.zeros(10_000)
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[array]), actor.collector, transport
+    )
+
+    (returns,) = transport.changes[-1]["returns"]
+    assert isinstance(returns, np.ndarray)
+    assert np.array_equal(returns, array + 3)
+
+    # Only refs are tracked, and nothing was copied
+    assert all(
+        isinstance(value, PayloadRef)
+        for track in mutations.tracks
+        if track["type"] == "NEXT"
+        for value in track["value"]
+    )
+    assert stores[0].bytes_copied == 0
+    assert stores[0].bytes_referenced == 4 * array.nbytes
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_payloads_are_shared_with_partitions(monkeypatch):
+    np = pytest.importorskip("numpy")
+    stores = []
+    release = PayloadStore.release
+
+    def recording_release(self):
+        stores.append(self)
+        release(self)
+
+    monkeypatch.setattr(PayloadStore, "release", recording_release)
+
+    actor = build_flow_actor(
+        build_linear_flow(2),
+        payload_threshold=1024,
+        process_partitions=1,
+        placement=Placement.PROCESS,
+    )
+    await actor.on_provide(actor.passport)
+    try:
+        array = np.arange(10_000, dtype=float)
+        transport = MockAssignTransport()
+        await actor.on_assign(
+            Assignment(assignation="1", args=[array]), actor.collector, transport
+        )
+        (returns,) = transport.changes[-1]["returns"]
+        assert np.array_equal(returns, array + 2)
+    finally:
+        await actor.on_unprovide()
+
+    # The arg is shared once, only the event that leaves the worker is
+    # pickled back (the one within it is only tracked)
+    (store,) = stores
+    assert store.bytes_referenced == array.nbytes
+    assert store.bytes_copied == 2 * array.nbytes
+
+
+class RecordingContract(SyntheticContract):
+    async def aassign(self, kwargs, **_):
+        self.kwargs = kwargs
+        return await super().aassign(kwargs)
+
+
+class RecordingContractor(SyntheticContractor):
+    async def __call__(self, node, actor):
+        contract = self.contracts[node.id] = RecordingContract(node=node)
+        return contract
+
+
+def build_buffered_flow(arkitekt: bool):
+    """chunk -> ADD -> BUFFER_COMPLETE (-> arkitekt node) -> return"""
+    list_port = build_port("a", kind="LIST")
+    nodes = [
+        build_node("arg", "ArgNode", instream=[[]], outstream=[[list_port]]),
+        build_reactive_node("chunk", "CHUNK", instream=[[list_port]]),
+        build_reactive_node("add", "ADD", defaults={"number": 1}),
+        build_reactive_node("buffer", "BUFFER_COMPLETE", outstream=[[list_port]]),
+        build_node("return", "ReturnNode", instream=[[list_port]], outstream=[[]]),
+    ]
+    edges = [
+        build_edge("arg", "chunk"),
+        build_edge("chunk", "add"),
+        build_edge("add", "buffer"),
+    ]
+    if arkitekt:
+        nodes.append(
+            build_arkitekt_node("map", instream=[[list_port]], outstream=[[list_port]])
+        )
+        edges += [build_edge("buffer", "map"), build_edge("map", "return")]
+    else:
+        edges.append(build_edge("buffer", "return"))
+    return build_flow(nodes, edges, args=[list_port], returns=[list_port])
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+@pytest.mark.parametrize("arkitekt", [False, True])
+async def test_buffered_payloads_are_materialized(arkitekt):
+    np = pytest.importorskip("numpy")
+    contractor = RecordingContractor()
+    actor = build_flow_actor(
+        build_buffered_flow(arkitekt),
+        payload_threshold=64,
+        arkitekt_contractor=contractor,
+    )
+    await actor.on_provide(actor.passport)
+
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[[np.arange(32.0)] * 2]),
+        actor.collector,
+        transport,
+    )
+    await actor.on_unprovide()
+
+    (returns,) = transport.changes[-1]["returns"]
+    assert len(returns) == 2
+    for array in returns:
+        assert isinstance(array, np.ndarray)
+        assert np.array_equal(array, np.arange(32.0) + 1)
+    if arkitekt:
+        (kwarg,) = contractor.contracts["map"].kwargs.values()
+        assert all(isinstance(array, np.ndarray) for array in kwarg)
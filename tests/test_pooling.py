@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+from fluss.api.schema import GlobalFragment, PortFragment
+from rekuest.actors.types import Assignment
+from rekuest.api.schema import AssignationStatus
+
+from reaktion.atoms.combination.zip import ZipAtom
+from reaktion.atoms.operations.math import MathAtom
+from reaktion.atoms.transformation.buffer_complete import BufferCompleteAtom
+from reaktion.atoms.transformation.buffer_window import BufferCountAtom
+from reaktion.atoms.transport import MockTransport
+from reaktion.atoms.utils import atomify
+
+from .utils import (
+    MockAssignTransport,
+    build_chunk_flow,
+    build_flow_actor,
+    build_linear_flow,
+    build_port,
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_atoms_are_reused_across_assignations():
+    atomified = []
+
+    def recording_atomify(*args, **kwargs):
+        atom = atomify(*args, **kwargs)
+        atomified.append(atom)
+        return atom
+
+    actor = build_flow_actor(build_chunk_flow(), atomifier=recording_atomify)
+    await actor.on_provide(actor.passport)
+
+    for i in range(3):
+        transport = MockAssignTransport()
+        await actor.on_assign(
+            Assignment(assignation=str(i), args=[[i, i + 1]]),
+            actor.collector,
+            transport,
+        )
+        # The buffer of the BufferCompleteAtom is reset between runs
+        assert transport.changes[-1]["returns"] == ([i + 1, i + 2],)
+
+    assert len(atomified) == 3, "Only the first assignation should atomify"
+
+
+def build_global_window_flow():
+    flow = build_chunk_flow()
+    count_port = PortFragment(**build_port("count"))
+    return flow.copy(
+        update={
+            "graph": flow.graph.copy(
+                update={
+                    "globals": [
+                        GlobalFragment(toKeys=["buffer.buffer_count"], port=count_port)
+                    ]
+                }
+            )
+        }
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_atoms_selected_by_globals_are_not_reused_for_other_globals():
+    buffers = []
+
+    def recording_atomify(node, *args, **kwargs):
+        atom = atomify(node, *args, **kwargs)
+        if node.id == "buffer":
+            buffers.append(type(atom))
+        return atom
+
+    actor = build_flow_actor(build_global_window_flow(), atomifier=recording_atomify)
+    # The global count is an arg of the definition, but not streamed
+    count_arg = actor.definition.args[0].copy(update={"key": "count", "kind": "INT"})
+    actor.definition = actor.definition.copy(
+        update={"args": [*actor.definition.args, count_arg]}
+    )
+    await actor.on_provide(actor.passport)
+
+    for i, count in enumerate([2, 0, 2, 0]):
+        await actor.on_assign(
+            Assignment(assignation=str(i), args=[[1, 2, 3], count]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+
+    assert buffers == [BufferCountAtom, BufferCompleteAtom]
+
+
+class FailingAtom(MathAtom):
+    async def aenter(self):
+        await super().aenter()
+        raise RuntimeError("Failed to enter")
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_atoms_are_exited_when_the_run_fails_to_start():
+    atomified = []
+
+    def failing_atomify(node, transport, contract, globals, assignment, **kwargs):
+        if node.id == "add_1" and assignment.assignation == "1":
+            atom = FailingAtom(
+                node=node, transport=transport, assignment=assignment, **kwargs
+            )
+        else:
+            atom = atomify(node, transport, contract, globals, assignment, **kwargs)
+        atomified.append(atom)
+        return atom
+
+    actor = build_flow_actor(build_linear_flow(3), atomifier=failing_atomify)
+    await actor.on_provide(actor.passport)
+
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[1]), actor.collector, transport
+    )
+    assert transport.changes[-1]["status"] == AssignationStatus.CRITICAL
+
+    # Every atom is exited, also those after the failing one, and none of
+    # them (never started) is pooled
+    assert len(atomified) == 3
+    assert all(atom._private_queue is None for atom in atomified)
+    assert actor.run_states == {}
+    assert actor._atom_pool == {}
+
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="2", args=[1]), actor.collector, transport
+    )
+    assert list(transport.changes[-1]["returns"]) == [4]
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_pooling_can_be_disabled():
+    atomified = []
+
+    def recording_atomify(*args, **kwargs):
+        atomified.append(args[0].id)
+        return atomify(*args, **kwargs)
+
+    actor = build_flow_actor(
+        build_linear_flow(2), atomifier=recording_atomify, pool_atoms=False
+    )
+    await actor.on_provide(actor.passport)
+
+    for i in range(2):
+        await actor.on_assign(
+            Assignment(assignation=str(i), args=[i]),
+            actor.collector,
+            MockAssignTransport(),
+        )
+
+    assert len(atomified) == 4
+
+
+@pytest.mark.actor
+def test_reset_restores_state(reactive_zip_node):
+    assignment = Assignment(assignation=1, user=1, provision=1, args=[])
+    atom = ZipAtom(
+        node=reactive_zip_node,
+        transport=MockTransport(queue=asyncio.Queue()),
+        assignment=assignment,
+        queue_size=3,
+    )
+    atom.state = [1, 2]
+    atom.complete = [True, None]
+
+    transport = MockTransport(queue=asyncio.Queue())
+    atom.reset(transport, Assignment(assignation=2), {"a": 1})
+
+    assert atom.state == [None, None]
+    assert atom.complete == [None, None]
+    assert atom.transport is transport
+    assert atom.assignment.assignation == "2"
+    assert atom.globals == {"a": 1}
+    assert atom.queue_size == 3, "Bound fields are kept"
@@ -0,0 +1,34 @@
+from reaktion.events import EventType, OutEvent
+from reaktion.utils import build_routing_table, connected_events, routed_events
+
+from .utils import build_linear_flow
+
+
+def test_routing_table_matches_scan():
+    flow = build_linear_flow(10)
+    table = build_routing_table(flow.graph)
+
+    assert len(table) == len(flow.graph.edges)
+
+    for node in flow.graph.nodes:
+        event = OutEvent(
+            handle="return_0",
+            type=EventType.NEXT,
+            source=node.id,
+            value=(1,),
+            caused_by=[0],
+        )
+        assert routed_events(table, event, 3) == connected_events(flow.graph, event, 3)
+
+
+def test_routing_table_unknown_source():
+    flow = build_linear_flow(2)
+    table = build_routing_table(flow.graph)
+
+    event = OutEvent(
+        handle="return_1",
+        type=EventType.COMPLETE,
+        source="add_0",
+        caused_by=[0],
+    )
+    assert routed_events(table, event, 0) == []
@@ -0,0 +1,83 @@
+import statistics
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.compiled import compile_flow
+from reaktion.synthetic import (
+    Distribution,
+    Latency,
+    SyntheticContractor,
+    build_fanin_flow,
+    build_generator_flow,
+    build_map_chain_flow,
+    build_split_flow,
+)
+
+from .utils import MockAssignTransport, build_flow_actor
+
+
+async def run_flow(flow, args, contractor=None):
+    actor = build_flow_actor(
+        flow, arkitekt_contractor=contractor or SyntheticContractor()
+    )
+    await actor.on_provide(actor.passport)
+    transport = MockAssignTransport()
+    try:
+        await actor.on_assign(
+            Assignment(assignation="1", args=args), actor.collector, transport
+        )
+    finally:
+        await actor.on_unprovide()
+    return transport.changes[-1]["returns"]
+
+
+@pytest.mark.parametrize("distribution", list(Distribution))
+def test_latency_distributions(distribution):
+    latency = Latency(distribution=distribution, mean=0.01, spread=0.005, seed=1)
+    samples = [latency.sample() for _ in range(2000)]
+
+    assert min(samples) >= 0
+    assert statistics.mean(samples) == pytest.approx(0.01, rel=0.1)
+    if distribution == Distribution.UNIFORM:
+        assert max(samples) <= 0.015
+
+
+def test_thousands_of_nodes_compile():
+    compiled = compile_flow(build_map_chain_flow(2000))
+    assert len(compiled.contract_nodes) == 2000
+
+    compiled = compile_flow(build_fanin_flow(1000, combinator="WITHLATEST"))
+    # 1000 branches and the 999 combination nodes that merge them, and the chunk
+    assert len(compiled.atom_nodes) == 1000 + 999 + 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_map_chain_with_latency():
+    contractor = SyntheticContractor(
+        latency=Latency(distribution=Distribution.EXPONENTIAL, mean=0.001, seed=3)
+    )
+    assert await run_flow(build_map_chain_flow(50), [7], contractor) == (7,)
+    assert len(contractor.contracts) == 50
+    assert all(c.assignments == 1 for c in contractor.contracts.values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_split_flow():
+    assert await run_flow(build_split_flow(4, depth=2), [1, 2, 3, 4]) == (3, 4, 5, 6)
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_uneven_zip_tree():
+    assert await run_flow(build_fanin_flow(5), [[1]]) == (2, 2, 2, 2, 2)
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_generator_fed_chunks():
+    contractor = SyntheticContractor(stream_count=3)
+    returns = await run_flow(build_generator_flow(depth=2), [[1, 2]], contractor)
+    assert returns == ([1, 2, 1, 2, 1, 2],)
@@ -0,0 +1,61 @@
+import logging
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.trace import TraceLevel, configure_trace, tracer
+
+from .utils import MockAssignTransport, build_flow_actor, build_linear_flow
+
+
+@pytest.fixture
+def trace_level():
+    level, sample_every = tracer.level, tracer.sample_every
+    yield configure_trace
+    configure_trace(level, sample_every)
+
+
+async def run_linear_flow(value):
+    actor = build_flow_actor(build_linear_flow(3))
+    await actor.on_provide(actor.passport)
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[value]), actor.collector, transport
+    )
+    return transport.changes[-1]["returns"]
+
+
+def trace_records(caplog):
+    return [r for r in caplog.records if r.name == "reaktion.trace"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_events_are_not_formatted_when_off(trace_level, caplog):
+    trace_level(TraceLevel.OFF)
+    caplog.set_level(logging.DEBUG)
+
+    # Too large to be formatted as a string (see sys.set_int_max_str_digits)
+    huge = 10**5000
+    assert await run_linear_flow(huge) == (huge + 3,)
+    assert trace_records(caplog) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_traced_events_are_sampled(trace_level, caplog):
+    caplog.set_level(logging.INFO, logger="reaktion.trace")
+
+    trace_level(TraceLevel.EVENTS, sample_every=1)
+    await run_linear_flow(1)
+    records = trace_records(caplog)
+    events = [r for r in records if "event" in r.trace]
+    assert {r.trace["kind"] for r in records} >= {"started", "put", "->", "done"}
+    assert all("value=" not in r.getMessage() for r in events)
+
+    caplog.clear()
+    trace_level(TraceLevel.VALUES, sample_every=4)
+    await run_linear_flow(1)
+    sampled = [r for r in trace_records(caplog) if "event" in r.trace]
+    assert 0 < len(sampled) <= len(events) // 4 + 1
+    assert all("value=" in r.getMessage() for r in sampled)
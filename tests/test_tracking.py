@@ -0,0 +1,237 @@
+import asyncio
+import time
+
+import pytest
+from rekuest.actors.types import Assignment
+
+from reaktion.events import EventType, RawOutEvent
+from reaktion.tracking import DropPolicy, RunTracker, TrackingMode
+
+from .utils import (
+    MockAssignTransport,
+    MockMutations,
+    build_flow_actor,
+    build_linear_flow,
+)
+
+
+def next_event(source="1", t=0):
+    return RawOutEvent(
+        handle="return_0", type=EventType.NEXT, source=source, value=(t,), caused_by=[t]
+    )
+
+
+@pytest.mark.asyncio
+async def test_tracker_batches_and_snapshots():
+    mutations = MockMutations()
+
+    async with RunTracker(
+        run="1",
+        track_mutation=mutations.atrack,
+        snapshot_mutation=mutations.asnapshot,
+        snapshot_interval=10,
+        flush_size=5,
+        flush_interval=10,
+    ) as tracker:
+        for t in range(23):
+            await tracker.track(next_event(source=str(t % 3), t=t), t)
+
+        await asyncio.sleep(0.05)
+        assert len(mutations.tracks) == 20, "Only full batches should be written"
+        assert [s["t"] for s in mutations.snapshots] == [14]
+
+        await tracker.asnapshot(23)
+        assert len(mutations.tracks) == 23
+        assert len(mutations.snapshots[-1]["events"]) == 3
+
+
+def slow_tracker(mutations):
+    return RunTracker(
+        run="1",
+        track_mutation=mutations.atrack,
+        snapshot_mutation=mutations.asnapshot,
+        snapshot_interval=1000,
+        flush_size=3,
+        flush_interval=10,
+    )
+
+
+@pytest.mark.asyncio
+async def test_snapshot_waits_for_the_batch_in_flight():
+    mutations = MockMutations(track_sleep=0.1)
+
+    async with slow_tracker(mutations) as tracker:
+        for t in range(3):
+            await tracker.track(next_event(source=str(t), t=t), t)
+        # The writer took the full batch, and is still writing it
+        await asyncio.sleep(0.01)
+        assert tracker.pending == 0
+
+        await tracker.asnapshot(3)
+        assert len(mutations.tracks) == 3
+        assert len(mutations.snapshots[-1]["events"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_exit_waits_for_the_batch_in_flight():
+    mutations = MockMutations(track_sleep=0.1)
+
+    async with slow_tracker(mutations) as tracker:
+        for t in range(3):
+            await tracker.track(next_event(source=str(t), t=t), t)
+        await asyncio.sleep(0.01)
+        assert tracker.pending == 0
+
+    assert len(mutations.tracks) == 3
+
+
+class FailingSnapshotMutations(MockMutations):
+    async def asnapshot(self, **kwargs):
+        raise ConnectionError("fluss is down")
+
+
+@pytest.mark.asyncio
+async def test_failed_snapshots_are_counted_as_dropped(caplog):
+    mutations = FailingSnapshotMutations()
+
+    async with RunTracker(
+        run="1",
+        track_mutation=mutations.atrack,
+        snapshot_mutation=mutations.asnapshot,
+        snapshot_interval=10,
+        flush_size=5,
+        flush_interval=10,
+    ) as tracker:
+        for t in range(15):
+            await tracker.track(next_event(t=t), t)
+        await tracker.asnapshot(15)
+
+        assert len(mutations.tracks) == 15
+        # The periodic snapshot at 14 and the explicit one
+        assert tracker.dropped == 2
+        assert "Snapshotting failed" in caplog.text
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_failed_snapshots_do_not_fail_the_run():
+    actor = build_flow_actor(build_linear_flow(2), mutations=FailingSnapshotMutations())
+    await actor.on_provide(actor.passport)
+
+    transport = MockAssignTransport()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[1]), actor.collector, transport
+    )
+
+    assert transport.changes[-1]["returns"] == (3,)
+    assert actor.run_states == {}
+
+
+@pytest.mark.asyncio
+async def test_tracker_drops_oldest_next_but_keeps_complete():
+    mutations = MockMutations()
+
+    tracker = RunTracker(
+        run="1",
+        track_mutation=mutations.atrack,
+        snapshot_mutation=mutations.asnapshot,
+        flush_size=100,
+        max_pending=3,
+        drop_policy=DropPolicy.DROP_OLDEST,
+    )
+    await tracker.aenter()
+
+    for t in range(5):
+        await tracker.track(next_event(t=t), t)
+    await tracker.track(
+        RawOutEvent(
+            handle="return_0", type=EventType.COMPLETE, source="1", caused_by=[5]
+        ),
+        5,
+    )
+
+    assert tracker.dropped == 2
+    assert tracker.pending == 4
+
+    await tracker.aexit()
+    assert [track["t"] for track in mutations.tracks] == [2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_tracker_blocks_when_full():
+    mutations = MockMutations(track_sleep=0.05)
+
+    async with RunTracker(
+        run="1",
+        track_mutation=mutations.atrack,
+        snapshot_mutation=mutations.asnapshot,
+        flush_size=2,
+        flush_interval=0.01,
+        max_pending=2,
+        drop_policy=DropPolicy.BLOCK,
+    ) as tracker:
+        for t in range(6):
+            await tracker.track(next_event(t=t), t)
+            assert tracker.pending <= 2
+
+    assert tracker.dropped == 0
+    assert len(mutations.tracks) == 6
+
+
+@pytest.mark.asyncio
+@pytest.mark.actor
+async def test_dispatch_does_not_wait_for_tracking():
+    mutations = MockMutations(track_sleep=0.2)
+    actor = build_flow_actor(build_linear_flow(10), mutations=mutations)
+    await actor.on_provide(actor.passport)
+
+    transport = MockAssignTransport()
+    start = time.perf_counter()
+    await actor.on_assign(
+        Assignment(assignation="1", args=[1]), actor.collector, transport
+    )
+    elapsed = time.perf_counter() - start
+
+    assert transport.changes[-1]["returns"] == (11,)
+    # 22 events inline would take 4.4 seconds, batched they are a few round-trips
+    assert elapsed < 2
+    assert len(mutations.tracks) == 22
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "mode,expected",
+    [
+        (TrackingMode.ALL, 61),
+        (TrackingMode.OFF, 0),
+        (TrackingMode.ERRORS, 1),
+        (TrackingMode.SAMPLE, 6 + 1),
+        (TrackingMode.RATE, 2 + 1),
+    ],
+)
+async def test_tracking_modes(mode, expected):
+    mutations = MockMutations()
+
+    async with RunTracker(
+        run="1",
+        track_mutation=mutations.atrack,
+        snapshot_mutation=mutations.asnapshot,
+        snapshot_interval=1000,
+        mode=mode,
+        sample_every=10,
+        rate_limit=1,
+        rate_window=10,
+    ) as tracker:
+        for t in range(60):
+            await tracker.track(next_event(source=str(t % 2), t=t), t)
+        await tracker.track(
+            RawOutEvent(
+                handle="return_0", type=EventType.COMPLETE, source="0", caused_by=[60]
+            ),
+            60,
+        )
+        await tracker.asnapshot(61)
+
+    assert len(mutations.tracks) == expected
+    assert tracker.skipped == 61 - expected
+    assert len(mutations.snapshots) == (0 if mode == TrackingMode.OFF else 1)
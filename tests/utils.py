@@ -1,5 +1,17 @@
+import asyncio
 import os
 from reaktion.events import EventType, OutEvent
+from reaktion.synthetic import (  # noqa: F401
+    build_chunk_flow,
+    build_diamond_flow,
+    build_edge,
+    build_fanin_flow,
+    build_fanout_flow,
+    build_flow,
+    build_linear_flow,
+    build_node,
+    build_port,
+)
 
 DIR_NAME = os.path.dirname(os.path.realpath(__file__))
 
@@ -19,3 +31,110 @@ def expectnext(event: OutEvent):
 def expecterror(event: OutEvent):
     if event.type != EventType.ERROR:
         raise Exception(f"Unexpected event: {event}")
+
+
+class MockAssignTransport:
+    """Records the changes and logs of an assignation"""
+
+    passport = None
+    assignment = None
+
+    def __init__(self) -> None:
+        self.changes = []
+        self.logs = []
+
+    async def change(self, **kwargs):
+        self.changes.append(kwargs)
+
+    async def log(self, level=None, message=None):
+        self.logs.append((level, message))
+
+    def spawn(self, assignment):
+        return self
+
+
+class MockMutations:
+    """Offline replacements for the fluss mutations of the FlowActor"""
+
+    def __init__(self, track_sleep: float = 0) -> None:
+        self.track_sleep = track_sleep
+        self.tracks = []
+        self.snapshots = []
+
+    async def arun(self, **kwargs):
+        from fluss.api.schema import RunMutationStart
+
+        return RunMutationStart(id="1")
+
+    async def atrack(self, **kwargs):
+        from fluss.api.schema import TrackMutationTrack
+
+        if self.track_sleep:
+            await asyncio.sleep(self.track_sleep)
+        self.tracks.append(kwargs)
+        return TrackMutationTrack(
+            id=str(len(self.tracks)),
+            source=kwargs["source"],
+            handle=kwargs["handle"],
+            type=kwargs["type"],
+            value=None,
+        )
+
+    async def asnapshot(self, **kwargs):
+        self.snapshots.append(kwargs)
+
+    async def astart_trace(self, **kwargs):
+        return None
+
+    def as_kwargs(self):
+        return dict(
+            run_mutation=self.arun,
+            track_mutation=self.atrack,
+            snapshot_mutation=self.asnapshot,
+            start_trace_mutation=self.astart_trace,
+        )
+
+
+def build_definition(flow):
+    from rekuest.api.schema import NodeFragment
+
+    ports = lambda ports: [  # noqa: E731
+        {
+            "key": port.key,
+            "kind": port.kind,
+            "nullable": port.nullable,
+            "child": port.child.dict() if port.child else None,
+        }
+        for port in ports
+    ]
+
+    return NodeFragment(
+        args=ports(flow.graph.args),
+        returns=ports(flow.graph.returns),
+        kind="FUNCTION",
+        name=flow.name,
+        description="A test flow",
+        hash=flow.hash,
+        id=flow.id,
+        scope="LOCAL",
+    )
+
+
+def build_flow_actor(flow, mutations: MockMutations = None, **kwargs):
+    """Builds a FlowActor that can run offline"""
+    from rekuest.actors.types import Passport
+    from rekuest.collection.collector import Collector
+    from reaktion.actor import FlowActor
+
+    mutations = mutations or MockMutations()
+
+    return FlowActor(
+        flow=flow,
+        definition=build_definition(flow),
+        passport=Passport(instance_id="test", provision="1"),
+        transport=MockAssignTransport(),
+        collector=Collector(),
+        agent=object(),
+        **mutations.as_kwargs(),
+        **kwargs,
+    )